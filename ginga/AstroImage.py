@@ -11,6 +11,7 @@ from collections import OrderedDict
 import numpy as np
 
 from ginga.util import wcs, wcsmod
+from ginga.util.lazyarray import LazyArray
 from ginga.BaseImage import BaseImage, ImageError, Header
 
 
@@ -166,7 +167,15 @@ class AstroImage(BaseImage):
         # construct slice view and extract it
         ndim = min(self.ndim, 2)
         view = tuple(revnaxis + [slice(None)] * ndim)
-        data = self.get_mddata()[view]
+        mddata = self.get_mddata()
+        if isinstance(mddata, LazyArray):
+            # may give a lazy slice, rather than reading the whole plane
+            if len(revnaxis) > 0:
+                data = mddata.get_slice(revnaxis)
+            else:
+                data = mddata
+        else:
+            data = mddata[view]
 
         if len(data.shape) not in (1, 2):
             raise ImageError(
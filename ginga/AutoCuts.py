@@ -8,10 +8,9 @@ import numpy as np
 
 from ginga import trcalc
 from ginga.misc import Bunch
+from ginga.util.lazyarray import LazyArray
 #from ginga.misc.ParamSet import Param
 
-from astropy.visualization import ZScaleInterval
-
 have_scipy = True
 autocut_methods = ['minmax', 'median', 'histogram', 'stddev', 'zscale']
 try:
@@ -53,6 +52,16 @@ class AutoCutsBase:
         # TODO: find a cleaner way to update these
         self.__dict__.update(param_dict)
 
+    def get_cache_key(self):
+        """Return a value identifying this algorithm and its parameters
+        (including the sampling), for caching the levels it calculates.
+        """
+        params = tuple((param.name, getattr(self, param.name, None))
+                       for param in self.get_params_metadata())
+        sampling = (self.crop_radius, self.max_sample, self.pct_sample,
+                    self.min_sample)
+        return (self.__class__.__name__, params, sampling)
+
     def get_algorithms(self):
         """Return the list of autocuts algorithms.
 
@@ -155,6 +164,32 @@ class AutoCutsBase:
         data = image.cutout_data(0, 0, wd, ht)
         return data
 
+    def get_data_array(self, image):
+        """Get the 2D data array of an image, to be used directly.
+
+        Parameters
+        ----------
+        image : subclass of `~ginga.BaseImage.BaseImage`
+            Image object from which the cut levels should be calculated;
+            may be a `~ginga.util.vip.ViewerImageProxy`
+
+        Returns
+        -------
+        data : array-like or `None`
+            The data array, or `None` if there is none to use directly,
+            e.g. a viewer image proxy composited from several images
+
+        """
+        if hasattr(image, 'get_single_image'):
+            # viewer image proxy: use the data of the image it shows
+            image = image.get_single_image()
+        if image is None or not hasattr(image, 'get_data'):
+            return None
+        data = image.get_data()
+        if data is None or len(data.shape) != 2:
+            return None
+        return data
+
     def get_sample(self, image, num_points=None):
         """Return a sample from the full data array of the passed image.
 
@@ -183,6 +218,12 @@ class AutoCutsBase:
         if num_points == 0:
             return np.zeros((0, 0))
 
+        data = self.get_data_array(image)
+        if isinstance(data, LazyArray):
+            # only fetch the chunks that go into the sample
+            sample = data.get_sample(num_points)
+            return sample.reshape((1,) + sample.shape)
+
         # sample the data
         xmax = wd - 1
         ymax = ht - 1
@@ -412,6 +453,9 @@ class Histogram(AutoCutsBase):
         Specifies the number of bins used in calculating the histogram
 
     """
+    # approximate number of values processed at a time by calc_histogram()
+    chunk_size = 1024 * 1024
+
     @classmethod
     def get_params_metadata(cls):
         return [
@@ -459,7 +503,14 @@ class Histogram(AutoCutsBase):
         elif self.sample == 'grid':
             data = self.get_sample(image, num_points=self.num_points)
         else:
-            data = self.get_full(image, px_limit=self.full_px_limit)
+            data = None
+            if (self.full_px_limit is None or
+                    image.width * image.height <= self.full_px_limit):
+                # calc_histogram() reads the data array in chunks, so it
+                # does not need to be copied (or fetched all at once)
+                data = self.get_data_array(image)
+            if data is None:
+                data = self.get_full(image, px_limit=self.full_px_limit)
 
         bnch = self.calc_histogram(data, pct=self.pct, numbins=self.numbins)
         loval, hival = bnch.loval, bnch.hival
@@ -482,6 +533,15 @@ class Histogram(AutoCutsBase):
         loval, hival = bnch.loval, bnch.hival
         return float(loval), float(hival)
 
+    def _get_finite_chunks(self, data):
+        """Yield the finite values of `data` in blocks of rows."""
+        ht = data.shape[0]
+        row_size = max(1, int(np.prod(data.shape[1:])))
+        rows = max(1, self.chunk_size // row_size)
+        for y1 in range(0, ht, rows):
+            chunk = np.asarray(data[y1:y1 + rows])
+            yield chunk[np.isfinite(chunk)]
+
     def calc_histogram(self, data, pct=1.0, numbins=2048):
         """Internal function used by this class."""
 
@@ -491,11 +551,35 @@ class Histogram(AutoCutsBase):
         self.logger.debug("Median analysis array is %dx%d" % (
             width, height))
 
-        data = data[np.isfinite(data)]
-        total_px = len(data.flat)
+        # NOTE: the histogram is accumulated over blocks of rows, so that
+        # memory use is bounded for large (e.g. memory mapped, dask or
+        # zarr) arrays.  The first pass finds the range of the finite
+        # values, so that every block is binned with the same edges that
+        # np.histogram() would use for the whole array.
+        if data.size <= self.chunk_size:
+            # small enough to only find the finite values once
+            chunks = list(self._get_finite_chunks(data))
+        else:
+            chunks = None
+
+        total_px, lo, hi = 0, None, None
+        for chunk in (chunks or self._get_finite_chunks(data)):
+            if chunk.size == 0:
+                continue
+            total_px += chunk.size
+            c_lo, c_hi = chunk.min(), chunk.max()
+            lo = c_lo if lo is None else min(lo, c_lo)
+            hi = c_hi if hi is None else max(hi, c_hi)
         if total_px == 0:
             return Bunch.Bunch(loval=0, hival=0)
-        dist, bins = np.histogram(data, bins=numbins, density=False)
+
+        dist = np.zeros(numbins, dtype=np.intp)
+        for chunk in (chunks or self._get_finite_chunks(data)):
+            if chunk.size == 0:
+                continue
+            _dist, bins = np.histogram(chunk, bins=numbins, range=(lo, hi),
+                                       density=False)
+            dist += _dist
 
         cutoff = int((float(total_px) * (1.0 - pct)) / 2.0)
         top = len(dist) - 1
@@ -757,6 +841,9 @@ class ZScale(AutoCutsBase):
     the data.
 
     Based on STScI's numdisplay implementation of IRAF's ZScale.
+    The sample is drawn from the data by stratified random sampling
+    (see :py:meth:`get_stratified_sample`) and the limits are
+    calculated by :py:func:`zscale_samples`.
 
     The calculation is:
         local, hival = zscale(sample_data, contrast)
@@ -775,6 +862,9 @@ class ZScale(AutoCutsBase):
         "reasonable representative sample".
 
     """
+    # seed for the random picks of the stratified sample
+    sample_seed = 0
+
     @classmethod
     def get_params_metadata(cls):
         return [
@@ -793,47 +883,168 @@ class ZScale(AutoCutsBase):
         self.contrast = contrast
         self.num_points = num_points
 
+    def _get_num_points(self, total_points):
+        if self.num_points is not None:
+            return min(self.num_points, total_points)
+        return min(max(self.min_sample, int(total_points * self.pct_sample)),
+                   self.max_sample, total_points)
+
     def calc_cut_levels(self, image):
         """See subclass documentation."""
-        data = self.get_sample(image, num_points=self.num_points)
+        data = self.get_data_array(image)
+        if isinstance(data, np.ndarray):
+            # stratified sample is drawn directly from the whole array
+            num_points = self._get_num_points(data.shape[0] * data.shape[1])
+        else:
+            data = self.get_sample(image, num_points=self.num_points)
+            num_points = data.size
 
         loval, hival = self.calc_zscale(data, contrast=self.contrast,
-                                        num_points=self.num_points)
+                                        num_points=num_points)
         return float(loval), float(hival)
 
     def calc_cut_levels_data(self, data_np):
         """See subclass documentation."""
-        cutout = self.get_sample_data(data_np, num_points=self.num_points)
-
-        loval, hival = self.calc_zscale(cutout, contrast=self.contrast,
-                                        num_points=self.num_points)
+        num_points = self._get_num_points(data_np.shape[0] * data_np.shape[1])
+        loval, hival = self.calc_zscale(data_np, contrast=self.contrast,
+                                        num_points=num_points)
         return float(loval), float(hival)
 
+    def get_stratified_sample(self, data, num_points):
+        """Return about `num_points` finite values of `data`, as a flat
+        array.
+
+        The array is divided into `num_points` strata of consecutive
+        elements and one element is picked at random from each, so only
+        the picked elements are read.  The picks are seeded, so the same
+        data always gives the same sample.
+        """
+        total = data.size
+        if total <= num_points:
+            idx = np.arange(total)
+        else:
+            rng = np.random.default_rng(self.sample_seed)
+            edges = np.linspace(0, total, num_points + 1).astype(np.intp)
+            idx = edges[:-1] + (rng.random(num_points) *
+                                (edges[1:] - edges[:-1])).astype(np.intp)
+        idx = np.unravel_index(idx, data.shape)
+
+        samples = np.asarray(data[idx])
+        keep = np.isfinite(samples)
+        # remove masked elements, they cause problems
+        mask = np.ma.getmask(data)
+        if mask is not np.ma.nomask:
+            keep &= np.logical_not(mask[idx])
+        return samples[keep]
+
     def calc_zscale(self, data, contrast=0.25, num_points=1000):
         """Internal function used by this class."""
-        # NOTE: num_per_row is ignored in this implementation
-
         assert len(data.shape) >= 2, \
             AutoCutsError("input data should be 2D or greater")
-        ht, wd = data.shape[:2]
 
         # sanity check on contrast parameter
         assert (0.0 < contrast <= 1.0), \
             AutoCutsError("contrast (%.2f) not in range 0 < c <= 1" % (
                 contrast))
 
-        # remove masked elements, they cause problems
-        data = data[np.logical_not(np.ma.getmaskarray(data))]
-        # remove NaN and Inf from samples
-        samples = data[np.isfinite(data)].flatten()
-        samples = samples[:num_points]
+        if num_points is None:
+            num_points = data.size
+        samples = self.get_stratified_sample(data, num_points)
 
         if samples.size == 0:
             return (0, 0)
 
-        _interval = ZScaleInterval(samples.size, contrast=contrast)
-        loval, hival = _interval.get_limits(samples)
-        return loval, hival
+        return zscale_samples(samples, contrast=contrast)
+
+
+def zscale_samples(samples, contrast=0.25, max_reject=0.5, min_npixels=5,
+                   krej=2.5, max_iterations=5):
+    """Calculate the IRAF zscale limits of an array of finite samples.
+
+    This is the algorithm of astropy's `ZScaleInterval` (and IRAF's
+    ``zscale``): a line is fit to the sorted samples with iterative
+    k-sigma rejection, and the limits are found from the median and the
+    slope of the line divided by `contrast`.  The line fit is done with
+    the closed-form weighted least squares sums.
+
+    Parameters
+    ----------
+    samples : ndarray
+        Finite sample values
+
+    contrast : float (optional, defaults to 0.25)
+        Scaling factor (between 0 and 1) for the slope of the fit
+
+    max_reject : float (optional, defaults to 0.5)
+        Maximum fraction of the samples that may be rejected
+
+    min_npixels : int (optional, defaults to 5)
+        Minimum number of samples that must remain after rejection
+
+    krej : float (optional, defaults to 2.5)
+        Number of sigma used for the rejection
+
+    max_iterations : int (optional, defaults to 5)
+        Maximum number of iterations of the rejection
+
+    Returns
+    -------
+    loval, hival : tuple of float
+        The limits
+
+    """
+    samples = np.sort(np.asarray(samples).ravel())
+    npix = len(samples)
+    vmin, vmax = samples[0], samples[-1]
+    samples = samples.astype(np.float64, copy=False)
+
+    minpix = max(min_npixels, int(npix * max_reject))
+    x = np.arange(npix, dtype=np.float64)
+    ngoodpix = npix
+    last_ngoodpix = npix + 1
+
+    # rejected samples, dilated by `ngrow` samples each iteration
+    badpix = np.zeros(npix, dtype=bool)
+    ngrow = max(1, int(npix * 0.01))
+    lo_grow, hi_grow = ngrow // 2, (ngrow - 1) // 2
+    slope = None
+
+    for _ in range(max_iterations):
+        if ngoodpix >= last_ngoodpix or ngoodpix < minpix:
+            break
+
+        good = np.logical_not(badpix)
+        xg, yg = x[good], samples[good]
+        n = float(len(xg))
+        sx, sy = xg.sum(), yg.sum()
+        sxx, sxy = np.dot(xg, xg), np.dot(xg, yg)
+        denom = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denom if denom != 0 else 0.0
+        intercept = (sy - slope * sx) / n
+
+        # k-sigma rejection about the fitted line
+        flat = samples - (intercept + slope * x)
+        threshold = krej * flat[good].std()
+        badpix |= np.abs(flat) > threshold
+
+        # grow the rejected samples (a running window sum, as a
+        # convolution with a box of length `ngrow`)
+        csum = np.concatenate(([0], np.cumsum(badpix, dtype=np.intp)))
+        i = np.arange(npix)
+        badpix = (csum[np.minimum(i + hi_grow + 1, npix)] -
+                  csum[np.maximum(i - lo_grow, 0)]) > 0
+
+        last_ngoodpix = ngoodpix
+        ngoodpix = npix - int(np.count_nonzero(badpix))
+
+    if slope is not None and ngoodpix >= minpix:
+        slope = slope / contrast
+        center = (npix - 1) // 2
+        median = np.median(samples)
+        vmin = max(vmin, median - (center - 1) * slope)
+        vmax = min(vmax, median + (npix - center) * slope)
+
+    return vmin, vmax
 
 
 # funky boolean converter
@@ -8,7 +8,9 @@ import numpy as np
 import logging
 
 from ginga.misc import Bunch, Callback, Settings
+from ginga.misc.LRUCache import LRUCache
 from ginga import trcalc, AutoCuts
+from ginga.util.lazyarray import LazyArray
 
 
 class ImageError(Exception):
@@ -108,6 +110,11 @@ class ViewerObjectBase(Callback.Callbacks):
 
 class BaseImage(ViewerObjectBase):
 
+    # number of points sampled to estimate min/max of a LazyArray
+    lazy_minmax_points = 1000000
+    # number of rows in each block of the min/max statistics
+    stats_block_rows = 256
+
     def __init__(self, data_np=None, metadata=None, logger=None, order=None,
                  name=None):
 
@@ -125,6 +132,15 @@ class BaseImage(ViewerObjectBase):
         self.naxispath = []
         self.revnaxis = []
 
+        # multi-resolution pyramid, created on demand
+        self._pyramid = None
+        # min/max of each block of rows, see _set_minmax()
+        self._block_stats = None
+        # incremented whenever the data is replaced or modified
+        self._data_version = 0
+        # auto cut levels calculated for this data
+        self._autocut_cache = LRUCache(maxsize=8)
+
         self._set_minmax()
         self._calc_order(order)
 
@@ -178,6 +194,12 @@ class BaseImage(ViewerObjectBase):
     def get_data(self):
         return self._data
 
+    def get_data_version(self):
+        """Returns a number that changes whenever the data is replaced
+        (`set_data`) or declared modified (`update_data_region`).
+        """
+        return self._data_version
+
     def _get_data(self):
         return self._data
 
@@ -206,6 +228,7 @@ class BaseImage(ViewerObjectBase):
         else:
             data = data_np
         self._data = data
+        self._pyramid = None
 
         self._calc_order(order)
 
@@ -213,6 +236,8 @@ class BaseImage(ViewerObjectBase):
             self.update_metadata(metadata)
 
         self._set_minmax()
+        self._data_version += 1
+        self._autocut_cache.clear()
 
         self.make_callback('modified')
 
@@ -222,6 +247,7 @@ class BaseImage(ViewerObjectBase):
 
         # unreference data array
         self._data = np.zeros((0, 0))
+        self._pyramid = None
 
     def _slice(self, view):
         d_obj = self._get_data()
@@ -253,6 +279,41 @@ class BaseImage(ViewerObjectBase):
         cs = cs.upper()
         return [self.order.index(c) for c in cs]
 
+    def get_pyramid(self):
+        """Return the multi-resolution pyramid for this image's data,
+        creating it if necessary.  The pyramid is discarded whenever the
+        data is replaced.
+
+        Returns
+        -------
+        pyramid : `~ginga.util.pyramid.ImagePyramid`
+            The image pyramid.
+
+        """
+        if self._pyramid is None:
+            from ginga.util.pyramid import ImagePyramid
+            self._pyramid = ImagePyramid(self._get_data(), logger=self.logger)
+        return self._pyramid
+
+    def get_nbytes(self):
+        """Return the number of bytes of memory held by this image: its
+        data array and the data derived from it (e.g. the pyramid).
+
+        Data that is not held in memory (e.g. a memory mapped array, or
+        the unfetched part of a lazy array) is not counted.
+        """
+        data = self._get_data()
+        if isinstance(data, LazyArray):
+            cache = getattr(data, 'cache', None)
+            nbytes = 0 if cache is None else cache.get_nbytes()
+        elif isinstance(data, np.ndarray) and not isinstance(data, np.memmap):
+            nbytes = data.nbytes
+        else:
+            nbytes = 0
+        if self._pyramid is not None:
+            nbytes += self._pyramid.get_nbytes()
+        return nbytes
+
     def _calc_order(self, order):
         """Called to set the order of a multi-channel image.
         The order should be determined by the loader, but this will
@@ -267,31 +328,139 @@ class BaseImage(ViewerObjectBase):
         return (getattr(self, 'wcs', None) is not None and
                 self.wcs.has_valid_wcs())
 
-    def _set_minmax(self):
-        data = self._get_data()
+    def _calc_minmax(self, data):
+        """Return (minval, maxval, minval_noinf, maxval_noinf) of `data`."""
         try:
-            self.maxval = np.nanmax(data)
-            self.minval = np.nanmin(data)
+            maxval = np.nanmax(data)
+            minval = np.nanmin(data)
         except Exception:
-            self.maxval = 0
-            self.minval = 0
+            maxval = 0
+            minval = 0
 
         # TODO: see if there is a faster way to ignore infinity
         try:
-            if np.isfinite(self.maxval):
-                self.maxval_noinf = self.maxval
+            if np.isfinite(maxval):
+                maxval_noinf = maxval
             else:
-                self.maxval_noinf = np.nanmax(data[np.isfinite(data)])
+                maxval_noinf = np.nanmax(data[np.isfinite(data)])
         except Exception:
-            self.maxval_noinf = self.maxval
+            maxval_noinf = maxval
 
         try:
-            if np.isfinite(self.minval):
-                self.minval_noinf = self.minval
+            if np.isfinite(minval):
+                minval_noinf = minval
             else:
-                self.minval_noinf = np.nanmin(data[np.isfinite(data)])
+                minval_noinf = np.nanmin(data[np.isfinite(data)])
         except Exception:
-            self.minval_noinf = self.minval
+            minval_noinf = minval
+
+        return (minval, maxval, minval_noinf, maxval_noinf)
+
+    def _calc_block_stats(self, data):
+        """Like _calc_minmax(), but for one block of a numpy array.  NaN
+        is returned for values that cannot be determined from the block,
+        so that the block is ignored when the blocks are combined.
+        """
+        # fmin/fmax ignore NaNs, without warning if all values are NaN
+        minval = np.fmin.reduce(data, axis=None)
+        maxval = np.fmax.reduce(data, axis=None)
+        minval_noinf, maxval_noinf = minval, maxval
+        if not (np.isfinite(minval) and np.isfinite(maxval)):
+            finite = data[np.isfinite(data)]
+            if finite.size > 0:
+                minval_noinf, maxval_noinf = finite.min(), finite.max()
+            else:
+                minval_noinf = maxval_noinf = data.dtype.type(np.nan)
+        return (minval, maxval, minval_noinf, maxval_noinf)
+
+    def _combine_block_stats(self):
+        if len(self._block_stats) == 0:
+            return (0, 0, 0, 0)
+        minval, maxval, minval_noinf, maxval_noinf = \
+            [np.array(vals) for vals in zip(*self._block_stats)]
+        minval, maxval = np.fmin.reduce(minval), np.fmax.reduce(maxval)
+        minval_noinf = np.fmin.reduce(minval_noinf)
+        maxval_noinf = np.fmax.reduce(maxval_noinf)
+        if np.isnan(minval_noinf):
+            minval_noinf = minval
+        if np.isnan(maxval_noinf):
+            maxval_noinf = maxval
+        return (minval, maxval, minval_noinf, maxval_noinf)
+
+    def _set_minmax(self):
+        data = self._get_data()
+        self._block_stats = None
+        if isinstance(data, LazyArray):
+            # estimate from a sample of chunks rather than fetching them all
+            stats = self._calc_minmax(data.get_sample(self.lazy_minmax_points))
+
+        elif (isinstance(data, np.ndarray) and data.ndim >= 2 and
+              data.dtype.kind in 'iuf'):
+            # statistics are kept for blocks of rows, so that they can be
+            # updated for the rows that change (see update_data_region())
+            n = self.stats_block_rows
+            self._block_stats = [self._calc_block_stats(data[y:y + n])
+                                 for y in range(0, data.shape[0], n)]
+            stats = self._combine_block_stats()
+
+        else:
+            stats = self._calc_minmax(data)
+
+        (self.minval, self.maxval,
+         self.minval_noinf, self.maxval_noinf) = stats
+
+    def update_data_region(self, x1=0, y1=0, x2=None, y2=None):
+        """Call this after modifying the data array in place, to declare
+        the region that changed.
+
+        Only the rows of the statistics (min/max) that cover the region
+        are recalculated, and the 'modified' callback is made.
+
+        Parameters
+        ----------
+        x1, y1 : int
+            Coordinates defining the minimum corner of the region
+
+        x2, y2 : int or `None`
+            Coordinates *one greater* than the maximum corner (`None` for
+            the width/height of the data)
+
+        """
+        data = self._get_data()
+        if y2 is None:
+            y2 = data.shape[0]
+        self._pyramid = None
+
+        if self._block_stats is None:
+            self._set_minmax()
+        else:
+            n = self.stats_block_rows
+            for i in range(max(0, y1) // n,
+                           min(len(self._block_stats), (y2 + n - 1) // n)):
+                self._block_stats[i] = self._calc_block_stats(
+                    data[i * n:(i + 1) * n])
+            (self.minval, self.maxval,
+             self.minval_noinf, self.maxval_noinf) = \
+                self._combine_block_stats()
+        self._data_version += 1
+        self._autocut_cache.clear()
+
+        self.make_callback('modified')
+
+    def get_cached_cut_levels(self, autocuts):
+        """Return the cut levels previously calculated for this image's
+        current data by `autocuts` (an `~ginga.AutoCuts.AutoCutsBase`
+        object) with its current parameters, or `None`.
+        """
+        key = (autocuts.get_cache_key(), self._data_version)
+        return self._autocut_cache.get(key)
+
+    def set_cached_cut_levels(self, autocuts, cuts):
+        """Save cut levels `cuts` calculated for this image's current
+        data by `autocuts`.
+        """
+        key = (autocuts.get_cache_key(), self._data_version)
+        self._autocut_cache.put(key, tuple(cuts))
 
     def get_minmax(self, noinf=False):
         if not noinf:
@@ -320,39 +320,74 @@ class HistogramEqualizationDist(ColorDistBase):
     """
     The histogram equalization distribution function distributes colors
     based on the frequency of each data value.
+
+    By default the histogram is computed from the values passed to
+    `hash_array()` each time.  A CDF computed once (e.g. from a sample of
+    the whole image) can instead be installed with `set_cdf()`, in which
+    case values are mapped through it like in the other distributions.
     """
 
     def __init__(self, hashsize, colorlen=None):
+        self.cdf_key = None
         super(HistogramEqualizationDist, self).__init__(hashsize,
                                                         colorlen=colorlen)
 
     def calc_hash(self):
-        pass
-
-    # TODO: this method has a lot more overhead compared to the other
-    # scaling methods because the hash array must be computed each time
-    # the data is delivered to hash_array()--in the other scaling
-    # methods it is precomputed in calc_hash().  Investigate whether
-    # there is a way to make this more efficient.
-    #
-    def hash_array(self, idx):
-        # NOTE: data could be assumed to be in the range 0..hashsize-1
-        # at this point but clip as a precaution
-        idx = np.clip(idx, 0, self.hashsize - 1)
+        # any installed CDF is for the old hash size
+        self.hash = None
+        self.cdf_key = None
 
+    def calc_cdf(self, idx):
+        """Return the normalized (0.0-1.0) CDF of the index array `idx`."""
         # get image histogram
         hist, bins = np.histogram(idx.ravel(), self.hashsize, density=False)
-        cdf = hist.cumsum()
+        return self._normalize_cdf(hist.cumsum())
 
+    def calc_cdf_counts(self, counts):
+        """Like `calc_cdf()`, but from `counts`, the number of occurrences
+        of each index value (e.g. summed with `numpy.bincount()` over
+        blocks of the data), so that the data need not be in memory.
+        """
+        vals = np.flatnonzero(counts)
+        if len(vals) == 0:
+            return np.zeros(self.hashsize, dtype=np.float32)
+        # same binning as calc_cdf() would use for the indexes
+        hist, bins = np.histogram(vals, self.hashsize,
+                                  range=(vals[0], vals[-1]),
+                                  weights=counts[vals])
+        return self._normalize_cdf(hist.cumsum())
+
+    def _normalize_cdf(self, cdf):
         # normalize the CDF to the 0.0-1.0 curve (scaling to the output
         # level happens downstream in the Distribute stage)
         lo, hi = cdf.min(), cdf.max()
         if hi > lo:
-            base = (cdf - lo) / (hi - lo)
-        else:
-            # flat image: avoid a divide-by-zero
-            base = np.zeros(self.hashsize, dtype=np.float32)
+            return (cdf - lo) / (hi - lo)
+        # flat image: avoid a divide-by-zero
+        return np.zeros(self.hashsize, dtype=np.float32)
+
+    def set_cdf(self, base, key):
+        """Install `base` (from `calc_cdf()`) as a fixed CDF.  `key` is any
+        value (other than `None`) identifying what it was computed from.
+        """
         self.set_hash(base)
+        self.cdf_key = key
+
+    def clear_cdf(self):
+        """Go back to computing the histogram in each `hash_array()`."""
+        self.calc_hash()
+
+    def has_cdf(self):
+        return self.cdf_key is not None
+
+    def hash_array(self, idx):
+        # NOTE: data could be assumed to be in the range 0..hashsize-1
+        # at this point but clip as a precaution
+        idx = np.clip(idx, 0, self.hashsize - 1)
+
+        if self.cdf_key is None:
+            # no fixed CDF: equalize the values being mapped
+            self.set_hash(self.calc_cdf(idx))
 
         return self.hash[idx]
 
@@ -22,6 +22,7 @@ from ginga.canvas import coordmap, transform
 from ginga.canvas.types.layer import DrawingCanvas
 from ginga.util import addons, vip
 from ginga.util.viewer import ViewerBase
+from ginga.util.bgjob import BackgroundJob
 from ginga.fonts import font_asst
 
 __all__ = ['ImageViewBase']
@@ -127,19 +128,38 @@ class ImageViewBase(ViewerBase):
                              autocut_params=[])
         for name in ('autocut_method', 'autocut_params'):
             self.t_.get_setting(name).add_callback('set', self.autocut_params_cb)
+        # calculate auto cut levels in the background, after showing the
+        # image with levels from a coarse sample
+        self.t_.add_defaults(autocut_async=False)
+        self.autocut_coarse_points = 1000
 
         # for zooming
         self.t_.add_defaults(zoomlevel=1.0, zoom_algorithm='step',
                              scale_x_base=1.0, scale_y_base=1.0,
-                             interpolation='basic',
+                             interpolation='basic', image_pyramid=False,
                              zoom_rate=math.sqrt(2.0))
         for name in ('zoom_rate', 'zoom_algorithm',
                      'scale_x_base', 'scale_y_base'):
             self.t_.get_setting(name).add_callback('set', self.zoomsetting_change_cb)
         self.zoom = zoom.get_zoom_alg(self.t_['zoom_algorithm'])(self)
 
-        self.t_.get_setting('interpolation').add_callback(
-            'set', self.interpolation_change_cb)
+        for name in ('interpolation', 'image_pyramid'):
+            self.t_.get_setting(name).add_callback(
+                'set', self.interpolation_change_cb)
+
+        # number of threads used to process the image in horizontal bands
+        self.t_.add_defaults(render_num_workers=1)
+        # apply cut levels and color map in a single step when possible
+        self.t_.add_defaults(render_fused_rgbmap=False)
+        self.t_.get_setting('render_fused_rgbmap').add_callback(
+            'set', self.render_fused_change_cb)
+        # source of the histogram for histogram equalization:
+        # 'view' (visible pixels), 'sample' (sample of the image) or
+        # 'full' (sample, then all of the image in the background)
+        self.histeq_cdf_options = ('view', 'sample', 'full')
+        self.t_.add_defaults(histeq_cdf='sample')
+        self.t_.get_setting('histeq_cdf').add_callback(
+            'set', self.histeq_cdf_change_cb)
 
         # max/min scaling
         self.t_.add_defaults(scale_max=None, scale_min=None)
@@ -352,6 +372,11 @@ class ImageViewBase(ViewerBase):
             self.rf_timer.add_callback('expired', self.refresh_timer_cb,
                                        self.rf_flags)
 
+        # for calculating auto cut levels in the background
+        self.ac_settle_interval = 0.1
+        self.ac_bgjob = BackgroundJob(self,
+                                      settle_interval=self.ac_settle_interval)
+
     def set_window_size(self, width, height):
         """Report the size of the window to display the image.
 
@@ -2144,6 +2169,15 @@ class ImageViewBase(ViewerBase):
         """Handle callback related to changes in interpolation."""
         self.renderer.interpolation_change(value)
 
+    def histeq_cdf_change_cb(self, setting, value):
+        """Handle callback related to changes in the histogram
+        equalization source."""
+        self.redraw(whence=2)
+
+    def render_fused_change_cb(self, setting, value):
+        """Handle callback related to changes in fused color mapping."""
+        self.redraw(whence=1)
+
     def get_scale_limits(self):
         """Get scale limits.
 
@@ -2667,16 +2701,71 @@ class ImageViewBase(ViewerBase):
             #image = self.vip
             return
 
-        loval, hival = autocuts.calc_cut_levels(image)
+        # levels can only be cached with the image if they are calculated
+        # from exactly that image's data
+        img = image.get_single_image()
+        cuts = None if img is None else img.get_cached_cut_levels(autocuts)
+        # (results can only be handed back with a timer)
+        async_cuts = (cuts is None and self.t_.get('autocut_async', False) and
+                      self.ac_bgjob.is_available())
+        if cuts is not None:
+            # already calculated for this data
+            loval, hival = cuts
+        elif async_cuts:
+            # show the image right away with levels from a coarse sample,
+            # and calculate the levels in the background
+            data = autocuts.get_sample(image,
+                                       num_points=self.autocut_coarse_points)
+            loval, hival = autocuts.calc_cut_levels_data(data)
+        else:
+            loval, hival = autocuts.calc_cut_levels(image)
+            if img is not None:
+                img.set_cached_cut_levels(autocuts, (loval, hival))
 
         # this will invoke cut_levels_cb()
         self.t_.set(cuts=(loval, hival))
 
+        if async_cuts:
+            self._start_autocut_job(autocuts, image, (loval, hival))
+
         # If user specified "once" for auto levels, then turn off
         # auto levels now that we have cut levels established
         if self.t_['autocuts'] == 'once':
             self.t_.set(autocuts='off')
 
+    def _start_autocut_job(self, autocuts, image, cuts):
+        img = self.get_image()
+        self.ac_bgjob.start(self._calc_autocut_job, self._autocut_done,
+                            image=img, vip=image,
+                            cache_image=image.get_single_image(),
+                            autocuts=autocuts, cuts=cuts,
+                            version=(None if img is None
+                                     else img.get_data_version()))
+
+    def _calc_autocut_job(self, job):
+        # (not called if the job was superseded while waiting to be run)
+        return job.autocuts.calc_cut_levels(job.vip)
+
+    def _autocut_done(self, job):
+        img = self.get_image()
+        if (job.result is None or img is not job.image or
+                (img is not None and img.get_data_version() != job.version) or
+                tuple(self.t_['cuts']) != tuple(job.cuts)):
+            # image or cut levels changed in the meantime
+            self.logger.debug("discarding stale auto cut levels")
+            return
+
+        if job.cache_image is not None:
+            job.cache_image.set_cached_cut_levels(job.autocuts, job.result)
+
+        # this will invoke cut_levels_cb()
+        self.t_.set(cuts=job.result)
+
+    def is_autocut_pending(self):
+        """Returns True if auto cut levels are being calculated in the
+        background."""
+        return self.ac_bgjob.is_pending()
+
     def autocut_params_cb(self, setting, value):
         """Handle callback related to changes in auto-cut levels."""
         # Did we change the method?
@@ -93,5 +93,6 @@ class RGBImage(BaseImage):
             a.fill(alpha)
             l.insert(pos, a)
             self._data = np.dstack(l)
+            self._pyramid = None
             order.insert(pos, 'A')
             self.order = ''.join(order)
@@ -87,6 +87,8 @@ class RGBMapper(Callback.Callbacks):
         self.logger = logger
         self.mapper_id = str(uuid.uuid4())
         self.cache_arr = None
+        self._lut_info = None
+        self._raw_lut_info = None
 
         # For color and intensity maps
         self.cmap = None
@@ -460,6 +462,163 @@ class RGBMapper(Callback.Callbacks):
 
         return arr_out
 
+    def can_map_data(self):
+        """Returns True if `get_rgb_array_cuts` can be used with this
+        mapper.  This requires the cache array to be in effect, and a
+        color distribution that maps each value independently of the others.
+        """
+        dist = self.get_dist()
+        return (self.cache_arr is not None and
+                not (isinstance(dist, ColorDist.HistogramEqualizationDist) and
+                     not dist.has_cdf()))
+
+    def get_composite_lut(self, order):
+        """Return a lookup table mapping each cut level index
+        (0..hashsize-1) directly to an output pixel in `order`.
+
+        The table combines the color distribution, shift, intensity map
+        and color map, and is rebuilt only when one of those changes.
+        """
+        dist = self.get_dist()
+        key = (self.cache_arr, dist, dist.hash, order)
+        lut_info = self._lut_info
+        if lut_info is not None and all(a is b for a, b in zip(lut_info[0],
+                                                               key)):
+            return lut_info[1]
+
+        i_arr = np.arange(0, self.get_hash_size(), dtype=np.uint)
+        idx = self.p_dist.get_hasharray(i_arr)
+
+        rgbobj = RGBPlanes(np.empty((len(i_arr), len(order)),
+                                    dtype=self.p_cmap.out_dtype), order)
+        if rgbobj.hasAlpha:
+            rgbobj.get_slice('A').fill(self.p_cmap.out_maxc)
+        ri, gi, bi = rgbobj.get_order_indexes('RGB')
+        lut = rgbobj.rgbarr
+        lut[:, [ri, gi, bi]] = self.cache_arr[idx]
+
+        self._lut_info = (key, lut)
+        return lut
+
+    def get_rgb_array_cuts(self, data_np, loval, hival, order=None,
+                           out=None, chunk_size=262144):
+        """Apply cut levels and color map a 2D data array in one pass.
+
+        This produces the same result as applying ``AutoCutsBase.cut_levels``
+        (with an output range of 0..hashsize-1) followed by `get_rgb_array`,
+        but works on chunks of rows through a composite lookup table, so
+        that no full-size intermediate arrays are created.  8 and 16 bit
+        integer data is mapped with a single lookup of each raw value
+        (see `get_raw_lut`).
+
+        Parameters
+        ----------
+        data_np : ndarray
+            2D array of data values
+
+        loval, hival : float
+            The low and high cut levels
+
+        order : str or `None`
+            Order of the color bands in the output (default: mapper's order)
+
+        out : ndarray or `None`
+            Preallocated output array of shape (ht, wd, len(order))
+
+        chunk_size : int (optional)
+            Approximate number of elements processed at a time
+
+        Returns
+        -------
+        out : ndarray
+            The color mapped array
+        """
+        if order is None:
+            order = self.pipeline.get('state').order
+        lut = self.get_composite_lut(order)
+        if out is None:
+            out = np.empty(data_np.shape + (len(order),), dtype=lut.dtype)
+
+        if data_np.dtype.kind in 'ui' and data_np.dtype.itemsize <= 2:
+            # 8 or 16 bit integer data: map raw values with a single lookup
+            # (only build the table if it is no larger than the data)
+            num_values = 2 ** (8 * data_np.dtype.itemsize)
+            raw_lut = self.get_raw_lut(data_np.dtype, loval, hival, order,
+                                       build=(data_np.size >= num_values))
+            if raw_lut is not None:
+                np.take(raw_lut, data_np, axis=0, out=out)
+                return out
+
+        ht, wd = data_np.shape[:2]
+        rows = max(1, min(ht, chunk_size // max(wd, 1)))
+        dtype = np.result_type(data_np.dtype, 1.0)
+        f_buf = np.empty((rows, wd), dtype=dtype)
+        i_buf = np.empty((rows, wd), dtype=np.uint)
+
+        for y1 in range(0, ht, rows):
+            y2 = min(y1 + rows, ht)
+            idx = self._cut_to_index(data_np[y1:y2], loval, hival, len(lut),
+                                     f_buf[:y2 - y1], i_buf[:y2 - y1])
+            np.take(lut, idx, axis=0, out=out[y1:y2])
+
+        return out
+
+    def _cut_to_index(self, data_np, loval, hival, num, f, idx):
+        """Apply cut levels to `data_np`, giving indexes 0..num-1 in `idx`
+        (using `f`, of the same shape, for intermediate values).
+        """
+        vmin, vmax = 0, num - 1
+        loval, hival = float(loval), float(hival)
+        hival = max(loval, hival)
+        delta = hival - loval
+
+        # NOTE: same operations as cut_levels(), so that results are
+        # identical; NaNs end up out of range and are clipped
+        with np.errstate(invalid='ignore'):
+            np.subtract(data_np, loval, out=f)
+            if delta > 0.0:
+                np.divide(f, delta, out=f)
+                np.multiply(f, vmax, out=f)
+                f.clip(vmin, vmax, out=f)
+            else:
+                # hival == loval, so thresholding operation
+                f.clip(vmin, vmax, out=f)
+                f[f > 0.0] = vmax
+            np.copyto(idx, f, casting='unsafe')
+        np.minimum(idx, vmax, out=idx)
+        return idx
+
+    def get_raw_lut(self, dtype, loval, hival, order, build=True):
+        """Return a lookup table mapping every value of the 8 or 16 bit
+        integer `dtype` directly to an output pixel in `order`, for the
+        cut levels `loval` and `hival`.  Negative values of signed types
+        index the table from the end.
+
+        The table is rebuilt only when the cut levels or the composite
+        table (see `get_composite_lut`) change.  If it would have to be
+        rebuilt and `build` is False, `None` is returned.
+        """
+        lut = self.get_composite_lut(order)
+        dtype = np.dtype(dtype)
+        key = (dtype, float(loval), float(hival))
+        info = self._raw_lut_info
+        if info is not None and info[0] is lut and info[1] == key:
+            return info[2]
+        if not build:
+            return None
+
+        # all values of the type, ordered so that each value's table
+        # entry is at index `value` (mod the number of values)
+        values = np.arange(2 ** (8 * dtype.itemsize),
+                           dtype='u%d' % dtype.itemsize).view(dtype)
+        f = np.empty(values.shape, dtype=np.result_type(dtype, 1.0))
+        idx = self._cut_to_index(values, loval, hival, len(lut), f,
+                                 np.empty(values.shape, dtype=np.uint))
+        raw_lut = lut[idx]
+
+        self._raw_lut_info = (lut, key, raw_lut)
+        return raw_lut
+
     def get_hasharray(self, idx):
         # route through the Distribute stage so callers (e.g. the OpenGL
         # colormap builder) get scaled integer indices, matching the fast
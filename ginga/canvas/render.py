@@ -13,7 +13,7 @@ from ginga import trcalc, colors
 from ginga.fonts import font_asst
 from ginga.util import pipeline
 from ginga.util.stages import render
-from ginga.misc import Bunch
+from ginga.misc import Bunch, BufferPool
 
 
 class RenderError(Exception):
@@ -516,7 +516,9 @@ class StandardPipelineRenderer(RendererBase):
                                  ctr=(0, 0),
                                  win_dim=(0, 0),
                                  order=self.std_order)
-        self.pipeline.set(state=self.state)
+        # pool of arrays reused by the stages between redraws
+        self.bufpool = BufferPool.BufferPool()
+        self.pipeline.set(state=self.state, bufpool=self.bufpool)
         # initialize pipeline
         self.pipeline.invalidate()
 
@@ -578,8 +580,11 @@ class StandardPipelineRenderer(RendererBase):
         outarr = self.pipeline.get_data(last_stage)
 
         # reorder as caller needs it
-        outarr = self.reorder(dst_order, outarr, src_order=src_order)
-        outarr = np.ascontiguousarray(outarr)
+        res = self.reorder(dst_order, outarr, src_order=src_order)
+        if np.may_share_memory(res, outarr):
+            # output buffer is reused by the pipeline on the next redraw
+            res = np.array(res, order='C')
+        outarr = np.ascontiguousarray(res)
         if dtype is not None:
             outarr = outarr.astype(dtype, copy=False)
         return outarr
@@ -596,8 +601,32 @@ class StandardPipelineRenderer(RendererBase):
     def get_window_size(self):
         return self.state.win_dim
 
+    def rotate_2d(self, rot_deg):
+        if self._update_bg():
+            self.viewer.redraw(whence=0)
+        else:
+            super().rotate_2d(rot_deg)
+
+    def transform_2d(self, state):
+        if self._update_bg():
+            self.viewer.redraw(whence=0)
+        else:
+            super().transform_2d(state)
+
+    def _update_bg(self):
+        # The background is only big enough for rotation when the viewer
+        # is rotated, so rebuild it if the size needed has changed.
+        # Returns True if it was rebuilt.
+        dims = self.stage.createbg.get_bg_dims()
+        if self.pipeline.get('org_dim', None) == dims:
+            return False
+        self.pipeline.run_stage_idx(0)
+        return True
+
     def resize(self, dims):
         self._resize(dims)
+        # buffers of the old size are no longer useful
+        self.bufpool.clear()
         #self.pipeline.invalidate()
         self.pipeline.run_stage_idx(0)
         self.viewer.redraw(whence=0)
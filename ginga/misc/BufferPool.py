@@ -0,0 +1,83 @@
+#
+# BufferPool.py -- a pool of reusable numpy arrays
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ginga.misc import Bunch
+
+__all__ = ['BufferPool']
+
+
+class BufferPool:
+    """A pool of numpy arrays that can be handed out and returned, so
+    that code which repeatedly needs arrays of the same size (e.g. the
+    stages of a rendering pipeline) does not have to allocate new ones
+    each time.
+
+    Arrays are keyed on (shape, dtype, order), where `order` is any
+    additional hashable value the caller wants to distinguish buffers by
+    (e.g. the RGB order of the bands).
+
+    Parameters
+    ----------
+    max_free : int (optional, default 8)
+        Maximum number of returned arrays to hold for reuse.  When more
+        than this are held, the least recently returned are discarded.
+
+    """
+
+    def __init__(self, max_free=8):
+        self.max_free = max_free
+
+        # (key, id) => array, in order of release
+        self._free = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_key(self, shape, dtype, order):
+        return (tuple(shape), np.dtype(dtype).str, order)
+
+    def acquire(self, shape, dtype, order=None):
+        """Return an array of the given `shape` and `dtype`.  The contents
+        of the array are undefined.
+        """
+        key = self._get_key(shape, dtype, order)
+        with self._lock:
+            for fkey in reversed(self._free):
+                if fkey[0] == key:
+                    self.hits += 1
+                    return self._free.pop(fkey)
+            self.misses += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, arr, order=None):
+        """Return array `arr` to the pool for reuse.  The caller must not
+        use the array after it is released.
+        """
+        if arr is None:
+            return
+        key = self._get_key(arr.shape, arr.dtype, order)
+        with self._lock:
+            self._free[(key, id(arr))] = arr
+            while len(self._free) > self.max_free:
+                self._free.popitem(last=False)
+
+    def clear(self):
+        """Discard all arrays held for reuse."""
+        with self._lock:
+            self._free.clear()
+
+    def get_stats(self):
+        with self._lock:
+            nbytes = sum([arr.nbytes for arr in self._free.values()])
+            return Bunch.Bunch(hits=self.hits, misses=self.misses,
+                               count=len(self._free), nbytes=nbytes)
+
+# END
@@ -6,7 +6,24 @@
 #
 # TODO: use (or subclass) python collections.deque instead?
 #
+import bisect
+import itertools
 import threading
+import weakref
+from collections import OrderedDict
+
+from ginga.misc import Bunch
+
+# source of access times, shared by all data sources so that the least
+# recently used item can be found across them
+_access_count = itertools.count()
+
+
+def _sizeof(value):
+    get_nbytes = getattr(value, 'get_nbytes', None)
+    if get_nbytes is not None:
+        return get_nbytes()
+    return getattr(value, 'nbytes', 0)
 
 
 class TimeoutError(Exception):
@@ -17,17 +34,119 @@ class Empty(Exception):
     pass
 
 
+class CacheBudget:
+    """A limit on the total number of bytes held by a group of data
+    sources (e.g. the caches of all channels).
+
+    When the items of the member data sources hold more than `maxbytes`
+    bytes, the least recently used item of any member is evicted, until
+    the group is within the budget.  The most recently used item of each
+    member (normally the one being viewed) is never evicted.
+
+    The size of an item is measured when it is added or used, so an item
+    that grows afterwards (e.g. when an image pyramid is built for it) is
+    accounted for the next time it is viewed.
+
+    Parameters
+    ----------
+    maxbytes : int or `None`
+        Maximum number of bytes to hold (`None` or 0 for no limit).
+
+    sizeof : callable or `None`
+        Function returning the size in bytes of an item.  The default
+        calls the ``get_nbytes()`` method of the item, or uses its
+        ``nbytes`` attribute (0 if it has neither).
+
+    """
+    def __init__(self, maxbytes=None, sizeof=None):
+        self.maxbytes = maxbytes
+        if sizeof is None:
+            sizeof = _sizeof
+        self.sizeof = sizeof
+        self.members = weakref.WeakSet()
+        self.lock = threading.RLock()
+
+    def add_member(self, datasrc):
+        with self.lock:
+            self.members.add(datasrc)
+
+    def get_nbytes(self):
+        """Return the number of bytes held by all the members."""
+        with self.lock:
+            return sum([datasrc.get_nbytes() for datasrc in self.members])
+
+    def set_maxbytes(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.enforce()
+
+    def enforce(self):
+        """Evict items until the members are within the budget."""
+        if not self.maxbytes:
+            return
+        with self.lock:
+            members = list(self.members)
+            while sum([datasrc.get_nbytes() for datasrc in members]) > \
+                    self.maxbytes:
+                # the least recently used item is the oldest of the
+                # least recently used items of the members
+                lru = None
+                for datasrc in members:
+                    item = datasrc._get_lru_item()
+                    if item is not None and (lru is None or
+                                             item[1] < lru[1][1]):
+                        lru = (datasrc, item)
+                if lru is None:
+                    break
+                datasrc, (key, atime) = lru
+                datasrc._evict(key, atime)
+
+
 class Datasrc:
-    """Class to handle internal data cache."""
-    def __init__(self, length=0):
+    """Class to handle internal data cache.
+
+    Items are evicted, least recently used first, when there are more
+    than `length` of them or when the group of data sources sharing
+    `budget` holds too many bytes.  An item is used when it is added or
+    when it is fetched with `get` or marked with `touch` (e.g. when it
+    is viewed).
+
+    Parameters
+    ----------
+    length : int or `None`
+        Maximum number of items to hold (`None` or 0 for no limit).
+
+    maxbytes : int or `None`
+        Maximum number of bytes held by this data source (`None` for no
+        limit).  Ignored if `budget` is given.
+
+    budget : `CacheBudget` or `None`
+        Byte budget shared with other data sources.
+
+    """
+    def __init__(self, length=0, maxbytes=None, budget=None):
         self.length = length
         self.cursor = -1
         self.datums = {}
         self.history = []
         self.sortedkeys = []
+        # (access time, size) of items, least recently used first
+        self.lru = OrderedDict()
+        self.nbytes = 0
         self.cond = threading.Condition()
         self.newdata = threading.Event()
 
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if budget is None and maxbytes is not None:
+            budget = CacheBudget(maxbytes=maxbytes)
+        self.budget = budget
+        self.sizeof = _sizeof
+        if budget is not None:
+            self.sizeof = budget.sizeof
+            budget.add_member(self)
+
     def __getitem__(self, key):
         with self.cond:
             return self.datums[key]
@@ -51,19 +170,57 @@ class Datasrc:
         with self.cond:
             return len(self.history)
 
-    def push(self, key, value):
+    def get(self, key, default=None):
+        """Return the item for `key` (or `default` if it is not held),
+        marking it as used.
+        """
+        with self.cond:
+            if key not in self.datums:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._use(key)
+            return self.datums[key]
+
+    def touch(self, key):
+        """Mark the item for `key` as used, if it is held."""
         with self.cond:
-            if key in self.history:
+            if key in self.datums:
+                self._use(key)
+
+        # NOTE: the item may have grown since it was last used
+        self._enforce_budget()
+
+    def push(self, key, value, recent=True):
+        """Add `value` for `key`, marking it as used.
+
+        If `recent` is False, the item is added as the second most
+        recently used item instead, so that the most recently used one
+        (e.g. the item being viewed) is not evicted to make room for it.
+        """
+        with self.cond:
+            mru = None
+            if not recent and len(self.lru) > 0:
+                mru = next(reversed(self.lru))
+            if key in self.datums:
                 self.history.remove(key)
+            else:
+                bisect.insort(self.sortedkeys, key)
 
             self.history.append(key)
 
             self.datums[key] = value
+            self._use(key)
+            if mru is not None and mru != key:
+                self._use(mru)
             self._eject_old()
 
             self.newdata.set()
             self.cond.notify()
 
+        # NOTE: outside of our lock, as the budget locks the other members
+        self._enforce_budget()
+
     def pop_one(self):
         with self.cond:
             if len(self.history) == 0:
@@ -80,24 +237,77 @@ class Datasrc:
 
     def remove(self, key):
         with self.cond:
-            val = self.datums[key]
+            val = self.datums.pop(key)
             self.history.remove(key)
-            del self.datums[key]
-
-            self.sortedkeys = list(self.datums.keys())
-            self.sortedkeys.sort()
+            atime, size = self.lru.pop(key)
+            self.nbytes -= size
+            self._remove_sorted(key)
             return val
 
+    def _use(self, key):
+        # mark the item as most recently used, and (re)measure its size
+        atime, size = self.lru.pop(key, (None, 0))
+        new_size = self.sizeof(self.datums[key])
+        self.nbytes += new_size - size
+        self.lru[key] = (next(_access_count), new_size)
+
+    def _remove_sorted(self, key):
+        i = bisect.bisect_left(self.sortedkeys, key)
+        if i < len(self.sortedkeys) and self.sortedkeys[i] == key:
+            self.sortedkeys.pop(i)
+        else:
+            # NOTE: keys that are not mutually comparable may not sort
+            # consistently
+            self.sortedkeys.remove(key)
+
     def _eject_old(self):
-        # Eject oldest cache unless there is no cache limit
+        # Eject least recently used items unless there is no cache limit
         if (self.length is not None) and (self.length > 0):
             while len(self.history) > self.length:
-                oldest = self.history.pop(0)
-                del self.datums[oldest]
+                lru = next(iter(self.lru))
+                self.remove(lru)
+                self.evictions += 1
+
+    def _enforce_budget(self):
+        if self.budget is not None:
+            self.budget.enforce()
+
+    def _get_lru_item(self):
+        """Return (key, access time) of the least recently used item, if
+        it may be evicted to meet the budget (i.e. it is not also the most
+        recently used one), else `None`.
+        """
+        with self.cond:
+            if len(self.lru) < 2:
+                return None
+            key = next(iter(self.lru))
+            return (key, self.lru[key][0])
+
+    def _evict(self, key, atime):
+        """Evict the item for `key` if it has not been used since
+        `atime`.  Returns True if it was evicted.
+        """
+        with self.cond:
+            if key not in self.lru or self.lru[key][0] != atime:
+                return False
+            self.remove(key)
+            self.evictions += 1
+            return True
+
+    def get_nbytes(self):
+        """Return the number of bytes held by the items."""
+        with self.cond:
+            return self.nbytes
 
-        # Update sorted keys regardless
-        self.sortedkeys = list(self.datums.keys())
-        self.sortedkeys.sort()
+    def get_stats(self):
+        """Return a Bunch of the cache statistics (hits, misses,
+        evictions, count and nbytes).
+        """
+        with self.cond:
+            return Bunch.Bunch(hits=self.hits, misses=self.misses,
+                               evictions=self.evictions,
+                               count=len(self.datums),
+                               nbytes=self.nbytes)
 
     def index(self, key):
         with self.cond:
@@ -126,7 +336,7 @@ class Datasrc:
     def keys(self, sort='alpha'):
         with self.cond:
             if sort == 'alpha':
-                return self.sortedkeys
+                return list(self.sortedkeys)
             elif sort == 'time':
                 return self.history
             else:
@@ -0,0 +1,140 @@
+#
+# LRUCache.py -- a bounded, thread-safe least-recently-used cache
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+import threading
+from collections import OrderedDict
+
+from ginga.misc import Bunch
+
+__all__ = ['LRUCache']
+
+
+def _sizeof(value):
+    return getattr(value, 'nbytes', 0)
+
+
+class LRUCache:
+    """A mapping that evicts the least recently used items when it grows
+    beyond a limit on the number of items and/or on the total number of
+    bytes held.
+
+    Parameters
+    ----------
+    maxsize : int or `None`
+        Maximum number of items to hold (`None` for no limit).
+
+    maxbytes : int or `None`
+        Maximum number of bytes to hold (`None` for no limit).
+
+    sizeof : callable or `None`
+        Function returning the size in bytes of a cached value.  The
+        default uses the ``nbytes`` attribute of the value (0 if missing).
+
+    """
+
+    def __init__(self, maxsize=None, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        if sizeof is None:
+            sizeof = _sizeof
+        self.sizeof = sizeof
+
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            size = self.sizeof(value)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._nbytes += size
+            self._evict()
+
+    def remove(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key):
+        value = self._items.pop(key)
+        self._nbytes -= self._sizes.pop(key)
+        return value
+
+    def _evict(self):
+        # never evict the most recently added item, even if it alone
+        # exceeds the byte limit
+        while len(self._items) > 1 and self._over_limit():
+            key = next(iter(self._items))
+            self._remove(key)
+            self.evictions += 1
+
+    def _over_limit(self):
+        if self.maxsize is not None and len(self._items) > self.maxsize:
+            return True
+        return self.maxbytes is not None and self._nbytes > self.maxbytes
+
+    def set_limits(self, maxsize=None, maxbytes=None):
+        with self._lock:
+            self.maxsize = maxsize
+            self.maxbytes = maxbytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+
+    def keys(self):
+        with self._lock:
+            return list(self._items.keys())
+
+    def get_nbytes(self):
+        return self._nbytes
+
+    def get_stats(self):
+        with self._lock:
+            return Bunch.Bunch(hits=self.hits, misses=self.misses,
+                               evictions=self.evictions,
+                               count=len(self._items), nbytes=self._nbytes)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._items[key]
+            self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        self.remove(key)
+
+# END
@@ -0,0 +1,99 @@
+#
+# SortedList.py -- a list kept in sorted order
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+import bisect
+import itertools
+
+__all__ = ['SortedList']
+
+
+class SortedList:
+    """A sequence of items kept sorted by a key function.
+
+    Items are located by bisection, so finding the position of an item,
+    inserting it and removing it do not scan or re-sort the list.  Items
+    with equal keys are kept in the order they were added.  Items are
+    identified by identity (not equality) and need not be hashable.
+
+    Parameters
+    ----------
+    key : callable or `None`
+        Function returning the sort key of an item.  If `None`, items
+        are kept in the order they were added.
+
+    """
+
+    def __init__(self, key=None):
+        self.key = key
+        self._counter = itertools.count()
+        self._items = []
+        # sort keys of the items, parallel to _items
+        self._keys = []
+        # id(item) => sort key
+        self._keymap = {}
+
+    def _make_key(self, item):
+        seq = next(self._counter)
+        if self.key is None:
+            return (seq,)
+        return (self.key(item), seq)
+
+    def add(self, item):
+        """Add `item` and return its position."""
+        if id(item) in self._keymap:
+            raise ValueError("item is already in the list")
+        key = self._make_key(item)
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._items.insert(i, item)
+        self._keymap[id(item)] = key
+        return i
+
+    def index(self, item):
+        """Return the position of `item`.  Raises ValueError if it is
+        not in the list.
+        """
+        key = self._keymap.get(id(item), None)
+        if key is None:
+            raise ValueError("item is not in the list")
+        return bisect.bisect_left(self._keys, key)
+
+    def remove(self, item):
+        """Remove `item` and return the position it had."""
+        i = self.index(item)
+        del self._keys[i]
+        del self._items[i]
+        del self._keymap[id(item)]
+        return i
+
+    def set_key(self, key):
+        """Change the key function and re-sort the items.  Items with
+        equal keys keep their relative order.
+        """
+        self.key = key
+        items = self._items
+        self._items, self._keys, self._keymap = [], [], {}
+        if key is not None:
+            items = sorted(items, key=key)
+        for item in items:
+            k = self._make_key(item)
+            self._items.append(item)
+            self._keys.append(k)
+            self._keymap[id(item)] = k
+
+    def __contains__(self, item):
+        return id(item) in self._keymap
+
+    def __getitem__(self, idx):
+        return self._items[idx]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+# END
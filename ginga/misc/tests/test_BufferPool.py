@@ -0,0 +1,36 @@
+import numpy as np
+
+from ginga.misc.BufferPool import BufferPool
+
+
+class TestBufferPool:
+
+    def test_reuse(self):
+        pool = BufferPool()
+        arr = pool.acquire((10, 20, 4), np.uint8, order='RGBA')
+        assert arr.shape == (10, 20, 4) and arr.dtype == np.uint8
+        pool.release(arr, order='RGBA')
+
+        # different order or dtype does not get the released array
+        assert pool.acquire((10, 20, 4), np.uint8, order='BGRA') is not arr
+        assert pool.acquire((10, 20, 4), np.float32, order='RGBA') is not arr
+
+        assert pool.acquire((10, 20, 4), np.uint8, order='RGBA') is arr
+        # not handed out twice
+        assert pool.acquire((10, 20, 4), np.uint8, order='RGBA') is not arr
+
+        stats = pool.get_stats()
+        assert (stats.hits, stats.misses, stats.count) == (1, 4, 0)
+
+    def test_max_free(self):
+        pool = BufferPool(max_free=2)
+        arrs = [pool.acquire((5, 5), np.float64) for i in range(3)]
+        for arr in arrs:
+            pool.release(arr)
+        assert pool.get_stats().count == 2
+        # least recently released was discarded
+        got = [pool.acquire((5, 5), np.float64) for i in range(2)]
+        assert set(map(id, got)) == set(map(id, arrs[1:]))
+        pool.release(got[0])
+        pool.clear()
+        assert pool.get_stats().nbytes == 0
@@ -0,0 +1,78 @@
+import numpy as np
+
+from ginga.misc.Datasrc import Datasrc, CacheBudget
+
+
+class TestDatasrc:
+
+    def test_count_lru(self):
+        ds = Datasrc(length=2)
+        ds['b'] = 1
+        ds['a'] = 2
+        assert ds.get('b') == 1
+        ds['c'] = 3
+        # 'a' was least recently used
+        assert 'a' not in ds
+        assert ds.keys(sort='alpha') == ['b', 'c']
+
+        stats = ds.get_stats()
+        assert (stats.hits, stats.misses, stats.evictions) == (1, 0, 1)
+        assert ds.get('a') is None
+        assert ds.get_stats().misses == 1
+
+    def test_sorted_keys(self):
+        ds = Datasrc()
+        for key in ['d', 'b', 'c', 'a', 'b']:
+            ds[key] = key
+        assert ds.keys(sort='alpha') == ['a', 'b', 'c', 'd']
+        ds.remove('c')
+        assert ds.keys(sort='alpha') == ['a', 'b', 'd']
+
+    def test_maxbytes(self):
+        ds = Datasrc(maxbytes=250)
+        for key in ['a', 'b', 'c']:
+            ds[key] = np.zeros(100, dtype=np.uint8)
+        assert ds.keys(sort='alpha') == ['b', 'c']
+        assert ds.get_nbytes() == 200
+
+        # touched item survives
+        ds.touch('b')
+        ds['d'] = np.zeros(100, dtype=np.uint8)
+        assert ds.keys(sort='alpha') == ['b', 'd']
+
+        # most recently used item is kept even if over budget
+        ds['e'] = np.zeros(1000, dtype=np.uint8)
+        assert ds.keys(sort='alpha') == ['e']
+
+    def test_shared_budget(self):
+        budget = CacheBudget(maxbytes=300)
+        ds1 = Datasrc(budget=budget)
+        ds2 = Datasrc(budget=budget)
+        ds1['a'] = np.zeros(100, dtype=np.uint8)
+        ds1['b'] = np.zeros(100, dtype=np.uint8)
+        ds2['c'] = np.zeros(100, dtype=np.uint8)
+        assert budget.get_nbytes() == 300
+
+        # evicts the least recently used item across both caches
+        ds2['d'] = np.zeros(100, dtype=np.uint8)
+        assert 'a' not in ds1
+        assert len(ds1) == 1 and len(ds2) == 2
+        assert ds1.get_stats().evictions == 1
+
+        budget.set_maxbytes(100)
+        assert budget.get_nbytes() == 200
+        assert ds1.keys() == ['b'] and ds2.keys() == ['d']
+
+    def test_item_growth(self):
+        # sizes are re-measured when items are used
+        class Item:
+            nbytes = 100
+
+        ds = Datasrc(maxbytes=350)
+        for key in ['a', 'b', 'c']:
+            ds[key] = Item()
+        ds['a'].nbytes = 200
+        assert ds.get_nbytes() == 300
+        ds.touch('a')
+        assert ds.keys(sort='alpha') == ['a', 'c']
+        assert ds.get_stats().nbytes == 300
@@ -0,0 +1,44 @@
+import pytest
+
+from ginga.misc import Bunch
+from ginga.misc.SortedList import SortedList
+
+
+class TestSortedList:
+
+    def test_add_remove(self):
+        sl = SortedList(key=lambda b: b.name)
+        items = [Bunch.Bunch(name=name) for name in ['c', 'a', 'd', 'b']]
+        assert [sl.add(item) for item in items] == [0, 0, 2, 1]
+        assert [item.name for item in sl] == ['a', 'b', 'c', 'd']
+        assert sl.index(items[0]) == 2
+        assert items[3] in sl
+
+        assert sl.remove(items[1]) == 0
+        assert items[1] not in sl
+        assert len(sl) == 3 and sl[0] is items[3]
+        with pytest.raises(ValueError):
+            sl.index(items[1])
+        with pytest.raises(ValueError):
+            sl.add(items[0])
+
+    def test_equal_keys(self):
+        # items with equal keys and equal values are kept in the order
+        # added, and told apart
+        sl = SortedList(key=lambda b: b.t)
+        items = [Bunch.Bunch(t=1), Bunch.Bunch(t=0), Bunch.Bunch(t=1)]
+        for item in items:
+            sl.add(item)
+        assert sl.index(items[0]) == 1 and sl.index(items[2]) == 2
+        sl.remove(items[2])
+        assert sl[1] is items[0]
+
+    def test_set_key(self):
+        sl = SortedList()
+        items = [Bunch.Bunch(name=name) for name in ['b', 'c', 'a']]
+        for item in items:
+            sl.add(item)
+        assert list(sl) == items
+        sl.set_key(lambda b: b.name)
+        assert [item.name for item in sl] == ['a', 'b', 'c']
+        assert sl.index(items[1]) == 2
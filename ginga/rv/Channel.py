@@ -6,7 +6,9 @@
 #
 import time
 
+from ginga import AutoCuts
 from ginga.misc import Bunch, Datasrc, Callback, Future, Settings
+from ginga.misc.SortedList import SortedList
 from ginga.util import viewer as gviewer
 
 
@@ -58,8 +60,14 @@ class Channel(Callback.Callbacks):
             datasrc = Datasrc.Datasrc(num_images)
         self.datasrc = datasrc
         self.cursor = -1
-        self.history = []
+        # metadata of the data objects, sorted by the channel sort order
+        self.history = SortedList()
         self.image_index = {}
+        # state of prefetching of neighboring images
+        self._prefetch_gen = 0
+        self._prefetching = set()
+        self._prefetch_wanted = set()
+        self._prefetch_switch = None
         # external entities can attach stuff via this attribute
         self.extdata = Bunch.Bunch()
 
@@ -195,7 +203,8 @@ class Channel(Callback.Callbacks):
         image = self.datasrc[imname]
         return image
 
-    def add_image(self, image, silent=False, bulk_add=False):
+    def add_image(self, image, silent=False, bulk_add=False,
+                  prefetched=False):
         """Add a data object to this channel.
 
         Parameters
@@ -211,6 +220,11 @@ class Channel(Callback.Callbacks):
             Indicates a "bulk add", in which the callback is not
             suppressed, but the channel viewer will not be updated.
 
+        prefetched : bool (optional, defaults to `False`)
+            Indicates a prefetched data object, which is cached behind
+            the most recently used one (normally the one being viewed),
+            so that that one is not evicted to make room for it.
+
         Callbacks
         ---------
         Will invoke `add-image`, if `silent` is `False`
@@ -223,7 +237,7 @@ class Channel(Callback.Callbacks):
         self.logger.debug("Adding image '%s' in channel %s" % (
             imname, self.name))
 
-        self.datasrc[imname] = image
+        self.datasrc.push(imname, image, recent=not prefetched)
 
         # Has this image been loaded into a channel before?
         info = image.get('image_info', None)
@@ -448,11 +462,12 @@ class Channel(Callback.Callbacks):
             # image info is already present
             return False
 
-        self.history.append(info)
+        i = self.history.add(info)
         self.image_index[info.name] = info
 
-        if self.hist_sort is not None:
-            self.history.sort(key=self.hist_sort)
+        # adjust cursor as necessary
+        if 0 <= self.cursor and i <= self.cursor:
+            self.cursor += 1
 
         self.fv.make_async_gui_callback('add-image-info', self, info)
 
@@ -544,8 +559,7 @@ class Channel(Callback.Callbacks):
         if imname in self.image_index:
             info = self.image_index[imname]
             del self.image_index[imname]
-            i = self.history.index(info)
-            self.history.remove(info)
+            i = self.history.remove(info)
 
             # adjust cursor as necessary
             if i < self.cursor:
@@ -664,6 +678,15 @@ class Channel(Callback.Callbacks):
             Data object in this channel to be viewed in an appropriate
             channel viewer.
         """
+        # mark the image as recently used, so that it is the last to be
+        # evicted from the cache
+        imname = image.get('name', None)
+        if imname is not None:
+            self.datasrc.touch(imname)
+
+        self._prefetch_switch = None
+        self.prefetch_neighbors(image)
+
         curimage = self.get_current_image()
         if curimage == image:
             self.logger.debug("Apparently no need to set channel viewer.")
@@ -692,6 +715,13 @@ class Channel(Callback.Callbacks):
                 imname, errmsg))
             raise ChannelError(errmsg)
 
+        if imname in self._prefetching:
+            # image is being loaded by the prefetcher; switch to it
+            # when it arrives
+            self.logger.debug("Image '%s' is being prefetched" % (imname))
+            self._prefetch_switch = imname
+            return
+
         # Do we have a way to reconstruct this image from a future?
         info = self.image_index[imname]
         if info.image_future is not None:
@@ -708,27 +738,12 @@ class Channel(Callback.Callbacks):
                 info.time_modified = None
                 self.fv.make_async_gui_callback('add-image-info', self, info)
 
-            def _load_n_switch(imname, path, image_future):
+            def _load_n_switch(info):
                 # this will be executed in a non-gui thread
-                # reconstitute the image
-                image = self.fv.error_wrap(image_future.thaw)
-                if isinstance(image, Exception):
-                    errmsg = "Error reconstituting image: %s" % (str(image))
-                    self.logger.error(errmsg)
-                    raise image
-
-                profile = info.get('profile', None)
-                if profile is None:
-                    profile = self.get_image_profile(image)
-                    info.profile = profile
-                # perpetuate some of the image metadata
-                image.set(image_future=image_future, name=imname, path=path,
-                          image_info=info, profile=profile)
-
+                image = self._thaw_image(info)
                 self.fv.gui_do(_switch, image)
 
-            self.fv.nongui_do(_load_n_switch, imname, info.path,
-                              info.image_future)
+            self.fv.nongui_do(_load_n_switch, info)
 
         elif info.path is not None:
             # Do we have a path? We can try to reload it
@@ -741,6 +756,163 @@ class Channel(Callback.Callbacks):
         else:
             raise ChannelError("No way to recreate image '%s'" % (imname))
 
+    def _thaw_image(self, info):
+        """Reconstitute the data object described by `info` from its
+        image future.  This is executed in a non-gui thread.
+        """
+        image = self.fv.error_wrap(info.image_future.thaw)
+        if isinstance(image, Exception):
+            errmsg = "Error reconstituting image: %s" % (str(image))
+            self.logger.error(errmsg)
+            raise image
+
+        profile = info.get('profile', None)
+        if profile is None:
+            profile = self.get_image_profile(image)
+            info.profile = profile
+        # perpetuate some of the image metadata
+        image.set(image_future=info.image_future, name=info.name,
+                  path=info.path, image_info=info, profile=profile)
+        return image
+
+    def get_prefetch_list(self, image):
+        """Return the metadata of the data objects that should be
+        prefetched when `image` is viewed.
+
+        These are the next ``prefetch_next`` and previous
+        ``prefetch_prev`` items (per the channel settings) of the channel
+        history around `image`, nearest first, that are not in memory and
+        can be reconstituted from an image future.  If the cache has a
+        byte budget, only as many items as fit in it (taking each to be
+        the size of `image`) are returned.
+        """
+        num_next = self.settings.get('prefetch_next', 0)
+        num_prev = self.settings.get('prefetch_prev', 0)
+        length = self.datasrc.get_bufsize()
+        if length:
+            # leave room in the cache for the image being viewed
+            num_prev = max(0, min(num_prev, length - 1 - num_next))
+            num_next = min(num_next, length - 1)
+
+        info = self.image_index.get(image.get('name', None), None)
+        if info is None or info not in self.history:
+            return []
+        idx = self.history.index(info)
+
+        num_hist = len(self.history)
+        offsets = []
+        for i in range(1, max(num_next, num_prev) + 1):
+            if i <= num_next and idx + i < num_hist:
+                offsets.append(idx + i)
+            if i <= num_prev and idx - i >= 0:
+                offsets.append(idx - i)
+
+        infos = [self.history[i] for i in offsets
+                 if (self.history[i].name not in self.datasrc and
+                     self.history[i].get('image_future', None) is not None)]
+
+        budget = self.datasrc.budget
+        if budget is not None and budget.maxbytes:
+            nbytes = budget.sizeof(image)
+            if nbytes > 0:
+                num = (budget.maxbytes - budget.get_nbytes()) // nbytes
+                infos = infos[:max(0, num)]
+        return infos
+
+    def prefetch_neighbors(self, image):
+        """Load the data objects neighboring `image` in the channel
+        history into the channel's memory cache on a non-gui thread (see
+        get_prefetch_list()), so that stepping through the channel with
+        next_image() and prev_image() does not wait for them to be loaded.
+
+        Any prefetching started for a previously viewed image is
+        abandoned.  The auto cut levels and thumbnails of the prefetched
+        data objects are also prepared.
+        """
+        self._prefetch_gen += 1
+        infos = self.get_prefetch_list(image)
+        # items still queued by an earlier prefetch are loaded by it
+        self._prefetch_wanted = set([info.name for info in infos])
+        infos = [info for info in infos
+                 if info.name not in self._prefetching]
+        if len(infos) == 0:
+            return
+
+        self._prefetching.update([info.name for info in infos])
+        self.fv.nongui_do(self._prefetch_images, self._prefetch_gen, infos)
+
+    def _prefetch_images(self, gen, infos):
+        # this will be executed in a non-gui thread
+        for info in infos:
+            if (gen != self._prefetch_gen and
+                    info.name not in self._prefetch_wanted and
+                    info.name != self._prefetch_switch):
+                # a different image has been viewed since we started
+                self.fv.gui_do(self._prefetching.discard, info.name)
+                continue
+
+            try:
+                self.logger.debug("prefetching image '%s'" % (info.name))
+                image = self._thaw_image(info)
+                self._prefetch_cut_levels(image)
+
+            except Exception as e:
+                self.logger.warning("Error prefetching image '%s': %s" % (
+                    info.name, str(e)))
+                image = None
+
+            self.fv.gui_do(self._add_prefetched, image, info)
+
+    def _prefetch_cut_levels(self, image):
+        # calculate and save the auto cut levels of the channel viewer for
+        # a prefetched image, so that they are not calculated when it
+        # is viewed
+        if (getattr(self.fitsimage, 'autocuts', None) is None or
+                not hasattr(image, 'get_cached_cut_levels')):
+            return
+        t_ = self.fitsimage.get_settings()
+        if t_.get('autocuts', 'off') == 'off':
+            return
+        # NOTE: the viewer's own autocuts object is not used from this
+        # thread; one made with the same settings has the same cache key
+        klass = AutoCuts.get_autocuts(t_.get('autocut_method', 'zscale'))
+        autocuts = klass(self.logger)
+        params = t_.get('autocut_params', [])
+        if len(params) > 0:
+            autocuts.update_params(**dict(params))
+        if image.get_cached_cut_levels(autocuts) is None:
+            cuts = autocuts.calc_cut_levels(image)
+            image.set_cached_cut_levels(autocuts, cuts)
+
+    def _add_prefetched(self, image, info):
+        # this will be executed in the gui thread
+        self._prefetching.discard(info.name)
+        switch = (self._prefetch_switch == info.name)
+        if switch:
+            self._prefetch_switch = None
+
+        if image is None or info.name not in self.image_index:
+            if switch:
+                # prefetch failed; try the usual way
+                self.switch_name(info.name)
+            return
+
+        # keep the image being viewed as the most recently used item
+        curimage = self.get_current_image()
+        if curimage is not None:
+            self.datasrc.touch(curimage.get('name', None))
+
+        if info.name not in self.datasrc:
+            self.add_image(image, silent=True, prefetched=not switch)
+            # for the thumbnail
+            self.fv.make_async_gui_callback('add-image', self.name,
+                                            image, info)
+        else:
+            image = self.datasrc[info.name]
+
+        if switch:
+            self.switch_image(image)
+
     def _configure_sort(self):
         self.hist_sort = lambda info: info.time_added
         # set sorting function
@@ -748,11 +920,17 @@ class Channel(Callback.Callbacks):
         if sort_order == 'alpha':
             # sort history alphabetically
             self.hist_sort = lambda info: info.name
+        self.history.set_key(self.hist_sort)
 
     def _sort_changed_ext_cb(self, setting, value):
+        cur_info = None
+        if 0 <= self.cursor < len(self.history):
+            cur_info = self.history[self.cursor]
+
         self._configure_sort()
 
-        self.history.sort(key=self.hist_sort)
+        if cur_info is not None:
+            self.cursor = self.history.index(cur_info)
 
     def get_image_profile(self, image):
         """Get the image profile for data object `image`.
@@ -16,9 +16,10 @@ from collections import OrderedDict
 
 # Local application imports
 from ginga import cmap, imap
-from ginga.misc import Bunch, Timer, Future
-from ginga.util import catalog, iohelper, loader
+from ginga.misc import Bunch, Timer, Future, Datasrc
+from ginga.util import catalog, iohelper, loader, bulkload
 from ginga.util import viewer as gviewer
+from ginga.util.io import io_fits
 from ginga.canvas.CanvasObject import drawCatalog
 from ginga.modes import modeinfo
 
@@ -77,12 +78,23 @@ class GingaShell(GenericShell):
                               channel_follows_focus=False,
                               scrollbars='off',
                               numImages=10,
+                              # byte limit on images held by all channels
+                              image_cache_maxbytes=None,
                               # Offset to add to numpy-based coords
                               # FITS standard
                               pixel_coords_offset=1.0,
                               # save primary header when loading files
                               save_primary_header=True,
                               inherit_primary_header=False,
+                              # 'mmap' to memory map uncompressed FITS data
+                              fits_load_mode=None,
+                              # save and use an index of the HDUs of
+                              # FITS files in $GINGA_HOME/cache
+                              fits_hdu_index=False,
+                              # loading of many files by open_uris()
+                              bulk_load_workers=4,
+                              bulk_load_max_bytes=1024**3,
+                              bulk_load_ordered=True,
                               cursor_interval=0.050,
                               confirm_shutdown=True,
                               download_folder=None,
@@ -100,6 +112,13 @@ class GingaShell(GenericShell):
                      'viewer-create'):
             self.enable_callback(name)
 
+        io_fits.AstropyFitsFileHandler.use_hdu_index = settings.get(
+            'fits_hdu_index', False)
+
+        # Memory budget shared by the image caches of all channels
+        self.image_cache_budget = Datasrc.CacheBudget(
+            maxbytes=settings.get('image_cache_maxbytes', None))
+
         # Initialize the timer factory.  Under the async (single event
         # loop) task pool there are no usable threads, so use event-loop
         # timers instead of thread-based ones.
@@ -292,11 +311,13 @@ class GingaShell(GenericShell):
         """
         save_prihdr = self.settings.get('save_primary_header', False)
         inherit_prihdr = self.settings.get('inherit_primary_header', False)
+        load_mode = self.settings.get('fits_load_mode', None)
         try:
             data_obj = loader.load_data(filespec, logger=self.logger,
                                         idx=idx,
                                         save_primary_header=save_prihdr,
-                                        inherit_primary_header=inherit_prihdr)
+                                        inherit_primary_header=inherit_prihdr,
+                                        load_mode=load_mode)
         except Exception as e:
             errmsg = "Failed to load file '%s': %s" % (
                 filespec, str(e))
@@ -684,11 +705,7 @@ class GingaShell(GenericShell):
 
         def _open_file(opener_class):
             # kwd args to pass to opener
-            kwargs = dict()
-            save_prihdr = self.settings.get('save_primary_header', False)
-            kwargs['save_primary_header'] = save_prihdr
-            inherit_prihdr = self.settings.get('inherit_primary_header', False)
-            kwargs['inherit_primary_header'] = inherit_prihdr
+            kwargs = self._get_opener_kwargs()
 
             # open the file and load the items named by the index
             opener = opener_class(self.logger)
@@ -747,6 +764,107 @@ class GingaShell(GenericShell):
             if len(self.gui_dialog_list) == 1:
                 self.nongui_do_future(future)
 
+    def _get_opener_kwargs(self):
+        # kwd args to pass to file openers
+        kwargs = dict()
+        save_prihdr = self.settings.get('save_primary_header', False)
+        kwargs['save_primary_header'] = save_prihdr
+        inherit_prihdr = self.settings.get('inherit_primary_header', False)
+        kwargs['inherit_primary_header'] = inherit_prihdr
+        kwargs['load_mode'] = self.settings.get('fits_load_mode', None)
+        return kwargs
+
+    def _bulk_open_file(self, pathspec):
+        """Load the data objects named by `pathspec` (a local file, with
+        an optional index) in a worker of the bulk loader.  Returns a list
+        of the data objects, or `None` if the file needs the user to
+        choose an opener (see open_file_cont()).
+        """
+        info = iohelper.get_fileinfo(pathspec)
+        filepath = info.filepath
+        if not os.path.exists(filepath):
+            raise ValueError("File does not appear to exist: '%s'" % (
+                filepath))
+
+        try:
+            typ, subtyp = iohelper.guess_filetype(filepath)
+
+        except Exception:
+            return None
+
+        openers = loader.get_openers("{}/{}".format(typ, subtyp))
+        if len(openers) != 1:
+            return None
+
+        data_objs = []
+        opener = openers[0].opener(self.logger)
+        with opener.open_file(filepath) as io_f:
+            io_f.load_idx_cont(info.idx, data_objs.append,
+                               **self._get_opener_kwargs())
+        return data_objs
+
+    def bulk_open_files(self, pathspecs, loader_cont_fn):
+        """Open a set of local files with a bounded number of workers.
+
+        The files are loaded by the number of workers in the general
+        setting ``bulk_load_workers``, while the estimated size of the
+        files loaded but not yet handed on is kept under
+        ``bulk_load_max_bytes``.  The data objects are passed to
+        `loader_cont_fn` in the GUI thread, in batches, in the order of
+        the files if ``bulk_load_ordered`` is `True` (otherwise as they
+        are loaded).  Progress is shown in the status bar.
+
+        Parameters
+        ----------
+        pathspecs : list of str
+            The paths of the files to load (with an optional index).
+
+        loader_cont_fn : func (data_obj) -> None
+            A continuation consisting of a function of one argument
+            that does something with the data_obj created by the loader
+
+        Returns
+        -------
+        bl : `~ginga.util.bulkload.BulkLoader`
+            The loader, which can be used to cancel the loading or get
+            statistics.
+        """
+        def _loader_cont_gui(data_obj):
+            # open_file_cont() calls its continuation in a worker thread
+            self.gui_do(loader_cont_fn, data_obj)
+
+        def _deliver(batch):
+            for pathspec, result in batch:
+                if result is None:
+                    # needs the user to choose an opener
+                    self.nongui_do(self.open_file_cont, pathspec,
+                                   _loader_cont_gui)
+                elif isinstance(result, Exception):
+                    errmsg = "Error opening '%s': %s" % (pathspec,
+                                                         str(result))
+                    self.logger.error(errmsg)
+                    self.show_error(errmsg)
+                else:
+                    for data_obj in result:
+                        loader_cont_fn(data_obj)
+
+        def _progress(stats):
+            # (files skipped by cancelling are not counted)
+            self.show_status("Loaded %d/%d files (%d failed), "
+                             "%.1f files/s, %.1f MB/s" % (
+                                 stats.done, stats.total - stats.cancelled,
+                                 stats.failed, stats.rate,
+                                 stats.throughput / 1024**2))
+
+        bl = bulkload.BulkLoader(
+            self._bulk_open_file, _deliver, self.nongui_do, self.gui_do,
+            num_workers=self.settings.get('bulk_load_workers', 4),
+            max_bytes=self.settings.get('bulk_load_max_bytes', None),
+            ordered=self.settings.get('bulk_load_ordered', True),
+            progress_cb=_progress)
+        bl.load(pathspecs)
+        return bl
+
     def open_uris(self, uris, chname=None, bulk_add=False, download_cb=None):
         """Open a set of URIs.
 
@@ -792,6 +910,38 @@ class GingaShell(GenericShell):
         def load_file(filepath):
             self.nongui_do(self.open_file_cont, filepath, show_dataobj)
 
+        # local files are loaded by the bulk loader, if there are several
+        # of them and we have threads
+        use_bulk = (self.settings.get('bulk_load_workers', 4) > 0 and
+                    self.get_taskpool_type() != 'async')
+        if use_bulk:
+            local = []
+            for uri in uris:
+                info = iohelper.get_fileinfo(uri)
+                if info.ondisk:
+                    local.append(uri)
+            use_bulk = len(local) > 1
+
+        if use_bulk:
+            # the first data object is shown unless this is a bulk add
+            show_first = [not bulk_add]
+
+            def show_dataobj_cont(data_obj):
+                channel.add_image(data_obj, bulk_add=not show_first[0])
+                show_first[0] = False
+
+            pathspecs = []
+            for uri in uris:
+                info = iohelper.get_fileinfo(uri)
+                if info.ondisk:
+                    pathspecs.append(info.filepath + info.idx)
+                else:
+                    # remote files are downloaded and loaded as before
+                    self.open_uri_cont(uri, load_file_bulk,
+                                       download_cb=download_cb)
+            self.bulk_open_files(pathspecs, show_dataobj_cont)
+            return
+
         # determine whether first file is loaded as a bulk load
         if bulk_add:
             self.open_uri_cont(uris[0], load_file_bulk, download_cb=download_cb)
@@ -1367,10 +1517,13 @@ class GingaShell(GenericShell):
                                   raisenew=True, genthumb=True,
                                   renderer=self.settings.get('renderer', None),
                                   focus_indicator=False,
-                                  sort_order='loadtime')
+                                  sort_order='loadtime',
+                                  prefetch_next=0, prefetch_prev=0)
 
             self.logger.debug("Adding channel '%s'" % (chname))
-            channel = Channel(chname, self, datasrc=None,
+            datasrc = Datasrc.Datasrc(num_images,
+                                      budget=self.image_cache_budget)
+            channel = Channel(chname, self, datasrc=datasrc,
                               settings=settings)
 
             if workspace is not None:
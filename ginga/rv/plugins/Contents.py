@@ -19,6 +19,9 @@ Click again to sort the other way.
           if applicable.
           This can be customized by setting the "columns" parameter in
           the "plugin_Contents.cfg" settings file.
+          For images that are not loaded, only the headers are read
+          (in the background) to fill in the columns; set the
+          "fetch_headers" parameter to False to turn this off.
 
 The active image in the currently focused channel will normally be
 highlighted. Double-click on an image will force that image to be
@@ -58,8 +61,12 @@ mechanisms for suppressing certain images from showing up in ``Contents``:
   "genthumb" setting is True for that channel.
 
 """
+import threading
+from collections import deque
+
 from ginga import GingaPlugin
 from ginga.gw import Widgets
+from ginga.util import loader
 
 __all__ = ['Contents']
 
@@ -84,7 +91,9 @@ class Contents(GingaPlugin.GlobalPlugin):
                                    color_alternate_rows=True,
                                    row_font_color='green',
                                    closeable=not spec.get('hidden', False),
-                                   max_rows_for_col_resize=100)
+                                   max_rows_for_col_resize=100,
+                                   fetch_headers=True,
+                                   fetch_headers_batch=100)
         self.settings.load(onError='silent')
 
         # For table-of-contents pane
@@ -97,6 +106,13 @@ class Contents(GingaPlugin.GlobalPlugin):
             'highlight_tracks_keyboard_focus', True)
         self._hl_path = set([])
         self.chnames = []
+        # (chname, image_info) of unloaded images whose headers are to
+        # be read
+        self._hdr_queue = deque()
+        # (chname, name) of the queued images
+        self._hdr_pending = set([])
+        self._hdr_lock = threading.Lock()
+        self._hdr_fetching = False
 
         fv.add_callback('add-image', self.add_image_cb)
         fv.add_callback('remove-image', self.remove_image_cb)
@@ -242,7 +258,10 @@ class Contents(GingaPlugin.GlobalPlugin):
         if image is not None:
             header = image.get_header()
         else:
-            header = {}
+            # header read by fetch_headers, if any
+            header = info.get('header', None)
+            if header is None:
+                header = {}
 
         for hdr, key in self.columns:
             dct[key] = str(header.get(key, 'N/A'))
@@ -262,6 +281,8 @@ class Contents(GingaPlugin.GlobalPlugin):
     def recreate_toc(self):
         self.logger.debug("Recreating table of contents...")
         self.treeview.set_tree(self.name_dict)
+        # e.g. for images added while we were stopped
+        self.fetch_missing_headers()
 
         # re-highlight as necessary
         if self.highlight_tracks_keyboard_focus:
@@ -345,10 +366,119 @@ class Contents(GingaPlugin.GlobalPlugin):
             image = channel.get_loaded_image(name)
         except KeyError:
             # images that are not yet loaded will show "N/A" for keywords
+            # until their headers have been read
             image = None
+            if (self.settings.get('fetch_headers', True) and
+                    image_info.get('path', None) is not None and
+                    'header' not in image_info):
+                self.fetch_header(chname, image_info)
 
         self.add_image_cb(viewer, chname, image, image_info)
 
+    def fetch_missing_headers(self):
+        """Read the headers of the images in the contents that are not
+        loaded and whose headers have not been read (see fetch_header()).
+        """
+        if not self.settings.get('fetch_headers', True):
+            return
+        for chname, file_dict in self.name_dict.items():
+            try:
+                channel = self.fv.get_channel(chname)
+            except KeyError:
+                continue
+            for name in file_dict:
+                if name in channel.datasrc:
+                    continue
+                try:
+                    info = channel.get_image_info(name)
+                except KeyError:
+                    continue
+                if (info.get('path', None) is not None and
+                        'header' not in info):
+                    self.fetch_header(chname, info)
+
+    def fetch_header(self, chname, image_info):
+        """Read the header (only) of an image that is not loaded, in a
+        non-GUI thread, and show its keywords when it has been read.
+        """
+        key = (chname, image_info.name)
+        with self._hdr_lock:
+            if key in self._hdr_pending:
+                # already queued
+                return
+            self._hdr_pending.add(key)
+            self._hdr_queue.append((chname, image_info))
+            if self._hdr_fetching:
+                return
+            self._hdr_fetching = True
+        self.fv.nongui_do(self._fetch_headers)
+
+    def _fetch_headers(self):
+        # runs in a non-GUI thread; reads the queued headers and passes
+        # them to the GUI thread in batches
+        inherit_prihdr = self.fv.settings.get('inherit_primary_header',
+                                              False)
+        batch_size = self.settings.get('fetch_headers_batch', 100)
+        batch = []
+        while True:
+            with self._hdr_lock:
+                if len(self._hdr_queue) == 0:
+                    self._hdr_fetching = False
+                    break
+                chname, info = self._hdr_queue.popleft()
+
+            try:
+                header = loader.load_header(
+                    info.path, idx=info.get('idx', None), logger=self.logger,
+                    inherit_primary_header=inherit_prihdr)
+
+            except Exception as e:
+                self.logger.warning("Error reading header of '%s': %s" % (
+                    info.path, str(e)))
+                # don't try again
+                header = {}
+
+            batch.append((chname, info, header))
+            if len(batch) >= batch_size:
+                self.fv.gui_do(self.update_headers, batch)
+                batch = []
+
+        if len(batch) > 0:
+            self.fv.gui_do(self.update_headers, batch)
+
+    def update_headers(self, batch):
+        """Update the entries of the unloaded images in `batch`, a list
+        of (chname, image_info, header), from the headers read for them.
+        """
+        tree_dict = {}
+        for chname, info, header in batch:
+            with self._hdr_lock:
+                self._hdr_pending.discard((chname, info.name))
+            # NOTE: image_info is shared, so it is only changed here,
+            # in the GUI thread
+            info.header = header
+
+            file_dict = self.name_dict.get(chname, None)
+            if file_dict is None or info.name not in file_dict:
+                # removed since the header was queued
+                continue
+            channel = self.fv.get_channel(chname)
+            try:
+                channel.get_loaded_image(info.name)
+                # loaded since the header was queued
+                continue
+            except KeyError:
+                pass
+
+            dct = self.get_info(chname, info.name, None, info)
+            file_dict[info.name].update({key: dct[key]
+                                         for hdr, key in self.columns})
+            tree_dict.setdefault(chname, {})[info.name] = file_dict[info.name]
+
+        if len(tree_dict) > 0 and self.gui_up:
+            # update just these rows, in place
+            self.treeview.add_tree(tree_dict)
+
     def remove_image_cb(self, viewer, chname, name, path):
         if not self.gui_up:
             return False
@@ -600,6 +730,9 @@ class Contents(GingaPlugin.GlobalPlugin):
         self.recreate_toc()
 
     def stop(self):
+        with self._hdr_lock:
+            self._hdr_queue.clear()
+            self._hdr_pending.clear()
         self.treeview = None
         self.gui_up = False
 
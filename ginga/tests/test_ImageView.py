@@ -1,9 +1,30 @@
 import logging
+import time
 
 import numpy as np
 
 from ginga import AstroImage
+from ginga.misc import Bunch, Callback
 from ginga.pilw.ImageViewPil import CanvasView
+from ginga.util.bgjob import BackgroundJob
+
+
+class _Timer(Callback.Callbacks):
+    """Stand-in for a GUI timer, which is fired by the test."""
+    def __init__(self):
+        super().__init__()
+        self.enable_callback('expired')
+
+    def start(self, interval):
+        pass
+
+
+def _wait_job(job):
+    for i in range(100):
+        if job.done:
+            break
+        time.sleep(0.05)
+    assert job.done
 
 
 class TestImageView:
@@ -93,3 +114,276 @@ class TestImageView:
         result = np.array([(x1, y1), (x2, y2)])
         expected = np.array([[376., 482.25], [426., 519.75]])
         assert np.all(np.isclose(expected, result))
+
+    def test_render_num_workers(self):
+        # rendering in parallel bands must give the same result as
+        # rendering the whole image at once
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(500, 400)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(np.random.rand(300, 400).astype(np.float32))
+        viewer.set_image(image)
+        viewer.set_pan(180.3, 151.7)
+        viewer.scale_to(1.7, 1.7)
+        arr1 = viewer.get_image_as_array()
+        viewer.get_settings().set(render_num_workers=4)
+        viewer.redraw_now(whence=0)
+        arr2 = viewer.get_image_as_array()
+        assert np.array_equal(arr1, arr2)
+
+    def test_render_fused_rgbmap(self):
+        # the fused cuts + color map path must give the same result as
+        # the separate Cuts and RGBMap stages
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        data = np.random.normal(100.0, 30.0, (150, 220)).astype(np.float32)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        viewer.set_image(image)
+        viewer.set_color_map('rainbow')
+        viewer.set_color_algorithm('log')
+        viewer.scale_to(1.3, 1.3)
+        settings = viewer.get_settings()
+        for cuts in [(80.0, 130.0), (100.0, 100.0)]:
+            viewer.cut_levels(*cuts)
+            settings.set(render_fused_rgbmap=False)
+            arr1 = viewer.get_image_as_array()
+            settings.set(render_fused_rgbmap=True)
+            arr2 = viewer.get_image_as_array()
+            assert np.array_equal(arr1, arr2)
+
+    def test_histeq_cdf(self):
+        # with histogram equalization, the CDF is computed from a sample
+        # of the image once per image data and cut levels
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        data = np.random.normal(100.0, 30.0, (400, 500))
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        viewer.set_image(image)
+        viewer.set_color_algorithm('histeq')
+        viewer.cut_levels(50.0, 150.0)
+        dist = viewer.get_rgbmap().get_dist()
+
+        arr1 = viewer.get_image_as_array()
+        assert dist.has_cdf()
+        cdf = dist.hash
+        viewer.set_pan(100, 100)
+        viewer.get_image_as_array()
+        assert dist.hash is cdf
+        viewer.cut_levels(60.0, 150.0)
+        viewer.get_image_as_array()
+        assert dist.hash is not cdf
+
+        # 'full' replaces the sampled CDF with the exact one (calculated
+        # while rendering, when the viewer has no timer)
+        settings = viewer.get_settings()
+        settings.set(histeq_cdf='full')
+        viewer.get_image_as_array()
+        idx = viewer.autocuts.cut_levels(data, 60.0, 150.0, vmin=0,
+                                         vmax=dist.hashsize - 1)
+        exp = np.clip(dist.calc_cdf(idx.astype(np.uint)), 0.0, 1.0)
+        assert np.allclose(dist.hash, exp)
+
+        # 'view' equalizes the visible pixels on each redraw
+        settings.set(histeq_cdf='view')
+        viewer.cut_levels(50.0, 150.0)
+        viewer.set_pan(250, 200)
+        arr2 = viewer.get_image_as_array()
+        assert not dist.has_cdf()
+        assert arr2.shape == arr1.shape
+
+    def test_histeq_cdf_full_lazy(self):
+        # the full CDF of lazy data is summed a block of rows at a time
+        # in the background, and installed through the viewer's timer
+        # (i.e. in the GUI thread)
+        from ginga.util.lazyarray import ChunkCachedArray
+
+        viewer = CanvasView(logger=self.logger)
+        viewer.make_timer = _Timer
+        viewer.configure(300, 200)
+        data = np.random.normal(100.0, 30.0, (400, 500))
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(ChunkCachedArray(data, chunks=(64, 64)))
+        viewer.set_image(image)
+        viewer.set_color_algorithm('histeq')
+        viewer.cut_levels(50.0, 150.0)
+        viewer.get_settings().set(histeq_cdf='full')
+        stage = viewer.get_canvas_image().get_cache(viewer).minipipe[2]
+        stage.histeq_block_points = 5000
+        viewer.get_image_as_array()
+
+        bgjob = stage.cdf_bgjob
+        job = bgjob.job
+        dist = viewer.get_rgbmap().get_dist()
+        cdf = dist.hash
+        # not started until the cut levels have settled
+        assert not job.started
+        bgjob.timer.make_callback('expired')
+        _wait_job(job)
+        idx = viewer.autocuts.cut_levels(data, 50.0, 150.0, vmin=0,
+                                         vmax=dist.hashsize - 1)
+        exp = np.clip(dist.calc_cdf(idx.astype(np.uint)), 0.0, 1.0)
+        # not installed until the timer fires
+        assert dist.hash is cdf
+        bgjob.timer.make_callback('expired')
+        assert not bgjob.is_pending()
+        assert np.allclose(dist.hash, exp)
+
+        # a superseded job gives up between blocks of rows
+        calls = []
+        cut_levels = job.autocuts.cut_levels
+
+        def _cut_levels(*args, **kwargs):
+            calls.append(1)
+            bgjob.cancel()
+            return cut_levels(*args, **kwargs)
+
+        job.autocuts = Bunch.Bunch(cut_levels=_cut_levels)
+        bgjob.job = job
+        assert stage._calc_full_cdf(job) is None
+        assert len(calls) == 1
+
+    def test_autocut_async(self):
+        # cut levels calculated in the background end up the same as
+        # those calculated synchronously
+        data = np.random.normal(100.0, 30.0, (600, 500))
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        viewer.set_image(image)
+        exp = viewer.get_cut_levels()
+
+        # without a timer, they are calculated synchronously
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        viewer.get_settings().set(autocut_async=True)
+        viewer.set_image(image)
+        assert not viewer.is_autocut_pending()
+        assert viewer.get_cut_levels() == exp
+
+        viewer = CanvasView(logger=self.logger)
+        viewer.make_timer = _Timer
+        viewer.ac_bgjob = BackgroundJob(viewer)
+        viewer.configure(300, 200)
+        viewer.get_settings().set(autocut_async=True)
+        image2 = AstroImage.AstroImage(logger=self.logger)
+        image2.set_data(data)
+        viewer.set_image(image2)
+        bgjob = viewer.ac_bgjob
+        job = bgjob.job
+        assert viewer.is_autocut_pending()
+        bgjob.timer.make_callback('expired')
+        _wait_job(job)
+        # not set until the timer fires
+        assert viewer.get_cut_levels() == job.cuts
+        bgjob.timer.make_callback('expired')
+        assert not viewer.is_autocut_pending()
+        assert viewer.get_cut_levels() == exp
+
+        # results for an image that is no longer shown are discarded
+        viewer.cut_levels(1.0, 2.0)
+        job = Bunch.Bunch(image=AstroImage.AstroImage(logger=self.logger),
+                          version=1, cuts=(1.0, 2.0), result=(3.0, 4.0),
+                          done=True)
+        viewer._autocut_done(job)
+        assert viewer.get_cut_levels() == (1.0, 2.0)
+
+        # a job superseded before it is run is not calculated
+        calls = []
+        viewer.autocuts.calc_cut_levels = calls.append
+        job = bgjob.start(viewer._calc_autocut_job, viewer._autocut_done,
+                          autocuts=viewer.autocuts, vip=None)
+        bgjob.start(viewer._calc_autocut_job, viewer._autocut_done,
+                    autocuts=viewer.autocuts, vip=None)
+        bgjob._run(job)
+        assert job.done and len(calls) == 0
+
+    def test_autocut_cache(self):
+        # auto cut levels are calculated once per image data and autocuts
+        # parameters
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        viewer.get_settings().set(autocuts='on')
+        images = []
+        for i in range(2):
+            image = AstroImage.AstroImage(logger=self.logger)
+            image.set_data(np.random.normal(100.0, 30.0, (200, 300)))
+            images.append(image)
+
+        calls = []
+        calc_cut_levels = viewer.autocuts.calc_cut_levels
+
+        def _calc(image):
+            calls.append(image)
+            return calc_cut_levels(image)
+
+        viewer.autocuts.calc_cut_levels = _calc
+        for i in range(3):
+            for image in images:
+                viewer.set_image(image)
+        assert len(calls) == 2
+
+        # new data or parameters invalidate the cached levels
+        images[1].set_data(np.random.normal(100.0, 30.0, (200, 300)))
+        assert len(calls) == 3
+        viewer.autocuts.update_params(contrast=0.5)
+        viewer.set_image(images[0])
+        assert len(calls) == 4
+
+        # levels calculated from several images are not cached with one
+        canvas = viewer.get_canvas()
+        obj = canvas.get_draw_class('normimage')(150, 100, images[1])
+        obj.is_data = True
+        canvas.add(obj)
+        viewer.auto_levels()
+        viewer.auto_levels()
+        assert len(calls) == 6
+        assert images[0].get_cached_cut_levels(viewer.autocuts) is not None
+
+    def test_output_buffers(self):
+        # arrays returned from the viewer must not be overwritten by
+        # later redraws, even though the renderer reuses its buffers
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(200, 150)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(np.random.rand(100, 100))
+        viewer.set_image(image)
+        arrs = []
+        for rot_deg in (0.0, 30.0, 60.0, 90.0):
+            viewer.rotate(rot_deg)
+            arr = viewer.get_image_as_array()
+            arrs.append((arr, arr.copy()))
+        for arr, arr_copy in arrs:
+            assert np.array_equal(arr, arr_copy)
+        assert viewer.renderer.bufpool.get_stats().hits > 0
+
+    def test_unrotated_background(self):
+        # without rotation the background is only slightly larger than
+        # the window; it grows when the viewer is rotated
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(301, 200)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(np.random.rand(150, 250))
+        viewer.set_image(image)
+        viewer.scale_to(1.37, 1.37)
+        pipe = viewer.renderer.pipeline
+
+        for flip_x, flip_y, swap_xy in [(False, False, False),
+                                        (True, False, True),
+                                        (False, True, True)]:
+            viewer.transform(flip_x, flip_y, swap_xy)
+            viewer.rotate(0.0)
+            exp_dims = (202, 303) if swap_xy else (303, 202)
+            assert pipe.get('org_dim') == exp_dims
+            arr1 = viewer.get_image_as_array()
+            # same result as a full redraw
+            viewer.redraw_now(whence=0)
+            assert np.array_equal(arr1, viewer.get_image_as_array())
+
+            viewer.rotate(45.0)
+            assert pipe.get('org_dim') == (381, 381)
+            arr1 = viewer.get_image_as_array()
+            viewer.redraw_now(whence=0)
+            assert np.array_equal(arr1, viewer.get_image_as_array())
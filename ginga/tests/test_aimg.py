@@ -85,4 +85,34 @@ class TestAstroImage:
         hdu2 = self.image.as_hdu()
         assert isinstance(hdu2, fits.PrimaryHDU)
 
+    def test_minmax(self):
+        """Test the min/max of an image, with NaN and infinite values.
+        """
+        data = np.linspace(-1.0, 1.0, 600 * 500).reshape((600, 500))
+        data[:300] = np.nan
+        data[310, 10] = np.inf
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        assert image.get_minmax() == (data[300, 0], np.inf)
+        assert image.get_minmax(noinf=True) == (data[300, 0], data[-1, -1])
+
+    def test_update_data_region(self):
+        """Test that the min/max follow in-place changes to the data.
+        """
+        data = np.zeros((1000, 400), dtype=np.int16)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        res = []
+        image.add_callback('modified', lambda img: res.append(img))
+
+        data[700:710, 20:30] = 100
+        image.update_data_region(20, 700, 30, 710)
+        assert image.get_minmax() == (0, 100)
+        assert len(res) == 1
+
+        data[700:710, 20:30] = -5
+        image.update_data_region(20, 700, 30, 710)
+        assert image.get_minmax() == (-5, 0)
+        assert image.get_minmax()[0].dtype == np.int16
+
 # END
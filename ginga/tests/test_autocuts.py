@@ -0,0 +1,146 @@
+import logging
+
+import numpy as np
+import pytest
+
+from ginga import AstroImage, AutoCuts
+
+
+class TestHistogram:
+
+    def setup_class(self):
+        self.logger = logging.getLogger("TestHistogram")
+
+    def _getdata(self, dtype):
+        data = np.random.normal(1000.0, 300.0, (700, 500)).astype(dtype)
+        if data.dtype.kind == 'f':
+            data[3, 4] = np.nan
+            data[100, 5] = np.inf
+            data[600, :] = -np.inf
+        return data
+
+    @pytest.mark.parametrize('dtype', [np.float32, np.float64, np.int16])
+    def test_chunked_histogram(self, dtype):
+        # the histogram accumulated over blocks of rows is the same as
+        # the histogram of all the finite values
+        data = self._getdata(dtype)
+        exp_dist, exp_bins = np.histogram(data[np.isfinite(data)],
+                                          bins=2048)
+        autocuts = AutoCuts.Histogram(self.logger)
+        for chunk_size in [1024 * 1024, 5000, 777]:
+            autocuts.chunk_size = chunk_size
+            bnch = autocuts.calc_histogram(data, pct=0.999, numbins=2048)
+            assert np.array_equal(bnch.dist, exp_dist)
+            assert np.array_equal(bnch.bins, exp_bins)
+
+    def test_full_dask(self):
+        da = pytest.importorskip('dask.array')
+        data = self._getdata(np.float32)
+        autocuts = AutoCuts.Histogram(self.logger, sample='full')
+        autocuts.chunk_size = 20000
+
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        exp = autocuts.calc_cut_levels(image)
+        image.set_data(da.from_array(data, chunks=(100, 100)))
+        assert autocuts.calc_cut_levels(image) == exp
+
+    def test_full_viewer(self):
+        # the viewer's image proxy is resolved to the image data, which
+        # is streamed in row blocks instead of being cut out whole
+        from ginga.pilw.ImageViewPil import CanvasView
+        from ginga.util.lazyarray import ChunkCachedArray
+
+        data = self._getdata(np.float32)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(ChunkCachedArray(data, chunks=(100, 100)))
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        viewer.set_autocut_params('histogram', sample='full')
+        autocuts = viewer.autocuts
+        autocuts.chunk_size = 20000
+        exp = autocuts.calc_cut_levels(image)
+
+        def _get_full(image, px_limit=None):
+            raise AssertionError("full data was cut out")
+
+        autocuts.get_full = _get_full
+        viewer.set_image(image)
+        assert viewer.get_cut_levels() == exp
+
+
+class TestZScale:
+
+    def setup_class(self):
+        self.logger = logging.getLogger("TestZScale")
+
+    @pytest.mark.parametrize('num', [3, 10, 1000, 20000])
+    def test_zscale_samples(self, num):
+        # the native fit gives the limits of astropy's ZScaleInterval
+        vis = pytest.importorskip('astropy.visualization')
+        rng = np.random.default_rng(42)
+        samples = np.concatenate([rng.normal(100.0, 10.0, num),
+                                  rng.uniform(0.0, 1.0e4, num // 10)])
+        exp = vis.ZScaleInterval(samples.size).get_limits(samples)
+        res = AutoCuts.zscale_samples(samples, contrast=0.25)
+        np.testing.assert_allclose(res, exp, rtol=1e-9)
+
+    def test_stratified_sample(self):
+        data = np.arange(1000 * 800, dtype=np.float64).reshape((1000, 800))
+        data[:500, :] = np.nan
+        autocuts = AutoCuts.ZScale(self.logger, num_points=1000)
+        sample = autocuts.get_stratified_sample(data, 1000)
+        # one point from each stratum, spread over the whole array
+        # rather than taken from the first rows
+        assert len(sample) == 500
+        assert np.all(np.diff(sample) > 0)
+        assert sample[-1] >= data[-1, 0]
+        # the sample is repeatable
+        np.testing.assert_array_equal(
+            autocuts.get_stratified_sample(data, 1000), sample)
+
+        mdata = np.ma.masked_array(data, mask=data > 600000)
+        sample = autocuts.get_stratified_sample(mdata, 1000)
+        assert sample.max() <= 600000
+
+    def test_cut_levels(self):
+        rng = np.random.default_rng(7)
+        data = rng.normal(1000.0, 30.0, (800, 600)).astype(np.float32)
+        autocuts = AutoCuts.ZScale(self.logger)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        loval, hival = autocuts.calc_cut_levels(image)
+        assert 850.0 < loval < 950.0
+        assert 1050.0 < hival < 1150.0
+        assert autocuts.calc_cut_levels_data(data) == (loval, hival)
+
+    def test_viewer(self):
+        # the viewer's image proxy is resolved to the image data, so the
+        # stratified sample (or the sample of a lazy array) is used
+        from ginga.pilw.ImageViewPil import CanvasView
+        from ginga.util.lazyarray import ChunkCachedArray
+
+        rng = np.random.default_rng(7)
+        data = rng.normal(1000.0, 30.0, (800, 600)).astype(np.float32)
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        viewer.set_autocut_params('zscale')
+        autocuts = viewer.autocuts
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        viewer.set_image(image)
+        assert viewer.get_cut_levels() == autocuts.calc_cut_levels_data(data)
+
+        arr = ChunkCachedArray(data, chunks=(100, 100))
+        calls = []
+        get_sample = arr.get_sample
+
+        def _get_sample(num_points):
+            calls.append(num_points)
+            return get_sample(num_points)
+
+        arr.get_sample = _get_sample
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(arr)
+        viewer.set_image(image)
+        assert len(calls) > 0
@@ -0,0 +1,112 @@
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+
+import threading
+import time
+import random
+
+from ginga.util.bulkload import BulkLoader
+
+
+class GuiQueue:
+    """Stand-in for the GUI thread: runs the deferred calls on demand."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def gui_do(self, fn, *args):
+        with self.lock:
+            self.calls.append((fn, args))
+
+    def run(self, timeout=10.0):
+        time_end = time.time() + timeout
+        while time.time() < time_end:
+            with self.lock:
+                calls, self.calls = self.calls, []
+            for fn, args in calls:
+                fn(*args)
+            time.sleep(0.001)
+
+
+def start_thread(fn):
+    threading.Thread(target=fn, daemon=True).start()
+
+
+class TestBulkLoader:
+
+    def _run(self, ordered, max_bytes=None, num_workers=3):
+        gui = GuiQueue()
+        batches = []
+        active = []
+        max_active = [0]
+        lock = threading.Lock()
+
+        def load_fn(item):
+            with lock:
+                active.append(item)
+                max_active[0] = max(max_active[0], len(active))
+            time.sleep(random.uniform(0, 0.005))
+            with lock:
+                active.remove(item)
+            if item == 7:
+                raise ValueError("bad item")
+            return item * 10
+
+        bl = BulkLoader(load_fn, batches.append, start_thread, gui.gui_do,
+                        num_workers=num_workers, max_bytes=max_bytes,
+                        ordered=ordered, sizeof=lambda item: 100)
+        bl.load(list(range(20)))
+        time_end = time.time() + 10
+        while not bl.is_done() and time.time() < time_end:
+            gui.run(timeout=0.01)
+        assert bl.is_done()
+        return bl, batches, max_active[0]
+
+    def test_ordered(self):
+        bl, batches, max_active = self._run(True)
+        results = [tup for batch in batches for tup in batch]
+        assert [item for item, result in results] == list(range(20))
+        assert isinstance(results[7][1], ValueError)
+        assert results[3][1] == 30
+        assert max_active <= 3
+
+        stats = bl.get_stats()
+        assert (stats.done, stats.failed, stats.pending) == (20, 1, 0)
+        assert stats.inflight_bytes == 0
+
+    def test_unordered_budget(self):
+        bl, batches, max_active = self._run(False, max_bytes=200)
+        results = [tup for batch in batches for tup in batch]
+        assert sorted([item for item, result in results]) == list(range(20))
+        # at most 2 items of 100 bytes outstanding
+        assert max_active <= 2
+
+    def test_cancel(self):
+        # items skipped by cancel() are counted as cancelled, while items
+        # already loading are delivered, even with a `None` result
+        gui = GuiQueue()
+        batches = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def load_fn(item):
+            started.set()
+            release.wait(10)
+            return None
+
+        bl = BulkLoader(load_fn, batches.append, start_thread, gui.gui_do,
+                        num_workers=1, ordered=True)
+        bl.load(list(range(5)))
+        assert started.wait(10)
+        bl.cancel()
+        release.set()
+        time_end = time.time() + 10
+        while not bl.is_done() and time.time() < time_end:
+            gui.run(timeout=0.01)
+        assert bl.is_done()
+
+        results = [tup for batch in batches for tup in batch]
+        assert results == [(0, None)]
+        stats = bl.get_stats()
+        assert (stats.done, stats.cancelled, stats.pending) == (1, 4, 0)
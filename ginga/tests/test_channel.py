@@ -0,0 +1,183 @@
+import logging
+
+import numpy as np
+
+from ginga import AstroImage
+from ginga.misc import Datasrc, Future, Settings
+from ginga.rv.Channel import Channel
+
+
+class _Shell:
+    """Stand-in for the reference viewer shell: GUI calls are made
+    right away and non-GUI calls are queued, to be run by the test.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.jobs = []
+
+    def nongui_do(self, method, *args, **kwdargs):
+        self.jobs.append((method, args, kwdargs))
+
+    def run_jobs(self):
+        while len(self.jobs) > 0:
+            method, args, kwdargs = self.jobs.pop(0)
+            method(*args, **kwdargs)
+
+    def gui_do(self, method, *args, **kwdargs):
+        method(*args, **kwdargs)
+
+    def error_wrap(self, method, *args, **kwdargs):
+        try:
+            return method(*args, **kwdargs)
+        except Exception as e:
+            return e
+
+    def make_async_gui_callback(self, *args, **kwdargs):
+        pass
+
+
+class _Viewer:
+
+    def __init__(self):
+        self.dataobj = None
+
+    def get_dataobj(self):
+        return self.dataobj
+
+
+class TestPrefetch:
+
+    def setup_method(self):
+        self.logger = logging.getLogger("TestPrefetch")
+        self.fv = _Shell(self.logger)
+        settings = Settings.SettingGroup(logger=self.logger)
+        settings.set_defaults(sort_order='alpha', numImages=10,
+                              prefetch_next=2, prefetch_prev=1)
+        self.channel = Channel('Image', self.fv, settings)
+        self.channel.viewer = _Viewer()
+        self.viewed = []
+        self.channel.view_object = self._view_object
+        self.loaded = []
+
+        for imname in ['a', 'b', 'c', 'd', 'e', 'f']:
+            future = Future.Future()
+            future.freeze(self._load, imname)
+            self.channel.add_history(imname, None, image_loader=self._load,
+                                     image_future=future)
+
+    def _load(self, imname):
+        self.loaded.append(imname)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(np.random.rand(20, 30))
+        image.set(name=imname)
+        return image
+
+    def _view_object(self, image):
+        self.viewed.append(image.get('name'))
+        self.channel.viewer.dataobj = image
+
+    def _get_image(self, imname):
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set(name=imname)
+        return image
+
+    def test_prefetch_list(self):
+        # nearest neighbors first, next before previous
+        channel = self.channel
+        infos = channel.get_prefetch_list(self._get_image('c'))
+        assert [info.name for info in infos] == ['d', 'b', 'e']
+
+        # items in memory are not prefetched; ends of the history
+        channel.datasrc['d'] = self._get_image('d')
+        infos = channel.get_prefetch_list(self._get_image('c'))
+        assert [info.name for info in infos] == ['b', 'e']
+        infos = channel.get_prefetch_list(self._get_image('f'))
+        assert [info.name for info in infos] == ['e']
+
+        # room is left in the cache for the image being viewed
+        channel.datasrc.set_bufsize(2)
+        infos = channel.get_prefetch_list(self._get_image('a'))
+        assert [info.name for info in infos] == ['b']
+
+    def test_prefetch_list_budget(self):
+        # only as many items as fit in the byte budget are prefetched
+        channel = self.channel
+        image = self._load('c')
+        nbytes = image.get_nbytes()
+        budget = Datasrc.CacheBudget(maxbytes=3 * nbytes)
+        channel.datasrc = Datasrc.Datasrc(10, budget=budget)
+        channel.datasrc['c'] = image
+        infos = channel.get_prefetch_list(image)
+        assert [info.name for info in infos] == ['d', 'b']
+
+        channel.datasrc['x'] = self._load('x')
+        infos = channel.get_prefetch_list(image)
+        assert [info.name for info in infos] == ['d']
+
+    def test_prefetch_keeps_viewed(self):
+        # a prefetched image does not evict the image being viewed
+        channel = self.channel
+        image = self._load('c')
+        budget = Datasrc.CacheBudget(maxbytes=2 * image.get_nbytes())
+        channel.datasrc = Datasrc.Datasrc(10, budget=budget)
+        channel.datasrc['c'] = image
+        channel.viewer.dataobj = image
+        # e.g. an earlier prefetched image, used after the viewed one
+        channel.datasrc['a'] = self._load('a')
+
+        for imname in ['d', 'b']:
+            channel._add_prefetched(self._load(imname),
+                                    channel.image_index[imname])
+            assert 'c' in channel.datasrc
+            assert next(reversed(channel.datasrc.lru)) == 'c'
+        assert channel.datasrc.keys(sort='alpha') == ['b', 'c']
+
+    def test_prefetch_neighbors(self):
+        channel = self.channel
+        channel.prefetch_neighbors(self._get_image('c'))
+        assert channel._prefetching == set(['d', 'b', 'e'])
+        # viewing another image abandons the unstarted prefetches that
+        # are no longer neighbors
+        channel.prefetch_neighbors(self._get_image('e'))
+        assert channel._prefetching == set(['d', 'b', 'e', 'f'])
+        self.fv.run_jobs()
+        assert self.loaded == ['d', 'f']
+        assert channel.datasrc.keys(sort='alpha') == ['d', 'f']
+        assert len(channel._prefetching) == 0
+
+    def test_switch_while_prefetching(self):
+        # switching to an image being prefetched views it when it arrives,
+        # even if other images are viewed in the meantime
+        channel = self.channel
+        channel.prefetch_neighbors(self._get_image('c'))
+        channel.switch_name('d')
+        channel.switch_name('e')
+        assert channel._prefetch_switch == 'e'
+        assert len(self.viewed) == 0
+
+        self.fv.run_jobs()
+        assert self.viewed == ['e']
+        assert self.loaded[:3] == ['d', 'b', 'e']
+        assert channel._prefetch_switch is None
+        assert len(channel._prefetching) == 0
+        # the switched-to image is the most recently used one
+        assert next(reversed(channel.datasrc.lru)) == 'e'
+
+    def test_prefetch_cut_levels(self):
+        # the cut levels are prepared with the viewer's algorithm and
+        # parameters, but not with the viewer's own autocuts object
+        from ginga.pilw.ImageViewPil import CanvasView
+
+        viewer = CanvasView(logger=self.logger)
+        viewer.set_autocut_params('zscale', contrast=0.3)
+        viewer.enable_autocuts('on')
+        calls = []
+        viewer.autocuts.calc_cut_levels = calls.append
+        self.channel.fitsimage = viewer
+
+        self.channel.prefetch_neighbors(self._get_image('c'))
+        self.fv.run_jobs()
+        assert len(calls) == 0
+        for imname in ['b', 'd', 'e']:
+            image = self.channel.datasrc[imname]
+            assert image.get_cached_cut_levels(viewer.autocuts) is not None
@@ -104,6 +104,26 @@ class TestCmap:
         actual = set(ginga.cmap.get_names())  # Can include matplotlib names
         assert expected <= actual
 
+    def test_builtin_cmaps(self):
+        # built in maps are read from the resource file on first use
+        cm = ginga.cmap.get_cmap('soss')
+        assert cm.clst.shape == (ginga.cmap.min_cmap_len, 3)
+        np.testing.assert_array_equal(cm.clst, ginga.cmap.cmap_soss)
+        np.testing.assert_allclose(cm.clst[1], (0.003922, 0.003007, 0.0))
+
+    def test_ColorMap_loader(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+
+        cm = ColorMap('test-name', loader=loader)
+        assert len(calls) == 0
+        assert len(cm.clst) == 2
+        assert len(cm.get_colors(5)) == 5
+        assert len(calls) == 1
+
     # TODO: Add tests for matplotlib functions
 
 
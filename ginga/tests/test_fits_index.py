@@ -0,0 +1,141 @@
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+
+import os
+
+import pytest
+
+from ginga.util.io.fits_index import FitsIndexCache
+
+
+def test_index_roundtrip(tmp_path):
+    path = str(tmp_path / 'test.fits')
+    with open(path, 'wb') as out_f:
+        out_f.write(b'\0' * 2880)
+    cache = FitsIndexCache(cache_dir=str(tmp_path / 'index'))
+    assert cache.load(path) is None
+
+    hdus = [dict(index=0, name='PRIMARY', extver=1, header_offset=0)]
+    cache.save(path, hdus)
+    assert cache.load(path) == hdus
+
+    # index is stale once the file changes
+    with open(path, 'ab') as out_f:
+        out_f.write(b'\0' * 2880)
+    assert cache.load(path) is None
+
+    cache.save(path, hdus)
+    cache.remove(path)
+    assert cache.load(path) is None
+
+
+def test_open_with_index(tmp_path):
+    np = pytest.importorskip('numpy')
+    fits = pytest.importorskip('astropy.io.fits')
+    from ginga.util.io import io_fits
+
+    path = str(tmp_path / 'mef.fits')
+    hdus = [fits.PrimaryHDU()]
+    for i in range(5):
+        data = np.full((4, 6), i, dtype=np.int16)
+        hdus.append(fits.ImageHDU(data, name='SCI', ver=i + 1))
+    hdus.append(fits.CompImageHDU(np.full((4, 6), 9, dtype=np.int32),
+                                  name='COMP'))
+    fits.HDUList(hdus).writeto(path)
+
+    cache = FitsIndexCache(cache_dir=str(tmp_path / 'index'))
+    results = []
+    for i in range(2):
+        opener = io_fits.AstropyFitsFileHandler(None)
+        opener.hdu_index_cache = cache
+        opener.open_file(path, use_hdu_index=True)
+        # the second open uses the index saved by the first
+        assert (opener.hdu_index is not None) == (i == 1)
+        assert len(opener) == 7
+
+        image = opener.get_hdu(('SCI', 4))
+        assert image.get_data().shape == (4, 6)
+        assert image.get_data()[0, 0] == 3
+        first = opener.get_hdu(None)
+        comp = opener.get_hdu(('COMP', 1))
+        assert comp.get_data()[0, 0] == 9
+        # HDUs read from their offsets share one file and are kept
+        assert opener.get_hdu(('SCI', 4)).get_data()[0, 0] == 3
+        if i == 1:
+            assert opener._hdu_file is not None
+            assert len(opener._hdus) == 3
+        results.append((image.get('idx'), first.get('idx'),
+                        sorted(map(str, opener.get_directory().keys()))))
+        opener.close()
+
+    assert results[0] == results[1]
+    assert results[1][1] == ('SCI', 1)
+    assert os.path.isdir(str(tmp_path / 'index'))
+
+
+def test_open_without_index(tmp_path):
+    np = pytest.importorskip('numpy')
+    fits = pytest.importorskip('astropy.io.fits')
+    from ginga.util.io import io_fits
+
+    path = str(tmp_path / 'test.fits')
+    fits.PrimaryHDU(np.zeros((4, 6))).writeto(path)
+
+    # the index is only saved if asked for
+    cache = FitsIndexCache(cache_dir=str(tmp_path / 'index'))
+    opener = io_fits.AstropyFitsFileHandler(None)
+    opener.hdu_index_cache = cache
+    with opener.open_file(path):
+        assert opener.get_hdu(0).get_data().shape == (4, 6)
+    assert cache.load(path) is None
+
+
+def test_open_with_index_fallback(tmp_path):
+    # if HDUs cannot be read from their offsets, they are read with
+    # astropy, with one warning for the file
+    np = pytest.importorskip('numpy')
+    fits = pytest.importorskip('astropy.io.fits')
+    import logging
+    from ginga.util.io import io_fits
+
+    path = str(tmp_path / 'mef.fits')
+    hdus = [fits.PrimaryHDU()]
+    for i in range(3):
+        hdus.append(fits.ImageHDU(np.full((4, 6), i, dtype=np.int16),
+                                  name='SCI', ver=i + 1))
+    fits.HDUList(hdus).writeto(path)
+
+    class _Handler(logging.Handler):
+        def __init__(self):
+            super().__init__(level=logging.WARNING)
+            self.records = []
+
+        def emit(self, record):
+            self.records.append(record)
+
+    logger = logging.getLogger('test_fits_index')
+    handler = _Handler()
+    logger.addHandler(handler)
+
+    cache = FitsIndexCache(cache_dir=str(tmp_path / 'index'))
+    opener = io_fits.AstropyFitsFileHandler(logger)
+    opener.hdu_index_cache = cache
+    with opener.open_file(path, use_hdu_index=True):
+        pass
+
+    # an index that does not match the file
+    index = cache.load(path)
+    for rec in index:
+        rec['data_offset'] += 1
+    cache.save(path, index)
+    try:
+        with opener.open_file(path, use_hdu_index=True):
+            assert opener.hdu_index is not None
+            for i in range(3, 0, -1):
+                image = opener.get_hdu(('SCI', i))
+                assert image.get_data()[0, 0] == i - 1
+            assert len(opener._hdus) == 0
+            assert opener._num_fits_read == 4
+    finally:
+        logger.removeHandler(handler)
+    assert len(handler.records) == 1
@@ -0,0 +1,81 @@
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+
+import numpy as np
+import pytest
+
+from ginga.util.lazyarray import MappedArray, ChunkCachedArray
+
+fits = pytest.importorskip('astropy.io.fits')
+from ginga.util.io import io_fits  # noqa: E402
+from ginga.util.io.fits_index import FitsIndexCache  # noqa: E402
+
+
+class TestLazyLoad:
+
+    def _load(self, path, load_mode):
+        opener = io_fits.AstropyFitsFileHandler(None)
+        return opener.load_file(path, numhdu=1, load_mode=load_mode,
+                                use_hdu_index=False)
+
+    def test_mmap(self, tmp_path):
+        path = str(tmp_path / 'scaled.fits')
+        data_np = np.arange(100 * 80, dtype=np.float64).reshape((100, 80))
+        hdu = fits.ImageHDU(data_np)
+        hdu.scale('int16', bscale=2.0, bzero=10.0)
+        fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(path)
+
+        image = self._load(path, 'mmap')
+        assert isinstance(image.get_data(), MappedArray)
+        exp = self._load(path, None).get_data()
+        np.testing.assert_array_equal(image.get_data()[10:20, 5:70:3],
+                                      exp[10:20, 5:70:3])
+        assert image.get_data_xy(7, 3) == exp[3, 7]
+
+    def test_tile_compressed(self, tmp_path):
+        path = str(tmp_path / 'comp.fits')
+        data_np = np.arange(200 * 160, dtype=np.int32).reshape((200, 160))
+        hdu = fits.CompImageHDU(data_np, compression_type='RICE_1',
+                                tile_shape=(20, 40))
+        fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(path)
+
+        image = self._load(path, 'lazy')
+        data = image.get_data()
+        assert isinstance(data, ChunkCachedArray)
+        assert data.chunks == (20, 40)
+        data.clear_cache()
+        np.testing.assert_array_equal(data[25:45, 30:50],
+                                      data_np[25:45, 30:50])
+        # only the tiles covering the cutout were decompressed
+        assert data.get_cache_stats().count == 4
+
+
+class TestLoadHeader:
+
+    @pytest.mark.parametrize('use_hdu_index', [False, True])
+    def test_header_only(self, tmp_path, use_hdu_index):
+        path = str(tmp_path / 'mef.fits')
+        prihdu = fits.PrimaryHDU()
+        prihdu.header['OBJECT'] = 'M31'
+        hdu = fits.ImageHDU(np.zeros((10, 20), dtype=np.float32),
+                            name='SCI')
+        hdu.header['EXPTIME'] = 30.0
+        fits.HDUList([prihdu, hdu]).writeto(path)
+
+        cache = FitsIndexCache(cache_dir=str(tmp_path / 'index'))
+        # the second open reads the directory from the saved index
+        for i in range(2):
+            opener = io_fits.AstropyFitsFileHandler(None)
+            opener.hdu_index_cache = cache
+            with opener.open_file(path, use_hdu_index=use_hdu_index):
+                # first HDU with data, by default
+                hdr = opener.load_idx_header(None)
+                assert hdr['EXPTIME'] == 30.0
+                assert hdr['NAXIS1'] == 20
+                assert 'OBJECT' not in hdr
+
+                hdr = opener.load_idx_header(('SCI', 1),
+                                             inherit_primary_header=True)
+                assert (hdr['OBJECT'], hdr['EXPTIME']) == ('M31', 30.0)
+
+                assert opener.load_idx_header(0)['OBJECT'] == 'M31'
@@ -0,0 +1,238 @@
+import numpy as np
+import pytest
+
+from ginga import AstroImage, trcalc
+from ginga.misc import log
+from ginga.util.lazyarray import ChunkCachedArray, MappedArray
+
+
+class TestChunkCachedArray:
+    def setup_class(self):
+        self.logger = log.get_logger("TestChunkCachedArray", null=True)
+
+    def _getdata(self, shape):
+        return np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+
+    def test_slice(self):
+        data_np = self._getdata((100, 120))
+        arr = ChunkCachedArray(data_np, chunks=(16, 16))
+        assert arr.shape == data_np.shape
+        assert arr.dtype == data_np.dtype
+
+        for view in [np.s_[:, :], np.s_[3:50, 7:90], np.s_[5:97:7, 2:119:3],
+                     np.s_[::-3, 10:20], np.s_[60:10, :], np.s_[4, 3:9],
+                     np.s_[-1, -1]]:
+            res = arr[view]
+            np.testing.assert_array_equal(res, data_np[view])
+
+        res = arr[10:20, 30:40]
+        assert isinstance(res, np.ndarray)
+
+    def test_fancy_index(self):
+        data_np = self._getdata((100, 120, 3))
+        arr = ChunkCachedArray(data_np, chunks=(16, 16))
+
+        yi = np.array([0, 5, 5, 30, 99])
+        xi = np.array([119, 40, 3])
+        for view in [(yi, xi), (yi, slice(10, 50, 4)),
+                     (slice(0, 100, 9), xi, slice(None)),
+                     (yi, xi, np.array([2, 0]))]:
+            res = trcalc.fancy_index(arr, view)
+            np.testing.assert_array_equal(res,
+                                          trcalc.fancy_index(data_np, view))
+
+    def test_chunk_cache(self):
+        data_np = self._getdata((100, 100))
+        arr = ChunkCachedArray(data_np, chunks=(10, 10),
+                               max_bytes=20 * 10 * 10 * 4)
+        arr[0:15, 0:15]
+        stats = arr.get_cache_stats()
+        assert (stats.misses, stats.count) == (4, 4)
+
+        # fetched chunks are reused
+        arr[5:20, 5:20]
+        stats = arr.get_cache_stats()
+        assert (stats.hits, stats.misses) == (4, 4)
+
+        # cache is bounded
+        arr[:, :]
+        assert arr.get_cache_stats().count == 20
+
+    def test_subsample_chunks(self):
+        data_np = self._getdata((1000, 1000))
+        arr = ChunkCachedArray(data_np, chunks=(100, 100))
+        yi = np.array([5, 7, 950])
+        xi = np.array([960, 3])
+        res = arr[yi, 3:961:957]
+        np.testing.assert_array_equal(res, data_np[yi, 3:961:957])
+        # only the chunks holding selected rows and columns were fetched
+        assert arr.get_cache_stats().count == 4
+
+        # numpy (pointwise) indexing with paired index arrays
+        np.testing.assert_array_equal(arr[yi[:2], xi], data_np[yi[:2], xi])
+        np.testing.assert_array_equal(arr[np.ix_(yi, xi)],
+                                      data_np[np.ix_(yi, xi)])
+
+    def test_viewer(self):
+        from ginga.pilw.ImageViewPil import CanvasView
+
+        data_np = np.random.normal(100.0, 30.0, (600, 500)).astype(np.float32)
+        images = []
+        for data in [data_np, ChunkCachedArray(data_np, chunks=(64, 64))]:
+            image = AstroImage.AstroImage(logger=self.logger)
+            image.set_data(data)
+            images.append(image)
+
+        viewer = CanvasView(logger=self.logger)
+        viewer.configure(300, 200)
+        viewer.set_image(images[0])
+        exp = viewer.get_cut_levels()
+        viewer.set_image(images[1])
+        cuts = viewer.get_cut_levels()
+        assert cuts == viewer.autocuts.calc_cut_levels(images[1])
+        # (the levels come from different samples of the same data)
+        assert np.allclose(cuts, exp, atol=30.0)
+
+        arrs = []
+        for image in images:
+            viewer.set_image(image)
+            viewer.cut_levels(50.0, 150.0)
+            viewer.zoom_fit()
+            arrs.append(viewer.get_image_as_array())
+            assert viewer.get_data(10, 20) == data_np[20, 10]
+        np.testing.assert_array_equal(arrs[0], arrs[1])
+
+    def test_sample(self):
+        data_np = self._getdata((1000, 1000))
+        arr = ChunkCachedArray(data_np, chunks=(100, 100))
+        sample = arr.get_sample(1000)
+        assert sample.ndim == 1
+        assert 500 <= len(sample) <= 2000
+        # only a subset of the chunks were fetched
+        assert arr.get_cache_stats().count == 16
+        # sample includes the first and last chunks
+        assert sample.min() == data_np[0, 0]
+        assert sample.max() >= data_np[900, 900]
+
+    def test_image(self):
+        data_np = self._getdata((500, 400))
+        arr = ChunkCachedArray(data_np, chunks=(50, 50))
+        aimg = AstroImage.AstroImage(logger=self.logger)
+        aimg.lazy_minmax_points = 1000
+        aimg.set_data(arr)
+
+        assert aimg.get_size() == (400, 500)
+        assert aimg.get_data_xy(3, 7) == data_np[7, 3]
+        minval, maxval = aimg.get_minmax()
+        assert minval == data_np.min()
+        assert maxval > 0.9 * data_np.max()
+        # min/max did not fetch the whole array
+        assert arr.get_cache_stats().count == 16
+
+        res, scales = trcalc.get_scaled_cutout_basic(arr, 10, 20, 109, 119,
+                                                     0.5, 0.5)
+        exp, scales = trcalc.get_scaled_cutout_basic(data_np, 10, 20,
+                                                     109, 119, 0.5, 0.5)
+        np.testing.assert_array_equal(res, exp)
+
+    def test_get_slice(self):
+        data_np = np.arange(4 * 30 * 40, dtype=np.float32).reshape((4, 30, 40))
+        arr = ChunkCachedArray(data_np, chunks=(1, 10, 8))
+        assert arr.chunks == (1, 10)
+
+        plane = arr.get_slice([2])
+        assert isinstance(plane, ChunkCachedArray)
+        assert plane.chunks == (10, 8)
+        assert plane.get_cache_stats().count == 0
+        np.testing.assert_array_equal(plane[5:25:2, 3:30], data_np[2, 5:25:2, 3:30])
+
+    def test_zarr(self):
+        zarr = pytest.importorskip('zarr')
+        data_np = self._getdata((300, 200))
+        data_z = zarr.creation.array(data_np, chunks=(30, 40))
+        arr = ChunkCachedArray(data_z)
+        assert arr.chunks == (30, 40)
+        np.testing.assert_array_equal(arr[12:200:3, 50:80],
+                                      data_np[12:200:3, 50:80])
+
+    def test_dask(self):
+        da = pytest.importorskip('dask.array')
+        data_np = self._getdata((300, 200))
+        data_d = da.from_array(data_np, chunks=(60, 50))
+        arr = ChunkCachedArray(data_d)
+        assert arr.chunks == (60, 50)
+        np.testing.assert_array_equal(arr[12:200:3, 50:80],
+                                      data_np[12:200:3, 50:80])
+
+
+class TestMappedArray:
+    def setup_class(self):
+        self.logger = log.get_logger("TestMappedArray", null=True)
+
+    def _getmemmap(self, tmp_path, data_np):
+        path = str(tmp_path / 'data.raw')
+        data_np.tofile(path)
+        return np.memmap(path, dtype=data_np.dtype, mode='r',
+                         shape=data_np.shape)
+
+    def test_big_endian(self, tmp_path):
+        data_np = np.arange(60 * 50, dtype='>f4').reshape((60, 50))
+        arr = MappedArray(self._getmemmap(tmp_path, data_np))
+        assert arr.dtype == np.dtype(np.float32)
+
+        for view in [np.s_[:, :], np.s_[5:50:3, 2:40], np.s_[4, 3:9],
+                     (np.array([0, 7, 59]), np.array([49, 3]))]:
+            res = trcalc.fancy_index(arr, view)
+            assert res.dtype.isnative
+            np.testing.assert_array_equal(
+                res, trcalc.fancy_index(data_np.astype(np.float32), view))
+
+    def test_scaling(self, tmp_path):
+        raw = np.array([[-32768, -1, 0, 32767]], dtype='>i2')
+        mm = self._getmemmap(tmp_path, raw)
+
+        # unsigned convention
+        arr = MappedArray(mm, bscale=1, bzero=32768)
+        assert arr.dtype == np.dtype(np.uint16)
+        np.testing.assert_array_equal(arr[:, :], [[0, 32767, 32768, 65535]])
+
+        arr = MappedArray(mm, bscale=2.0, bzero=1.0, blank=-1)
+        assert arr.dtype == np.dtype(np.float32)
+        np.testing.assert_array_equal(arr[0, :],
+                                      [-65535.0, np.nan, 1.0, 65535.0])
+
+    def test_cube(self, tmp_path):
+        data_np = np.arange(3 * 20 * 30, dtype='>i4').reshape((3, 20, 30))
+        mm = self._getmemmap(tmp_path, data_np)
+        aimg = AstroImage.AstroImage(logger=self.logger)
+        aimg.setup_data(MappedArray(mm), naxispath=[2])
+
+        # plane is still lazy
+        assert isinstance(aimg.get_data(), MappedArray)
+        assert aimg.get_size() == (30, 20)
+        assert aimg.get_data_xy(4, 5) == data_np[2, 5, 4]
+        assert aimg.get_minmax() == (data_np[2].min(), data_np[2].max())
+
+    def test_read_selection(self, tmp_path):
+        # only the selected rows and columns are read and converted
+        data_np = np.arange(60 * 50, dtype='>i2').reshape((60, 50))
+        arr = MappedArray(self._getmemmap(tmp_path, data_np), bscale=2.0)
+        shapes = []
+        convert = arr._convert
+
+        def _convert(raw):
+            shapes.append(raw.shape)
+            return convert(raw)
+
+        arr._convert = _convert
+        exp = data_np.astype(np.float32) * 2
+        res = arr[np.ix_([0, 7, 59], [49, 3])]
+        np.testing.assert_array_equal(res, exp[np.ix_([0, 7, 59], [49, 3])])
+        res = arr[[59, 0], 10:20:5]
+        np.testing.assert_array_equal(res, exp[[59, 0], 10:20:5])
+        assert shapes == [(3, 2), (2, 2)]
+
+        # a 2D image keeps the array
+        aimg = AstroImage.AstroImage(logger=self.logger)
+        aimg.setup_data(arr, naxispath=None)
+        assert aimg.get_data() is arr
@@ -0,0 +1,67 @@
+import numpy as np
+
+from ginga.misc.LRUCache import LRUCache
+from ginga.util.pyramid import ImagePyramid
+
+
+class TestImagePyramid:
+
+    def setup_class(self):
+        self.data = np.arange(1000 * 700, dtype=np.float32).reshape(700, 1000)
+
+    def test_levels(self):
+        pyr = ImagePyramid(self.data, tile_size=128)
+        assert pyr.get_num_levels() == 4
+        assert pyr.get_level_shape(2) == (175, 250)
+        assert pyr.get_level_for_scale(1.0) == 0
+        assert pyr.get_level_for_scale(0.5) == 0
+        assert pyr.get_level_for_scale(0.3) == 1
+        assert pyr.get_level_for_scale(0.1) == 3
+        assert pyr.get_level_for_scale(0.001) == 3
+
+    def test_cutout(self):
+        pyr = ImagePyramid(self.data, tile_size=64)
+        for level in range(pyr.get_num_levels()):
+            f = 2 ** level
+            ht, wd = pyr.get_level_shape(level)
+            res = pyr.get_cutout(level, 3, 5, wd - 7, ht - 2)
+            expected = self.data[::f, ::f][5:ht - 1, 3:wd - 6]
+            np.testing.assert_array_equal(res, expected)
+
+    def test_cutout_rgb(self):
+        data = np.random.randint(0, 255, size=(300, 400, 3), dtype=np.uint8)
+        pyr = ImagePyramid(data, tile_size=64)
+        res = pyr.get_cutout(2, 0, 0, 99, 74)
+        np.testing.assert_array_equal(res, data[::4, ::4])
+
+    def test_cache_budget(self):
+        pyr = ImagePyramid(self.data, tile_size=64,
+                           max_bytes=4 * 64 * 64 * 4)
+        pyr.get_cutout(1, 0, 0, 499, 349)
+        assert pyr.get_nbytes() <= 4 * 64 * 64 * 4
+        pyr.invalidate()
+        assert pyr.get_nbytes() == 0
+
+
+class TestLRUCache:
+
+    def test_maxsize(self):
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        assert cache.get('a') == 1
+        cache['c'] = 3
+        assert 'b' not in cache
+        assert cache.keys() == ['a', 'c']
+        stats = cache.get_stats()
+        assert (stats.hits, stats.misses, stats.evictions) == (1, 0, 1)
+
+    def test_maxbytes(self):
+        cache = LRUCache(maxbytes=100)
+        cache.put(1, np.zeros(10, dtype=np.float64))
+        cache.put(2, np.zeros(10, dtype=np.float64))
+        assert len(cache) == 1
+        assert cache.get_nbytes() == 80
+        # an item larger than the budget is still held
+        cache.put(3, np.zeros(20, dtype=np.float64))
+        assert cache.keys() == [3]
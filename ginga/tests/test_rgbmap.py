@@ -109,3 +109,31 @@ class TestColorDepth:
         assert len(rgb.get_rgb(rgb.res_maxc)) == 3
         with pytest.raises(Exception):
             rgb.get_rgb(rgb.res_maxc + 1)
+
+
+class TestRawLUT:
+
+    @pytest.mark.parametrize('dtype', [np.uint8, np.int8, np.uint16,
+                                       np.int16])
+    def test_raw_lut_matches_float_path(self, dtype):
+        rgb = _mapper(algo='log')
+        info = np.iinfo(dtype)
+        data = np.random.randint(info.min, int(info.max) + 1,
+                                 (300, 300)).astype(dtype)
+        for loval, hival in [(info.min // 2, info.max // 3), (10, 10)]:
+            res = rgb.get_rgb_array_cuts(data, loval, hival, order='RGB')
+            exp = rgb.get_rgb_array_cuts(data.astype(np.float64),
+                                         loval, hival, order='RGB')
+            assert np.array_equal(res, exp)
+
+    def test_raw_lut_cached(self):
+        rgb = _mapper()
+        lut1 = rgb.get_raw_lut(np.uint16, 100, 4000, 'RGB')
+        assert len(lut1) == 65536
+        assert rgb.get_raw_lut(np.uint16, 100, 4000, 'RGB') is lut1
+        # rebuilt when the cut levels or the color map change
+        lut2 = rgb.get_raw_lut(np.uint16, 100, 5000, 'RGB')
+        assert lut2 is not lut1
+        rgb.set_color_map('gray')
+        assert rgb.get_raw_lut(np.uint16, 100, 5000, 'RGB',
+                               build=False) is None
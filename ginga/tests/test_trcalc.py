@@ -58,3 +58,95 @@ class TestTrcalc:
         m = hashlib.sha256()
         m.update(str(new_data.tolist()).encode())
         assert m.hexdigest() == res
+
+    def test_get_scaled_cutout_wdht_view_slices(self):
+
+        data = np.arange(100 * 120).reshape((100, 120))
+        # scale of 1/3 in X and 1 in Y are done with slices
+        view, scales = trcalc.get_scaled_cutout_wdht_view(data.shape,
+                                                          10, 5, 69, 44,
+                                                          20, 40)
+        assert view == (slice(5, 45, 1), slice(10, 68, 3))
+        assert scales == (20 / 60, 1.0)
+        new_data = trcalc.fancy_index(data, view)
+        assert np.array_equal(new_data, data[5:45, 10:70:3])
+
+        # mixed slice and index array
+        view, scales = trcalc.get_scaled_cutout_wdht_view(data.shape,
+                                                          10, 5, 69, 44,
+                                                          120, 40)
+        assert isinstance(view[0], slice)
+        assert not isinstance(view[1], slice)
+        new_data = trcalc.fancy_index(data, view)
+        assert np.array_equal(new_data, data[5:45, 10:70].repeat(2, axis=1))
+
+    def test_get_scaled_cutout_basic_pan(self):
+
+        data = self._2ddata((200, 200))
+        # same scale and size at different offsets, as when panning
+        for x1, y1 in [(0, 0), (13, 7), (190, 188)]:
+            res, scales = trcalc.get_scaled_cutout_basic(data, x1, y1,
+                                                         x1 + 29, y1 + 19,
+                                                         0.7, 1.3)
+            yi = np.clip(y1 + (np.arange(26) / 1.3).astype(int), 0, 199)
+            xi = np.clip(x1 + (np.arange(21) / 0.7).astype(int), 0, 199)
+            assert np.array_equal(res, data[np.ix_(yi, xi)])
+
+            # result is never a view of the data
+            res, scales = trcalc.get_scaled_cutout_basic(data, x1, y1,
+                                                         x1 + 9, y1 + 9,
+                                                         1.0, 1.0)
+            assert not np.may_share_memory(res, data)
+
+    def test_get_scaled_cutout_basic_integer_zoom(self):
+
+        data = np.arange(3 * 40 * 50).reshape((40, 50, 3))
+        for scale_x, scale_y in [(2.0, 2.0), (3.0, 1.0), (1.0, 1.0),
+                                 (0.5, 0.25), (4.0, 0.5)]:
+            res, scales = trcalc.get_scaled_cutout_basic(data, 5, 7, 24, 30,
+                                                         scale_x, scale_y,
+                                                         copy=False)
+            assert scales == (scale_x, scale_y)
+            yi = 7 + (np.arange(int(24 * scale_y)) / scale_y).astype(int)
+            xi = 5 + (np.arange(int(20 * scale_x)) / scale_x).astype(int)
+            assert np.array_equal(res, data[np.ix_(yi, xi)])
+
+        # zooming out by an integer factor gives a view of the data
+        res, scales = trcalc.get_scaled_cutout_basic(data, 0, 0, 49, 39,
+                                                     0.5, 0.5, copy=False)
+        assert np.may_share_memory(res, data)
+
+    def test_get_scaled_cutout_mean(self):
+
+        data = np.random.rand(120, 160).astype(np.float32)
+        res, scales = trcalc.get_scaled_cutout_basic(data, 0, 0, 159, 119,
+                                                     0.25, 0.25,
+                                                     interpolation='mean')
+        assert res.shape == (30, 40) and res.dtype == np.float32
+        assert scales == (0.25, 0.25)
+        expected = data.reshape((30, 4, 40, 4)).mean(axis=(1, 3))
+        assert np.allclose(res, expected)
+
+        # size that is not a whole number of blocks
+        res, scales = trcalc.get_scaled_cutout_wdht(data, 3, 5, 152, 104,
+                                                    43, 30,
+                                                    interpolation='mean')
+        assert res.shape == (30, 43)
+        assert np.isclose(res.mean(), data[5:105, 3:153].mean(), atol=0.01)
+
+        # RGB integer data
+        data = np.random.randint(0, 256, (64, 64, 3)).astype(np.uint8)
+        res, scales = trcalc.get_scaled_cutout_basic(data, 0, 0, 63, 63,
+                                                     0.5, 0.5,
+                                                     interpolation='mean')
+        assert res.shape == (32, 32, 3) and res.dtype == np.uint8
+        expected = np.rint(data.reshape((32, 2, 32, 2, 3)).mean(axis=(1, 3)))
+        assert np.array_equal(res, expected)
+
+        # zooming in is the same as nearest neighbor
+        res1, scales = trcalc.get_scaled_cutout_basic(data, 0, 0, 9, 9,
+                                                      2.5, 2.5,
+                                                      interpolation='mean')
+        res2, scales = trcalc.get_scaled_cutout_basic(data, 0, 0, 9, 9,
+                                                      2.5, 2.5)
+        assert np.array_equal(res1, res2)
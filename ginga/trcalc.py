@@ -8,6 +8,9 @@ import sys
 import math
 import numpy as np
 
+from ginga.misc.LRUCache import LRUCache
+from ginga.util.lazyarray import LazyArray
+
 _use = None
 
 
@@ -29,7 +32,9 @@ pil_resize = dict(nearest=Image.Resampling.NEAREST,
                   bicubic=Image.Resampling.BICUBIC,
                   lanczos=Image.Resampling.LANCZOS)
 
-interpolation_methods = sorted(set(['basic'] + list(pil_resize.keys())))
+# 'mean' is block averaging, done natively with numpy
+interpolation_methods = sorted(set(['basic', 'mean'] +
+                                   list(pil_resize.keys())))
 
 have_opencv = False
 try:
@@ -43,7 +48,8 @@ try:
                       lanczos=cv2.INTER_LANCZOS4)
     have_opencv = True
 
-    interpolation_methods = sorted(set(['basic'] + list(cv2_resize.keys())))
+    interpolation_methods = sorted(set(['basic', 'mean'] +
+                                       list(cv2_resize.keys())))
 
 except ImportError:
     pass
@@ -239,7 +245,49 @@ def rotate(data_np, theta_deg, rotctr_x=None, rotctr_y=None, pad=20,
     return newdata
 
 
+# cache of index vectors used for scaling by fancy indexing
+_index_cache = LRUCache(maxsize=64)
+
+
+def _get_scaled_index(x1, n, iscale, max_x):
+    """Return the indexes of `n` pixels sampled at intervals of `iscale`,
+    starting at `x1` and limited to `max_x`.  This is a slice if the
+    indexes are evenly spaced by an integer step, otherwise an array.
+    """
+    if n > 0 and iscale >= 1.0 and iscale == int(iscale):
+        step = int(iscale)
+        if x1 >= 0 and x1 + step * (n - 1) <= max_x:
+            return slice(x1, x1 + step * (n - 1) + 1, step)
+
+    # indexes for a given scale and size are the same up to an offset,
+    # e.g. when panning, so cache them without the offset
+    key = (iscale, n)
+    base = _index_cache.get(key, None)
+    if base is None:
+        base = (np.arange(0, n) * iscale).astype(int)
+        base.flags.writeable = False
+        _index_cache.put(key, base)
+
+    idx = base + x1
+    idx.clip(0, max_x, out=idx)
+    return idx
+
+
+def _index_len(idx):
+    if isinstance(idx, slice):
+        return len(range(idx.start, idx.stop, idx.step))
+    return idx.size
+
+
 def get_scaled_cutout_wdht_view(shp, x1, y1, x2, y2, new_wd, new_ht):
+    """
+    Like get_scaled_cutout_wdht, but returns the view/slice to extract
+    from an image instead of the extraction itself.
+
+    The view is a tuple of (yi, xi), each of which is either a 1D integer
+    array of indexes or, where the scale makes that possible, a slice.
+    Use `fancy_index` to apply it.
+    """
     x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
 
     # calculate dimensions of NON-scaled cutout
@@ -258,19 +306,16 @@ def get_scaled_cutout_wdht_view(shp, x1, y1, x2, y2, new_wd, new_ht):
     max_x, max_y = shp[1] - 1, shp[0] - 1
 
     # Make indexes and scale them
-    # Is there a more efficient way to do this?
-    xi = np.clip(x1 + np.arange(0, new_wd) * iscale_x,
-                 0, max_x).astype(int, copy=False)
-    yi = np.clip(y1 + np.arange(0, new_ht) * iscale_y,
-                 0, max_y).astype(int, copy=False)
-    wd, ht = xi.size, yi.size
+    xi = _get_scaled_index(x1, new_wd, iscale_x, max_x)
+    yi = _get_scaled_index(y1, new_ht, iscale_y, max_y)
+    wd, ht = _index_len(xi), _index_len(yi)
 
     # bounds check against shape (to protect future data access)
-    if new_wd > 0:
+    if new_wd > 0 and not isinstance(xi, slice):
         xi_max = xi[-1]
         if xi_max > max_x:
             raise ValueError("X index (%d) exceeds shape bounds (%d)" % (xi_max, max_x))
-    if new_ht > 0:
+    if new_ht > 0 and not isinstance(yi, slice):
         yi_max = yi[-1]
         if yi_max > max_y:
             raise ValueError("Y index (%d) exceeds shape bounds (%d)" % (yi_max, max_y))
@@ -357,7 +402,7 @@ def get_scaled_cutout_wdhtdp_view(shp, p1, p2, new_dims):
 
 def get_scaled_cutout_wdht(data_np, x1, y1, x2, y2, new_wd, new_ht,
                            interpolation='basic', logger=None,
-                           dtype=None):
+                           dtype=None, copy=True):
     """Extract a region of the `data_np` defined by corners (x1, y1) and
     (x2, y2) and resample it to fit dimensions (new_wd, new_ht).
 
@@ -365,7 +410,8 @@ def get_scaled_cutout_wdht(data_np, x1, y1, x2, y2, new_wd, new_ht,
     default "basic" is nearest neighbor.  If `logger` is not `None` it will
     be used for logging messages.  If `dtype` is defined then the output
     array will be converted to that type; the default is the same as the
-    input type.
+    input type.  If `copy` is False, the result may be a view of `data_np`
+    (e.g. when the scale is 1/N for an integer N).
     """
     x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
     new_wd, new_ht = int(new_wd), int(new_ht)
@@ -375,8 +421,15 @@ def get_scaled_cutout_wdht(data_np, x1, y1, x2, y2, new_wd, new_ht,
     if dtype is None:
         dtype = data_np.dtype
 
-    if (have_opencv and _use in (None, 'opencv') and
-        interpolation not in ('basic', 'nearest')):
+    if interpolation == 'mean':
+        if logger is not None:
+            logger.debug("resizing by block averaging")
+        newdata, (scale_x, scale_y) = _get_scaled_cutout_mean(data_np,
+                                                              x1, y1, x2, y2,
+                                                              new_wd, new_ht)
+
+    elif (have_opencv and _use in (None, 'opencv') and
+          interpolation not in ('basic', 'nearest')):
         if logger is not None:
             logger.debug("resizing with OpenCv")
         # opencv is fastest and supports many methods
@@ -418,10 +471,10 @@ def get_scaled_cutout_wdht(data_np, x1, y1, x2, y2, new_wd, new_ht,
     else:
         if logger is not None:
             logger.debug('resizing by fancy indexing')
-        view, (scale_x, scale_y) = get_scaled_cutout_wdht_view(data_np.shape,
-                                                               x1, y1, x2, y2,
-                                                               new_wd, new_ht)
-        newdata = np.asarray(fancy_index(data_np, view))
+        newdata, (scale_x, scale_y) = _get_scaled_cutout(data_np,
+                                                         x1, y1, x2, y2,
+                                                         new_wd, new_ht,
+                                                         copy=copy)
 
     newdata = newdata.astype(dtype, copy=False)
 
@@ -462,7 +515,10 @@ def get_scaled_cutout_basic_view(shp, p1, p2, scales):
 
 def get_scaled_cutout_basic(data_np, x1, y1, x2, y2, scale_x, scale_y,
                             interpolation='basic', logger=None,
-                            dtype=None):
+                            dtype=None, copy=True):
+    """Like get_scaled_cutout_wdht, but the size of the result is
+    determined by scale factors (`scale_x`, `scale_y`) of the cutout.
+    """
 
     x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
 
@@ -471,8 +527,17 @@ def get_scaled_cutout_basic(data_np, x1, y1, x2, y2, scale_x, scale_y,
     if dtype is None:
         dtype = data_np.dtype
 
-    if (have_opencv and _use in (None, 'opencv') and
-        interpolation not in ('basic', 'nearest')):
+    if interpolation == 'mean':
+        if logger is not None:
+            logger.debug("resizing by block averaging")
+        old_wd, old_ht = max(x2 - x1 + 1, 1), max(y2 - y1 + 1, 1)
+        new_wd, new_ht = int(scale_x * old_wd), int(scale_y * old_ht)
+        newdata, (scale_x, scale_y) = _get_scaled_cutout_mean(data_np,
+                                                              x1, y1, x2, y2,
+                                                              new_wd, new_ht)
+
+    elif (have_opencv and _use in (None, 'opencv') and
+          interpolation not in ('basic', 'nearest')):
         if logger is not None:
             logger.debug("resizing with OpenCv")
         # opencv is fastest
@@ -517,11 +582,12 @@ def get_scaled_cutout_basic(data_np, x1, y1, x2, y2, scale_x, scale_y,
     else:
         if logger is not None:
             logger.debug('resizing by slicing')
-        view, scales = get_scaled_cutout_basic_view(data_np.shape,
-                                                    (x1, y1), (x2, y2),
-                                                    (scale_x, scale_y))
-        scale_x, scale_y = scales
-        newdata = np.asarray(fancy_index(data_np, view))
+        old_wd, old_ht = max(x2 - x1 + 1, 1), max(y2 - y1 + 1, 1)
+        new_wd, new_ht = int(scale_x * old_wd), int(scale_y * old_ht)
+        newdata, (scale_x, scale_y) = _get_scaled_cutout(data_np,
+                                                         x1, y1, x2, y2,
+                                                         new_wd, new_ht,
+                                                         copy=copy)
 
     newdata = newdata.astype(dtype, copy=False)
 
@@ -1203,12 +1269,103 @@ def calc_aspect_str(wd, ht):
     return _as
 
 
+def _get_scaled_cutout(data_np, x1, y1, x2, y2, new_wd, new_ht, copy=True):
+    # nearest neighbor resampling of a cutout
+    shp = data_np.shape
+    old_wd, old_ht = max(x2 - x1 + 1, 1), max(y2 - y1 + 1, 1)
+
+    if (new_wd >= old_wd and new_ht >= old_ht and
+            new_wd % old_wd == 0 and new_ht % old_ht == 0 and
+            x1 >= 0 and y1 >= 0 and x2 < shp[1] and y2 < shp[0]):
+        # zooming in by integer factors: replicate the pixels of the cutout
+        kx, ky = new_wd // old_wd, new_ht // old_ht
+        cutout = np.asarray(fancy_index(data_np,
+                                        (slice(y1, y2 + 1),
+                                         slice(x1, x2 + 1))))
+        if kx == 1 and ky == 1:
+            newdata = cutout
+        else:
+            rdim = cutout.shape[2:]
+            newdata = np.broadcast_to(
+                cutout.reshape((old_ht, 1, old_wd, 1) + rdim),
+                (old_ht, ky, old_wd, kx) + rdim).reshape(
+                    (new_ht, new_wd) + rdim)
+        scales = (float(kx), float(ky))
+
+    else:
+        view, scales = get_scaled_cutout_wdht_view(shp, x1, y1, x2, y2,
+                                                   new_wd, new_ht)
+        newdata = np.asarray(fancy_index(data_np, view))
+
+    if (copy and isinstance(data_np, np.ndarray) and
+            np.may_share_memory(newdata, data_np)):
+        # view was made by slicing
+        newdata = newdata.copy()
+    return newdata, scales
+
+
+def _get_scaled_cutout_mean(data_np, x1, y1, x2, y2, new_wd, new_ht,
+                            chunk_size=4194304):
+    # downsample a cutout by averaging blocks of pixels
+    old_wd, old_ht = max(x2 - x1 + 1, 1), max(y2 - y1 + 1, 1)
+    kx, ky = old_wd // max(new_wd, 1), old_ht // max(new_ht, 1)
+    shp = data_np.shape
+    if ((kx <= 1 and ky <= 1) or x1 < 0 or y1 < 0 or
+            x2 >= shp[1] or y2 >= shp[0]):
+        # not reducing--nearest neighbor is as good as an average
+        return _get_scaled_cutout(data_np, x1, y1, x2, y2, new_wd, new_ht)
+
+    kx, ky = max(kx, 1), max(ky, 1)
+    # size after reducing by whole blocks
+    red_wd, red_ht = old_wd // kx, old_ht // ky
+    rdim = shp[2:]
+    # accumulate in float32 unless the data needs more precision
+    dtype = np.result_type(data_np.dtype, np.float32)
+    red = np.empty((red_ht, red_wd) + rdim, dtype=dtype)
+
+    # average in chunks of rows to limit the size of temporaries
+    rows = max(1, chunk_size // max(old_wd * ky, 1))
+    for r1 in range(0, red_ht, rows):
+        r2 = min(r1 + rows, red_ht)
+        view = (slice(y1 + r1 * ky, y1 + r2 * ky),
+                slice(x1, x1 + red_wd * kx))
+        cutout = np.asarray(fancy_index(data_np, view))
+        # NOTE: summing rows, then columns, of the blocks with in-place
+        # adds is much faster than reshape().mean() over two axes
+        cutout = cutout.reshape((r2 - r1, ky, red_wd * kx) + rdim)
+        acc = cutout[:, 0].astype(dtype)
+        for i in range(1, ky):
+            acc += cutout[:, i]
+        acc = acc.reshape((r2 - r1, red_wd, kx) + rdim)
+        out = red[r1:r2]
+        out[...] = acc[:, :, 0]
+        for i in range(1, kx):
+            out += acc[:, :, i]
+
+    red /= kx * ky
+    if np.issubdtype(data_np.dtype, np.integer):
+        np.rint(red, out=red)
+
+    # resample the reduced array to the exact size requested
+    view, scales = get_scaled_cutout_wdht_view(red.shape, 0, 0,
+                                               red_wd - 1, red_ht - 1,
+                                               new_wd, new_ht)
+    newdata = np.asarray(fancy_index(red, view))
+    wd, ht = newdata.shape[1], newdata.shape[0]
+    return newdata, (float(wd) / old_wd, float(ht) / old_ht)
+
+
+def _view_as_indexes(shape, view):
+    return [np.arange(*v.indices(shape[i])) if isinstance(v, slice) else v
+            for i, v in enumerate(view)]
+
+
 def fancy_index(d_obj, view):
     """Return a slice from a data object according to a view.
 
     Parameters
     ----------
-    d_obj : numpy ndarray, dask array, or zarr array
+    d_obj : numpy ndarray, dask array, zarr array or LazyArray
         2D or 3D data array
 
     view : tuple of slice or int array
@@ -1223,17 +1380,21 @@ def fancy_index(d_obj, view):
     if not isinstance(view, tuple):
         view = tuple(view)
 
-    if not isinstance(view[0], slice):
+    num_idx = len([v for v in view if not isinstance(v, slice)])
+    if num_idx > 0:
         # <-- indicates fancy indexing being used instead of slices
 
-        if isinstance(d_obj, np.ndarray):
-            # <-- numpy array
-            view = np.ix_(*view)
+        if isinstance(d_obj, (np.ndarray, LazyArray)):
+            # <-- numpy array, or lazy array (which indexes like one)
+            if num_idx == 1:
+                # a single index array can be mixed with slices
+                return d_obj[view]
+            view = np.ix_(*_view_as_indexes(d_obj.shape, view))
 
         # test for zarr array
         elif have_zarr and isinstance(d_obj, zarr.Array):
             # <-- zarr object
-            view = np.ix_(*view)
+            view = np.ix_(*_view_as_indexes(d_obj.shape, view))
 
         # test for dask array
         elif have_dask and isinstance(d_obj, da.Array):
@@ -0,0 +1,145 @@
+#
+# bgjob.py -- run viewer calculations in the background
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Some calculations done for a viewer (e.g. auto cut levels or a histogram
+equalization table over all of the data of a large image) take long
+enough that they should not hold up the rendering, and are only useful
+for the current state of the viewer when they are done.
+
+A `BackgroundJob` runs the latest of a series of such calculations on a
+small thread pool shared by all viewers, once the requests have stopped
+coming for a moment, and delivers the result in the viewer's thread
+using a viewer timer.  A calculation that is superseded by a later one
+before it has finished should check `is_current` now and then and give
+up early; its result is never delivered.
+
+Example::
+
+    bgjob = BackgroundJob(viewer, settle_interval=0.1)
+    if bgjob.is_available():
+        bgjob.start(calc_fn, done_fn, image=image)
+
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ginga.misc import Bunch
+
+__all__ = ['BackgroundJob', 'get_pool']
+
+# the pool of threads that background jobs are run on
+num_workers = 2
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the thread pool shared by all background jobs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=num_workers,
+                                       thread_name_prefix='ginga-bgjob')
+        return _pool
+
+
+class BackgroundJob(object):
+    """Run the latest of a series of calculations for a viewer in the
+    background.
+
+    Parameters
+    ----------
+    viewer : subclass of `~ginga.ImageView.ImageViewBase`
+        The viewer, which provides the timer the job is driven by.
+
+    settle_interval : float (optional, defaults to 0.0)
+        Seconds to wait after the last call to `start` before the
+        calculation is started.
+
+    poll_interval : float (optional, defaults to 0.02)
+        Seconds between checks whether the calculation has finished.
+
+    """
+
+    def __init__(self, viewer, settle_interval=0.0, poll_interval=0.02):
+        self.logger = viewer.logger
+        self.settle_interval = settle_interval
+        self.poll_interval = poll_interval
+
+        self.lock = threading.RLock()
+        self.job = None
+        self.timer = viewer.make_timer()
+        if self.timer is not None:
+            self.timer.add_callback('expired', self._timer_cb)
+
+    def is_available(self):
+        """Returns True if jobs can be run in the background.  This
+        requires a viewer timer to deliver the results with.
+        """
+        return self.timer is not None
+
+    def start(self, calc_fn, done_fn, **kwargs):
+        """Start a job, superseding any job that has not finished yet.
+
+        ``calc_fn(job)`` is called on the thread pool and returns the
+        result, which is stored as ``job.result``.  If the job is still
+        the current one when it finishes, ``done_fn(job)`` is called in
+        the viewer's thread.  Any keyword arguments are set as attributes
+        of ``job``, which is returned.
+        """
+        job = Bunch.Bunch(calc_fn=calc_fn, done_fn=done_fn,
+                          result=None, started=False, done=False)
+        job.update(kwargs)
+        with self.lock:
+            self.job = job
+        # (re)starting the timer delays the start until the requests
+        # have settled
+        self.timer.start(self.settle_interval)
+        return job
+
+    def cancel(self):
+        """Abandon the current job, if any."""
+        with self.lock:
+            self.job = None
+
+    def is_current(self, job):
+        """Returns True if `job` has not been superseded or cancelled."""
+        return job is self.job
+
+    def is_pending(self):
+        """Returns True if a job has been started and not delivered."""
+        return self.job is not None
+
+    def _run(self, job):
+        if self.is_current(job):
+            try:
+                job.result = job.calc_fn(job)
+
+            except Exception as e:
+                self.logger.error("error in background job: {}".format(e),
+                                  exc_info=True)
+        job.done = True
+
+    def _timer_cb(self, timer):
+        job = self.job
+        if job is None:
+            return
+        if not job.started:
+            job.started = True
+            get_pool().submit(self._run, job)
+            timer.start(self.poll_interval)
+            return
+        if not job.done:
+            timer.start(self.poll_interval)
+            return
+
+        with self.lock:
+            if job is not self.job:
+                return
+            self.job = None
+        if job.result is not None:
+            job.done_fn(job)
@@ -0,0 +1,254 @@
+#
+# bulkload.py -- load many files with bounded concurrency
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Loading a large number of files (e.g. a drop of thousands of FITS files
+into a channel) one task per file floods the thread pool and the GUI
+queue, and holds all of the loaded data in memory at once if the GUI
+falls behind.
+
+A `BulkLoader` runs a fixed number of workers that load the items, keeps
+the number of bytes loaded but not yet delivered under a budget, and
+delivers the results in batches (in the order of the items, or as they
+finish) to a function run in the GUI thread.
+
+Example::
+
+    bl = BulkLoader(load_fn, deliver_fn, fv.nongui_do, fv.gui_do,
+                    num_workers=4, max_bytes=1024**3)
+    bl.load(paths)
+
+"""
+import os
+import time
+import threading
+from collections import deque
+
+from ginga.misc import Bunch
+
+__all__ = ['BulkLoader']
+
+# result of an item skipped by BulkLoader.cancel()
+_CANCELLED = object()
+
+
+class BulkLoader:
+    """Load a sequence of items with a bounded number of workers.
+
+    Parameters
+    ----------
+    load_fn : callable
+        ``load_fn(item)`` is called in a worker thread to load an item
+        and returns the result (e.g. a list of data objects).  If it
+        raises an exception, the exception is delivered as the result.
+
+    deliver_fn : callable
+        ``deliver_fn(batch)`` is called via `gui_do` with a list of
+        ``(item, result)`` tuples that have been loaded.
+
+    start_fn : callable
+        ``start_fn(fn)`` runs `fn` (a worker) in a non-GUI thread, e.g.
+        the ``nongui_do`` method of the reference viewer.
+
+    gui_do : callable
+        ``gui_do(fn)`` runs `fn` in the GUI thread.
+
+    num_workers : int (optional, default 4)
+        Maximum number of items loaded at once.
+
+    max_bytes : int or `None` (optional)
+        Maximum number of bytes of items loaded but not yet delivered.
+        A worker waits before loading an item that would exceed this
+        (unless nothing is outstanding).  `None` for no limit.
+
+    ordered : bool (optional, default `True`)
+        If `True`, results are delivered in the order of the items;
+        otherwise as they finish.
+
+    sizeof : callable or `None` (optional)
+        ``sizeof(item)`` returns the estimated number of bytes an item
+        will hold when loaded.  The default is the size of the file
+        named by the item (with any index suffix such as ``[1]``
+        removed), or 0.
+
+    progress_cb : callable or `None` (optional)
+        ``progress_cb(stats)`` is called in the GUI thread after each
+        batch, with the Bunch returned by `get_stats`.
+
+    """
+
+    def __init__(self, load_fn, deliver_fn, start_fn, gui_do,
+                 num_workers=4, max_bytes=None, ordered=True, sizeof=None,
+                 progress_cb=None):
+        self.load_fn = load_fn
+        self.deliver_fn = deliver_fn
+        self.start_fn = start_fn
+        self.gui_do = gui_do
+        self.num_workers = max(1, int(num_workers))
+        self.max_bytes = max_bytes
+        self.ordered = ordered
+        if sizeof is None:
+            sizeof = _file_size
+        self.sizeof = sizeof
+        self.progress_cb = progress_cb
+
+        self.lock = threading.Condition()
+        self._queue = deque()
+        self._total = 0
+        self._next_seq = 0
+        self._inflight_bytes = 0
+        self._num_active = 0
+        # results loaded but not delivered, by sequence number
+        self._ready = {}
+        self._next_deliver = 0
+        self._flush_pending = False
+
+        self.num_done = 0
+        self.num_failed = 0
+        self.num_cancelled = 0
+        self.bytes_done = 0
+        self.time_start = None
+
+    def load(self, items):
+        """Add `items` to be loaded and start workers as needed."""
+        with self.lock:
+            if self.time_start is None:
+                self.time_start = time.time()
+            for item in items:
+                self._queue.append((self._next_seq, item))
+                self._next_seq += 1
+            self._total += len(items)
+            num_start = min(self.num_workers - self._num_active,
+                            len(self._queue))
+            self._num_active += num_start
+
+        for i in range(num_start):
+            self.start_fn(self._worker)
+
+    def cancel(self):
+        """Discard the items that have not started loading."""
+        with self.lock:
+            for seq, item in self._queue:
+                # skipped items are marked as ready, so that ordered
+                # delivery is not held up
+                self._ready[seq] = (item, _CANCELLED, 0)
+            self._queue.clear()
+            self.lock.notify_all()
+        self._schedule_flush()
+
+    def is_done(self):
+        with self.lock:
+            return (self._next_deliver >= self._next_seq and
+                    len(self._queue) == 0)
+
+    def get_stats(self):
+        """Return a Bunch of progress statistics: total, done, failed,
+        cancelled, pending, elapsed (sec), rate (items/sec) and
+        throughput (bytes/sec).
+        """
+        with self.lock:
+            elapsed = 0.0
+            if self.time_start is not None:
+                elapsed = time.time() - self.time_start
+            rate = throughput = 0.0
+            if elapsed > 0:
+                rate = self.num_done / elapsed
+                throughput = self.bytes_done / elapsed
+            return Bunch.Bunch(total=self._total, done=self.num_done,
+                               failed=self.num_failed,
+                               cancelled=self.num_cancelled,
+                               pending=(self._total - self.num_done -
+                                        self.num_cancelled),
+                               inflight_bytes=self._inflight_bytes,
+                               elapsed=elapsed, rate=rate,
+                               throughput=throughput)
+
+    def _get_next(self):
+        # return the next (seq, item, size) to load, waiting for room in
+        # the byte budget, or None if there is nothing left to do
+        with self.lock:
+            while True:
+                if len(self._queue) == 0:
+                    self._num_active -= 1
+                    return None
+                seq, item = self._queue[0]
+                size = self.sizeof(item)
+                if (not self.max_bytes or self._inflight_bytes == 0 or
+                        self._inflight_bytes + size <= self.max_bytes):
+                    self._queue.popleft()
+                    self._inflight_bytes += size
+                    return (seq, item, size)
+                self.lock.wait()
+
+    def _worker(self):
+        while True:
+            tup = self._get_next()
+            if tup is None:
+                return
+            seq, item, size = tup
+            try:
+                result = self.load_fn(item)
+
+            except Exception as e:
+                result = e
+
+            with self.lock:
+                self._ready[seq] = (item, result, size)
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        # coalesce deliveries: only one flush is queued in the GUI at a
+        # time, and it takes everything that is ready by then
+        with self.lock:
+            if self._flush_pending:
+                return
+            self._flush_pending = True
+        self.gui_do(self._flush)
+
+    def _flush(self):
+        batch = []
+        with self.lock:
+            self._flush_pending = False
+            if self.ordered:
+                while self._next_deliver in self._ready:
+                    batch.append(self._ready.pop(self._next_deliver))
+                    self._next_deliver += 1
+            else:
+                batch = [self._ready.pop(seq) for seq in sorted(self._ready)]
+                self._next_deliver += len(batch)
+
+            results = []
+            for item, result, size in batch:
+                self._inflight_bytes -= size
+                if result is _CANCELLED:
+                    self.num_cancelled += 1
+                    continue
+                self.num_done += 1
+                self.bytes_done += size
+                if isinstance(result, Exception):
+                    self.num_failed += 1
+                results.append((item, result))
+            self.lock.notify_all()
+
+        if len(batch) == 0:
+            return
+        if len(results) > 0:
+            self.deliver_fn(results)
+
+        if self.progress_cb is not None:
+            self.progress_cb(self.get_stats())
+
+
+def _file_size(item):
+    path = item
+    if isinstance(path, str) and path.endswith(']') and '[' in path:
+        path = path[:path.rindex('[')]
+    try:
+        return os.path.getsize(path)
+    except Exception:
+        return 0
+
+# END
@@ -0,0 +1,114 @@
+#
+# fits_index.py -- persistent index of the HDUs of FITS files
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Opening a FITS file with many extensions means reading the header of
+every HDU, just to find out what is in the file.  This module saves a
+small index of the HDUs of a file (name, EXTVER, type, shape, dtype and
+the byte offsets of the header and data) in a cache directory, so that
+the next time the file is opened the HDU directory is read from the
+index and any HDU can be read directly from its offset.
+
+An index is keyed on the absolute path, size and modification time of
+the file, so it is not used if the file has changed.
+"""
+import os
+import json
+import hashlib
+
+from ginga.util import paths
+
+__all__ = ['FitsIndexCache']
+
+# bump this if the content of an index changes
+index_version = 1
+
+
+class FitsIndexCache:
+    """A directory of FITS HDU indexes.
+
+    Parameters
+    ----------
+    cache_dir : str or `None`
+        Directory where the indexes are saved.  If `None`, the
+        ``cache/fits_index`` folder under the Ginga home directory is
+        used.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for reporting problems reading or writing indexes.
+
+    """
+
+    def __init__(self, cache_dir=None, logger=None):
+        self.cache_dir = cache_dir
+        self.logger = logger
+
+    def get_cache_dir(self):
+        if self.cache_dir is not None:
+            return self.cache_dir
+        # NOTE: looked up each time, in case the home directory is changed
+        return os.path.join(paths.ginga_home, 'cache', 'fits_index')
+
+    def _get_key(self, filepath):
+        filepath = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        return dict(path=filepath, size=st.st_size, mtime=st.st_mtime_ns)
+
+    def _get_index_path(self, filepath):
+        filepath = os.path.abspath(filepath)
+        name = hashlib.sha1(filepath.encode('utf-8')).hexdigest()
+        return os.path.join(self.get_cache_dir(), name + '.json')
+
+    def load(self, filepath):
+        """Return the list of HDU records saved for the file at
+        `filepath`, or `None` if there is no index for the file in its
+        current state.
+        """
+        index_path = self._get_index_path(filepath)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            key = self._get_key(filepath)
+            with open(index_path, 'r') as in_f:
+                d = json.load(in_f)
+
+            if d.get('version', None) != index_version or d['key'] != key:
+                # stale index
+                return None
+            return d['hdus']
+
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.warning("Error reading FITS index '%s': %s" % (
+                    index_path, str(e)))
+            return None
+
+    def save(self, filepath, hdus):
+        """Save the list of HDU records `hdus` (dicts of JSON-compatible
+        values) as the index of the file at `filepath`.
+        """
+        index_path = self._get_index_path(filepath)
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            d = dict(version=index_version, key=self._get_key(filepath),
+                     hdus=hdus)
+            # write to a temporary file first, so that a reader never sees
+            # a partly written index
+            tmp_path = index_path + '.%d.tmp' % (os.getpid())
+            with open(tmp_path, 'w') as out_f:
+                json.dump(d, out_f)
+            os.replace(tmp_path, index_path)
+
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.warning("Error writing FITS index '%s': %s" % (
+                    index_path, str(e)))
+
+    def remove(self, filepath):
+        """Remove any index saved for the file at `filepath`."""
+        index_path = self._get_index_path(filepath)
+        if os.path.exists(index_path):
+            os.remove(index_path)
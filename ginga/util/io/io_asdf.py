@@ -226,6 +226,19 @@ class ASDFFileHandler(io_base.BaseIOHandler):
 
         return self.load_file(self._path, idx=idx, **kwargs)
 
+    def load_idx_header(self, idx, header_key='meta', **kwargs):
+        if self._path is None:
+            raise ValueError("Please call open_file() first!")
+
+        # NOTE: arrays in an ASDF file are only read when accessed, so
+        # this reads just the tree
+        ahdr = AstroImage.AstroHeader()
+        with asdf.open(self._path) as asdf_f:
+            if header_key in asdf_f.keys():
+                ahdr.update(asdf_f[header_key])
+
+        return ahdr
+
     def load_idx_cont(self, idx_spec, loader_cont_fn, **kwargs):
 
         data_obj = self.load_idx(None, **kwargs)
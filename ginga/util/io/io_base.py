@@ -87,6 +87,27 @@ class BaseIOHandler:
         """
         raise NotImplementedError("subclass should override this")
 
+    def load_idx_header(self, idx, **kwargs):
+        """
+        Parameters
+        ----------
+        idx : :py:class:object or None
+            A Python value that matches describes the path or index to a
+            single data data object in the file.  Can be None to indicate
+            the default (or first usable) object, as for load_idx().
+
+        kwargs : optional keyword arguments
+            Any optional keyword arguments are passed to the code that
+            reads the header from the file
+
+        Returns
+        -------
+        header : `~ginga.BaseImage.Header`
+            The header (metadata) of the data object, read without
+            loading the data itself
+        """
+        raise NotImplementedError("subclass should override this")
+
     def load_idx_cont(self, idx_spec, loader_cont_fn, **kwargs):
         # subclass can inherit this if open_file(), __len__(), load_idx() and
         # get_matching_indexes() methods are implemented properly
@@ -17,6 +17,7 @@ To force the use of one programmatically, do:
 any images.  Otherwise Ginga will try to pick one for you.
 """
 import re
+import inspect
 from io import BytesIO
 
 import numpy as np
@@ -26,7 +27,8 @@ from ginga.table.AstroTable import AstroTable
 
 from ginga.misc import Bunch
 from ginga.util import iohelper
-from ginga.util.io import io_base
+from ginga.util.io import io_base, fits_index
+from ginga.util.lazyarray import MappedArray, ChunkCachedArray
 
 fits_configured = False
 fitsLoaderClass = None
@@ -38,6 +40,21 @@ try:
 except ImportError:
     have_astropy = False
 
+# Reading an HDU directly from its offset in the file (see
+# AstropyFitsFileHandler._read_hdu()) relies on astropy internals, so it
+# is only done if those are as expected (as of astropy 7)
+have_hdu_offset_read = False
+if have_astropy:
+    try:
+        from astropy.io.fits.file import _File
+        from astropy.io.fits.hdu.base import _BaseHDU
+        have_hdu_offset_read = (
+            hasattr(_BaseHDU, 'readfrom') and
+            'bintable' in inspect.signature(
+                pyfits.CompImageHDU.__init__).parameters)
+    except (ImportError, ValueError, TypeError):
+        pass
+
 try:
     import fitsio
     have_fitsio = True
@@ -120,6 +137,12 @@ class BaseFitsFileHandler(io_base.BaseIOHandler):
 
         return self.get_hdu(idx, **kwargs)
 
+    def load_idx_header(self, idx, **kwargs):
+        if len(self) == 0:
+            raise ValueError("Please call open_file() first!")
+
+        return self.get_hdu_header(idx, **kwargs)
+
     def load_idx_cont(self, idx_spec, loader_cont_fn, **kwargs):
         """
         Parameters
@@ -221,6 +244,12 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
     name = 'astropy.io.fits'
     mimetypes = ['image/fits', 'image/x-fits', 'application/fits']
 
+    # save and use an index of the HDUs of files opened from disk
+    # (see ginga.util.io.fits_index); off by default, as it writes to
+    # the cache directory
+    use_hdu_index = False
+    hdu_index_cache = fits_index.FitsIndexCache()
+
     @classmethod
     def check_availability(cls):
         if not have_astropy:
@@ -233,6 +262,15 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
         super(AstropyFitsFileHandler, self).__init__(logger)
         self.kind = 'pyfits'
+        # set when the HDU directory was read from an index
+        self.hdu_index = None
+        self.memmap = None
+        # file and HDUs read directly from their offsets (see _read_hdu())
+        self._hdu_file = None
+        self._hdus = {}
+        self._offset_read = False
+        # number of HDUs read by the astropy HDU list
+        self._num_fits_read = 0
 
     def copy_header(self, hdu, ahdr):
         """Copy a FITS header from an astropy.io.fits.PrimaryHDU object
@@ -264,9 +302,102 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
         return None
 
+    def get_mapped_data(self, hdu):
+        """Return the data of image HDU `hdu` as a
+        `~ginga.util.lazyarray.MappedArray` over a memory map of the raw
+        data in the file, or `None` if that is not possible (e.g. the
+        data is compressed, or not in a plain file on disk).
+        """
+        if (isinstance(hdu, pyfits.CompImageHDU) or
+                not isinstance(hdu, (pyfits.ImageHDU, pyfits.PrimaryHDU))):
+            return None
+        fileobj = getattr(hdu, '_file', None)
+        if (fileobj is None or getattr(fileobj, 'compression', None) or
+                hdu._data_loaded or not isinstance(fileobj.name, str)):
+            # data in memory, compressed or not in a file
+            return None
+
+        header = hdu.header
+        raw_dtype = {8: 'u1', 16: '>i2', 32: '>i4', 64: '>i8',
+                     -32: '>f4', -64: '>f8'}.get(header.get('BITPIX', None))
+        shape = tuple(hdu.shape)
+        if raw_dtype is None or len(shape) == 0 or 0 in shape:
+            return None
+
+        arr = np.memmap(fileobj.name, dtype=raw_dtype, mode='r',
+                        offset=hdu._data_offset, shape=shape)
+        return MappedArray(arr, bscale=header.get('BSCALE', 1),
+                           bzero=header.get('BZERO', 0),
+                           blank=header.get('BLANK', None))
+
+    def get_tiled_data(self, hdu, max_bytes=256 * 1024**2):
+        """Return the data of tile-compressed image HDU `hdu` as a
+        `~ginga.util.lazyarray.ChunkCachedArray` whose chunks are the
+        compression tiles, so that only the tiles covering the parts of
+        the image that are used are decompressed.  The decompressed
+        tiles are held in a LRU cache of `max_bytes` bytes.
+
+        Returns `None` if `hdu` is not a `CompImageHDU` in a file on
+        disk or this version of astropy cannot decompress part of an
+        image.
+        """
+        if (not isinstance(hdu, pyfits.CompImageHDU) or
+                getattr(hdu, '_data_loaded', False)):
+            return None
+        # NOTE: the tiles are read after this handler is closed, so they
+        # are read through a file opened for the array
+        fits_f, hdu = self._reopen_hdu(hdu)
+        if hdu is None:
+            return None
+        section = getattr(hdu, 'section', None)
+        shape = tuple(hdu.shape)
+        if section is None or len(shape) < 2 or 0 in shape:
+            return None
+
+        # tile shape, from the ZTILEn keywords (in FITS axis order) of the
+        # binary table holding the compressed data; the default is one
+        # row per tile
+        bintable = getattr(hdu, '_bintable', None)
+        header = hdu._header if bintable is None else bintable.header
+        naxis = len(shape)
+        tiles = [header.get('ZTILE%d' % (i + 1), 1 if i > 0 else shape[-1])
+                 for i in range(naxis)]
+        tiles = tuple(reversed(tiles))
+
+        # NOTE: decompress one tile to find the type of the scaled data
+        dtype = section[(slice(0, 1),) * naxis].dtype
+        arr = _SectionArray(section, shape, dtype, fits_f=fits_f)
+        return ChunkCachedArray(arr, chunks=tiles, max_bytes=max_bytes)
+
+    def _reopen_hdu(self, hdu):
+        # return the file opened again and `hdu` from it, or (None, None)
+        # if that is not possible (e.g. the HDU was read from a buffer)
+        fileobj = getattr(hdu, '_file', None)
+        if fileobj is None or not isinstance(fileobj.name, str):
+            return None, None
+        fits_f = pyfits.open(fileobj.name, 'readonly', memmap=self.memmap)
+        # NOTE: HDUs are read from the file as they are iterated over
+        for _hdu in fits_f:
+            if _hdu._header_offset == hdu._header_offset:
+                return fits_f, _hdu
+        fits_f.close()
+        return None, None
+
     def load_hdu(self, hdu, dstobj=None, fobj=None, naxispath=None,
                  save_primary_header=False, inherit_primary_header=False,
-                 **kwargs):
+                 load_mode=None, **kwargs):
+        """Load an HDU into a data object.
+
+        `load_mode` can be used to avoid reading all of the data of an
+        image up front:
+
+        * 'mmap': the data of an uncompressed image is memory mapped as
+          raw values (see get_mapped_data()), which are only read, byte
+          swapped and scaled for the parts of the image that are used.
+        * 'lazy': as 'mmap', and the data of a tile-compressed image is
+          decompressed a tile at a time as it is used (see
+          get_tiled_data()).
+        """
         if fobj is None:
             fobj = self.fits_f
 
@@ -302,7 +433,21 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
             dstobj.set(primary_header=primary_hdr,
                        inherit_primary_header=inherit_primary_header)
 
-            dstobj.setup_data(hdu.data, naxispath=naxispath)
+            data = None
+            try:
+                if load_mode in ('mmap', 'lazy'):
+                    data = self.get_mapped_data(hdu)
+                if data is None and load_mode == 'lazy':
+                    data = self.get_tiled_data(hdu)
+
+            except Exception as e:
+                self.logger.warning("Error setting up lazy HDU data: %s" % (
+                    str(e)))
+                data = None
+            if data is None:
+                data = hdu.data
+
+            dstobj.setup_data(data, naxispath=naxispath)
 
             # Try to make a wcs object on the header
             wcs = getattr(dstobj, 'wcs', None)
@@ -359,7 +504,7 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
     def load_file(self, filespec, numhdu=None, dstobj=None, memmap=None,
                   save_primary_header=False, inherit_primary_header=False,
-                  **kwargs):
+                  load_mode=None, **kwargs):
 
         opener = self.get_factory()
         opener.open_file(filespec, memmap=memmap, **kwargs)
@@ -367,11 +512,12 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
             return opener.get_hdu(
                 numhdu, dstobj=dstobj,
                 save_primary_header=save_primary_header,
-                inherit_primary_header=inherit_primary_header)
+                inherit_primary_header=inherit_primary_header,
+                load_mode=load_mode)
         finally:
             opener.close()
 
-    def open_file(self, filespec, memmap=None, **kwargs):
+    def open_file(self, filespec, memmap=None, use_hdu_index=None, **kwargs):
 
         info = iohelper.get_fileinfo(filespec)
         if not info.ondisk:
@@ -382,7 +528,10 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
         filepath = info.filepath
 
         self.logger.debug("Loading file '%s' ..." % (filepath))
-        return self._open_obj(filepath, memmap=memmap, **kwargs)
+        if use_hdu_index is None:
+            use_hdu_index = self.use_hdu_index
+        return self._open_obj(filepath, memmap=memmap,
+                              use_hdu_index=use_hdu_index, **kwargs)
 
     def open_buffer(self, name, buf, idx=None, memmap=None, **kwargs):
 
@@ -394,10 +543,25 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
         file_f = BytesIO(buf)
         return self._open_obj(file_f, memmap=memmap, **kwargs)
 
-    def _open_obj(self, file_like, memmap=None, **kwargs):
+    def _open_obj(self, file_like, memmap=None, use_hdu_index=False,
+                  **kwargs):
 
         fits_f = pyfits.open(file_like, 'readonly', memmap=memmap)
         self.fits_f = fits_f
+        self.memmap = memmap
+        # NOTE: the primary HDU is read on opening
+        self._num_fits_read = 1
+
+        self.hdu_index = None
+        self._offset_read = have_hdu_offset_read
+        if use_hdu_index and isinstance(file_like, str):
+            hdus = self.hdu_index_cache.load(file_like)
+            if hdus is not None:
+                # skip verifying and scanning the whole file
+                self.logger.debug("using HDU index for '%s'" % (file_like))
+                self.hdu_index = [Bunch.Bunch(d) for d in hdus]
+                self._set_directory(self.hdu_index)
+                return self
 
         # this seems to be necessary now for some fits files...
         try:
@@ -420,8 +584,7 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
         idx = 0
         extver_db = {}
-        self.hdu_info = []
-        self.hdu_db = {}
+        hdu_info = []
 
         for tup in _hduinfo:
             name = tup[1]
@@ -435,6 +598,23 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
             d = Bunch.Bunch(index=idx, name=name, extver=extver)
             if len(tup) > 5:
                 d.setvals(htype=tup[3], dtype=tup[6])
+            hdu_info.append(d)
+            idx += 1
+
+        self._set_directory(hdu_info)
+
+        if use_hdu_index and isinstance(file_like, str):
+            self._save_hdu_index(file_like)
+        return self
+
+    def _set_directory(self, hdu_info):
+        extver_db = {}
+        self.hdu_info = []
+        self.hdu_db = {}
+
+        for d in hdu_info:
+            idx, name, extver = d.index, d.name, d.extver
+            extver_db[name] = max(extver, extver_db.get(name, 0))
             self.hdu_info.append(d)
             # different ways of accessing this HDU:
             # by numerical index
@@ -443,23 +623,107 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
             key = (name, extver)
             if key not in self.hdu_db:
                 self.hdu_db[key] = d
-            idx += 1
 
         self.extver_db = extver_db
-        return self
+
+    def _save_hdu_index(self, filepath):
+        # save an index of the HDUs read by _open_obj(), with their offsets
+        # in the file and enough about their contents to pick one to load
+        hdus = []
+        try:
+            for d in self.hdu_info:
+                hdu = self.fits_f[d.index]
+                rec = dict(d, kind=self.get_hdu_type(hdu),
+                           shape=list(self._get_hdu_shape(hdu)),
+                           header_offset=hdu._header_offset,
+                           data_offset=hdu._data_offset,
+                           data_size=hdu._data_size)
+                if 'dtype' in rec:
+                    rec['dtype'] = str(rec['dtype'])
+                hdus.append(rec)
+
+        except Exception as e:
+            self.logger.warning("Error indexing HDUs of '%s': %s" % (
+                filepath, str(e)))
+            return
+
+        self.hdu_index_cache.save(filepath, hdus)
+
+    def _get_hdu_shape(self, hdu):
+        # get the shape of the HDU's data from its header, without
+        # reading the data
+        typ = self.get_hdu_type(hdu)
+        if typ == 'image':
+            return tuple(hdu.shape)
+        elif typ == 'table':
+            return (hdu.header.get('NAXIS2', 0),)
+        return ()
+
+    def _get_fits_hdu(self, numhdu):
+        # return HDU `numhdu` from the astropy HDU list, which reads all
+        # the HDUs up to it
+        hdu = self.fits_f[numhdu]
+        self._num_fits_read = max(self._num_fits_read,
+                                  self.fits_f.index(hdu) + 1)
+        return hdu
+
+    def _read_hdu(self, d):
+        # return the HDU described by directory entry `d`, reading it
+        # directly from its offset in the file if it has not been read
+        # already (astropy otherwise reads all the headers before it)
+        hdu = self._hdus.get(d.index, None)
+        if hdu is not None:
+            return hdu
+
+        if (self.hdu_index is None or not self._offset_read or
+                d.index < self._num_fits_read or
+                d.get('header_offset', None) is None):
+            return self._get_fits_hdu(d.index)
+
+        try:
+            if self._hdu_file is None:
+                self._hdu_file = _File(self.fileinfo.filepath,
+                                       mode='readonly', memmap=self.memmap)
+            self._hdu_file.seek(d.header_offset)
+            hdu = _BaseHDU.readfrom(self._hdu_file)
+            if hdu._data_offset != d.data_offset:
+                raise FITSError("HDU offset does not match index")
+            if (isinstance(hdu, pyfits.BinTableHDU) and
+                    pyfits.CompImageHDU.match_header(hdu.header)):
+                # as HDUList does, for a tile-compressed image
+                hdu = pyfits.CompImageHDU(bintable=hdu)
+            self._hdus[d.index] = hdu
+            return hdu
+
+        except Exception as e:
+            # don't try again for the other HDUs of this file
+            self._offset_read = False
+            self.logger.warning("Error reading HDUs of '%s' from their "
+                                "offsets, reading them with astropy: %s" % (
+                                    self.fileinfo.name, str(e)))
+            return self._get_fits_hdu(d.index)
 
     def close(self):
         self.hdu_info = None
         self.hdu_db = {}
         self.extver_db = {}
+        self.hdu_index = None
         self.info = None
         fits_f = self.fits_f
         self.fits_f = None
         if fits_f is not None:
             fits_f.close()
+        self._hdus = {}
+        self._num_fits_read = 0
+        fileobj, self._hdu_file = self._hdu_file, None
+        if fileobj is not None:
+            fileobj.close()
 
     def find_first_good_hdu(self):
 
+        if self.hdu_index is not None:
+            return self._find_first_good_hdu_index()
+
         found_valid_hdu = False
         for i, d in enumerate(self.hdu_info):
             name = d.name
@@ -502,6 +766,68 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
         return (numhdu, hdu)
 
+    def _find_first_good_hdu_index(self):
+        # like find_first_good_hdu(), but decided from the HDU index
+        # rather than by reading the HDUs
+        d = self.hdu_info[0]
+        for _d in self.hdu_info:
+            shape = _d.get('shape', [])
+            if (_d.get('kind', None) in ('image', 'table') and
+                    len(shape) > 0 and 0 not in shape):
+                d = _d
+                break
+
+        numhdu = d.index
+        if len(d.name) > 0 and self.hdu_db.get((d.name, d.extver)) is d:
+            numhdu = (d.name, d.extver)
+        return (numhdu, self._read_hdu(d))
+
+    def _find_first_good_hdu_header(self):
+        # like find_first_good_hdu(), but decided from the HDU headers
+        # so that no data is read
+        if self.hdu_index is not None:
+            return self._find_first_good_hdu_index()
+
+        d, hdu = self.hdu_info[0], self.fits_f[0]
+        for i, _d in enumerate(self.hdu_info):
+            _hdu = self.fits_f[i]
+            shape = self._get_hdu_shape(_hdu)
+            if (self.get_hdu_type(_hdu) in ('image', 'table') and
+                    len(shape) > 0 and 0 not in shape):
+                d, hdu = _d, _hdu
+                break
+
+        numhdu = d.index
+        if len(d.name) > 0 and self.hdu_db.get((d.name, d.extver)) is d:
+            numhdu = (d.name, d.extver)
+        return (numhdu, hdu)
+
+    def get_hdu_header(self, numhdu, inherit_primary_header=False,
+                       **kwargs):
+        """Return the header of HDU `numhdu` (or of the first usable HDU
+        if `None`) as an AstroHeader, without reading its data.  If
+        `inherit_primary_header` is `True`, keywords of the primary
+        header that are not in the HDU header are included.
+        """
+        if numhdu is None:
+            numhdu, hdu = self._find_first_good_hdu_header()
+
+        elif numhdu in self.hdu_db:
+            hdu = self._read_hdu(self.hdu_db[numhdu])
+
+        else:
+            hdu = self._get_fits_hdu(numhdu)
+
+        ahdr = AstroHeader()
+        self.copy_header(hdu, ahdr)
+
+        if inherit_primary_header and hdu is not self.fits_f[0]:
+            primary_hdr = AstroHeader()
+            self.copy_header(self.fits_f[0], primary_hdr)
+            ahdr.merge(primary_hdr)
+
+        return ahdr
+
     def get_hdu(self, numhdu, dstobj=None, **kwargs):
 
         if numhdu is None:
@@ -509,12 +835,12 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
 
         elif numhdu in self.hdu_db:
             d = self.hdu_db[numhdu]
-            hdu = self.fits_f[d.index]
+            hdu = self._read_hdu(d)
             # normalize the index
             numhdu = (d.name, d.extver)
 
         else:
-            hdu = self.fits_f[numhdu]
+            hdu = self._get_fits_hdu(numhdu)
             # normalize the hdu index, if possible
             name = hdu.name
             extver = hdu.ver
@@ -562,6 +888,25 @@ class AstropyFitsFileHandler(BaseFitsFileHandler):
         self.write_fits(filepath, data, header, **kwargs)
 
 
+class _SectionArray:
+    # gives the section of a CompImageHDU the shape and dtype needed
+    # to be wrapped by a ChunkCachedArray; the file the section is read
+    # from (if given) is closed with the array
+
+    def __init__(self, section, shape, dtype, fits_f=None):
+        self.section = section
+        self.shape = shape
+        self.dtype = dtype
+        self.fits_f = fits_f
+
+    def __getitem__(self, view):
+        return self.section[view]
+
+    def __del__(self):
+        if self.fits_f is not None:
+            self.fits_f.close()
+
+
 class FitsioFileHandler(BaseFitsFileHandler):
     """For loading FITS (Flexible Image Transport System) data files.
     """
@@ -609,7 +954,8 @@ class FitsioFileHandler(BaseFitsFileHandler):
 
     def load_hdu(self, hdu, dstobj=None, fobj=None, naxispath=None,
                  save_primary_header=False, inherit_primary_header=False,
-                 **kwargs):
+                 load_mode=None, **kwargs):
+        # NOTE: `load_mode` is not supported by this handler
         if fobj is None:
             fobj = self.fits_f
 
@@ -790,6 +1136,50 @@ class FitsioFileHandler(BaseFitsFileHandler):
 
         return numhdu, hdu
 
+    def _find_first_good_hdu_header(self):
+        # like find_first_good_hdu(), but decided from the HDU headers
+        # so that no data is read
+        d, hdu = self.hdu_info[0], self.fits_f[0]
+        for i, _d in enumerate(self.hdu_info):
+            _hdu = self.fits_f[i]
+            hduinfo = _hdu.get_info()
+            if hduinfo.get('ndims', 0) == 0 or 0 in hduinfo.get('dims', []):
+                continue
+            d, hdu = _d, _hdu
+            break
+
+        if len(d.name) == 0:
+            numhdu = d.index
+        else:
+            numhdu = (d.name, d.extver)
+        return numhdu, hdu
+
+    def get_hdu_header(self, numhdu, inherit_primary_header=False,
+                       **kwargs):
+        """Return the header of HDU `numhdu` (or of the first usable HDU
+        if `None`) as an AstroHeader, without reading its data.  If
+        `inherit_primary_header` is `True`, keywords of the primary
+        header that are not in the HDU header are included.
+        """
+        if numhdu is None:
+            numhdu, hdu = self._find_first_good_hdu_header()
+
+        elif numhdu in self.hdu_db:
+            hdu = self.fits_f[self.hdu_db[numhdu].index]
+
+        else:
+            hdu = self.fits_f[numhdu]
+
+        ahdr = AstroHeader()
+        self.copy_header(hdu, ahdr)
+
+        if inherit_primary_header and hdu.get_extnum() != 0:
+            primary_hdr = AstroHeader()
+            self.copy_header(self.fits_f[0], primary_hdr)
+            ahdr.merge(primary_hdr)
+
+        return ahdr
+
     def get_hdu(self, numhdu, dstobj=None, **kwargs):
 
         if numhdu is None:
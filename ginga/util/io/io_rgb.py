@@ -319,6 +319,22 @@ class OpenCvFileHandler(BaseRGBFileHandler):
 
         return data_obj
 
+    def load_idx_header(self, idx, **kwargs):
+        if self.rgb_f is None:
+            raise ValueError("Please call open_file() first!")
+
+        if idx is None:
+            idx = 0
+
+        if idx > 0:
+            raise IndexError(f"index {idx} out of range")
+
+        # OpenCv doesn't "do" image metadata, so we punt to exifread
+        # library (if installed)
+        kwds = Header()
+        self._getexif(self.fileinfo.filepath, kwds)
+        return kwds
+
     def get_frame(self, num, metadata=None):
         if self.rgb_f is None:
             if self.fileinfo is None:
@@ -566,6 +582,25 @@ class PillowFileHandler(BaseRGBFileHandler):
 
         return data_obj
 
+    def load_idx_header(self, idx, **kwargs):
+        if self.rgb_f is None:
+            raise ValueError("Please call open_file() first!")
+
+        if idx is None:
+            idx = 0
+
+        if idx > 0:
+            raise IndexError(f"index {idx} out of range")
+
+        if self.numframes > 0:
+            self.rgb_f.seek(idx + 1)
+
+        # pillow reads the metadata when the file is opened, but does not
+        # decode the pixels until they are asked for
+        kwds = Header()
+        self._get_header(self.rgb_f, kwds)
+        return kwds
+
     def _get_header(self, image_pil, kwds):
         if hasattr(image_pil, 'getexif'):
             info = image_pil.getexif()
@@ -0,0 +1,446 @@
+#
+# lazyarray.py -- chunk-aware wrappers for lazily evaluated arrays
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Wrappers for array-like objects (e.g. dask or zarr arrays) whose data
+is only fetched (or computed) when it is needed.
+
+An image whose data is a `LazyArray` never has its whole array
+materialized by Ginga: rendering fetches only the chunks that intersect
+the visible cutout, auto cut levels and min/max use a sample drawn from
+a spread of chunks, and fetched chunks are kept in a cache with a byte
+budget so that panning and zooming over the same area does not fetch
+them again.
+
+Example::
+
+    import zarr
+    from ginga.util.lazyarray import ChunkCachedArray
+
+    image.set_data(ChunkCachedArray(zarr.open('big.zarr', mode='r')))
+
+"""
+import math
+
+import numpy as np
+
+from ginga.misc.LRUCache import LRUCache
+
+__all__ = ['LazyArray', 'ChunkCachedArray', 'MappedArray']
+
+
+class LazyArray:
+    """Base class for array-like objects that are not held in memory.
+
+    Subclasses must set `shape` and `dtype` and implement `_get_block`,
+    which returns a numpy array of the values selected along each axis.
+    Indexing follows numpy: the values of a view are gathered along each
+    axis independently (reading only the rows, columns, etc. that are
+    selected), then the numpy index is applied to them.
+    """
+
+    def __init__(self, shape, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, view):
+        sel, rel = self._split_view(view)
+        return self._get_block(sel)[rel]
+
+    def _get_block(self, sel):
+        """Return the values selected by `sel`, a tuple with a slice (with
+        integer start, stop and step) or a 1-D array of sorted, unique
+        indexes for each axis, as a numpy array.
+        """
+        raise NotImplementedError("subclass should override this method")
+
+    def _split_view(self, view):
+        """Split a numpy style `view` into a selection along each axis
+        (see `_get_block`) and an index into the selected values that
+        gives the result of the view.
+        """
+        if not isinstance(view, tuple):
+            view = (view,)
+        if any(v is Ellipsis for v in view):
+            i = [v is Ellipsis for v in view].index(True)
+            fill = (slice(None),) * (self.ndim - len(view) + 1)
+            view = view[:i] + fill + view[i + 1:]
+        if len(view) > self.ndim:
+            raise IndexError("too many indices for array")
+        view = tuple(view) + (slice(None),) * (self.ndim - len(view))
+
+        sel, rel = [], []
+        for v, length in zip(view, self.shape):
+            if isinstance(v, slice):
+                sel.append(slice(*v.indices(length)))
+                rel.append(slice(None))
+                continue
+
+            if np.ndim(v) == 0:
+                i = int(v)
+                if i < 0:
+                    i += length
+                if not (0 <= i < length):
+                    raise IndexError("index %d is out of bounds for axis "
+                                     "with size %d" % (int(v), length))
+                sel.append(slice(i, i + 1, 1))
+                rel.append(0)
+                continue
+
+            v = np.asarray(v)
+            if v.dtype == bool:
+                if v.ndim != 1 or len(v) != length:
+                    raise IndexError("boolean index does not match axis "
+                                     "with size %d" % (length))
+                v = np.nonzero(v)[0]
+            v = v.astype(np.intp, copy=False)
+            v = np.where(v < 0, v + length, v)
+            if v.size > 0 and (v.min() < 0 or v.max() >= length):
+                raise IndexError("index out of bounds for axis with "
+                                 "size %d" % (length))
+            idx, inv = np.unique(v, return_inverse=True)
+            sel.append(idx)
+            rel.append(inv.reshape(v.shape))
+
+        return tuple(sel), tuple(rel)
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self[...]
+        if dtype is not None:
+            arr = arr.astype(dtype, copy=False)
+        return arr
+
+    def copy(self):
+        return np.array(self[...])
+
+    def astype(self, dtype, copy=True):
+        return np.asarray(self).astype(dtype, copy=copy)
+
+    def get_sample(self, num_points):
+        """Return about `num_points` values spread over the array, as a
+        numpy array with the first two axes flattened into one.
+        """
+        raise NotImplementedError("subclass should override this method")
+
+    def get_slice(self, idx):
+        """Return the sub-array selected by the tuple of integers `idx`
+        on the leading axes (e.g. a plane of a cube).  Subclasses may
+        return another lazy array instead of reading the data.
+        """
+        return self[tuple(idx)]
+
+
+class ChunkCachedArray(LazyArray):
+    """Wrap a dask, zarr (or any sliceable) array so that it is read in
+    chunks, which are held in a LRU cache.
+
+    Chunking is only done along the first two (row and column) axes;
+    any further axes (e.g. color planes) are always fetched whole.
+
+    Parameters
+    ----------
+    arr : array-like
+        The array to wrap.  It must support slicing with ``arr[y1:y2,
+        x1:x2]`` and conversion of the result with `numpy.asarray`.
+
+    chunks : tuple of int or `None` (optional)
+        The (rows, columns) of a chunk.  If `None`, the chunking of a
+        zarr or dask array is used, otherwise 512 x 512.  A chunk shape
+        for every axis of the array may be given; the chunking of the
+        first two axes is used, and that of the others is used for the
+        planes returned by `get_slice`.
+
+    max_bytes : int (optional, default 256 MB)
+        Budget for the cache of fetched chunks.
+
+    """
+
+    def __init__(self, arr, chunks=None, max_bytes=256 * 1024**2):
+        super().__init__(arr.shape, arr.dtype)
+        if len(self.shape) < 2:
+            raise ValueError("array must have at least 2 dimensions")
+        self.arr = arr
+
+        if chunks is None:
+            # zarr arrays have a tuple of ints in `chunks`, dask arrays
+            # have the largest chunk along each axis in `chunksize`
+            chunks = getattr(arr, 'chunksize', None)
+            if chunks is None:
+                chunks = getattr(arr, 'chunks', None)
+            if (chunks is None or len(chunks) < 2 or
+                    not all(isinstance(n, (int, np.integer))
+                            for n in chunks)):
+                chunks = (512, 512)
+        self.chunks = (max(1, int(chunks[0])), max(1, int(chunks[1])))
+        # chunking of all the axes, if known
+        self._nd_chunks = tuple(chunks) if len(chunks) == self.ndim else None
+
+        self.cache = LRUCache(maxbytes=max_bytes)
+
+    def get_num_chunks(self):
+        """Return the number of chunks along the (rows, columns) axes."""
+        ht, wd = self.shape[:2]
+        cy, cx = self.chunks
+        return ((ht + cy - 1) // cy, (wd + cx - 1) // cx)
+
+    def get_chunk(self, j, i):
+        """Return chunk (row `j`, column `i`) as a numpy array."""
+        key = (j, i)
+        chunk = self.cache.get(key)
+        if chunk is None:
+            cy, cx = self.chunks
+            y1, x1 = j * cy, i * cx
+            chunk = np.asarray(self.arr[y1:y1 + cy, x1:x1 + cx])
+            self.cache.put(key, chunk)
+        return chunk
+
+    def get_region(self, y1, y2, x1, x2):
+        """Return the region ``[y1:y2, x1:x2]`` (bounds must lie within
+        the array) assembled from cached chunks.
+        """
+        sel = ((slice(y1, max(y1, y2), 1), slice(x1, max(x1, x2), 1)) +
+               tuple(slice(0, n, 1) for n in self.shape[2:]))
+        return self._get_block(sel)
+
+    def _get_block(self, sel):
+        ys, xs = _as_indexes(sel[0]), _as_indexes(sel[1])
+        res = np.empty((len(ys), len(xs)) + self.shape[2:],
+                       dtype=self.dtype)
+
+        # gather only the selected rows and columns, and only from the
+        # chunks that hold some of them
+        cy, cx = self.chunks
+        xgroups = list(_group_by_chunk(xs, cx))
+        for j, ypos, yloc in _group_by_chunk(ys, cy):
+            for i, xpos, xloc in xgroups:
+                chunk = self.get_chunk(j, i)
+                res[ypos, xpos] = chunk[yloc][:, xloc]
+
+        # further axes are fetched whole with the chunks
+        for k, s in enumerate(sel[2:], 2):
+            if isinstance(s, slice):
+                res = res[(slice(None),) * k + (s,)]
+            else:
+                res = np.take(res, s, axis=k)
+        return res
+
+    def get_sample(self, num_points):
+        """Return about `num_points` values drawn from a spread of chunks.
+
+        Only the chunks in the sample are fetched, so this is much
+        cheaper than sampling the whole array with a stride.
+        """
+        ny, nx = self.get_num_chunks()
+        total = ny * nx
+        cy, cx = self.chunks
+        num_points = max(1, int(num_points))
+
+        # read enough chunks to supply the points, spread over the array
+        num_chunks = min(total, max(int(math.ceil(num_points / (cy * cx))),
+                                    16))
+        sel = np.unique(np.round(np.linspace(0, total - 1,
+                                             num_chunks)).astype(int))
+        per_chunk = max(1, num_points // len(sel))
+
+        parts = []
+        for k in sel:
+            chunk = self.get_chunk(k // nx, k % nx)
+            ht, wd = chunk.shape[:2]
+            skip = int(max(1, math.sqrt(ht * wd / per_chunk)))
+            sample = chunk[::skip, ::skip]
+            parts.append(sample.reshape((-1,) + sample.shape[2:]))
+        return np.concatenate(parts)
+
+    def get_slice(self, idx):
+        """Return the sub-array selected by the integers `idx` on the
+        leading axes (e.g. a plane of a cube) as another
+        `ChunkCachedArray`, without fetching it.
+        """
+        idx = tuple(idx)
+        if self.ndim - len(idx) < 2:
+            return self[idx]
+        chunks = None
+        if self._nd_chunks is not None:
+            chunks = self._nd_chunks[len(idx):]
+        return ChunkCachedArray(_LeadingIndex(self.arr, idx), chunks=chunks,
+                                max_bytes=self.cache.maxbytes)
+
+    def clear_cache(self):
+        """Discard all fetched chunks."""
+        self.cache.clear()
+
+    def get_cache_stats(self):
+        return self.cache.get_stats()
+
+
+def _as_indexes(s):
+    # indexes selected by a slice (with integer bounds) or index array
+    if isinstance(s, slice):
+        return np.arange(s.start, s.stop, s.step)
+    return s
+
+
+def _as_slice(idx):
+    # a slice equivalent to the index array `idx`, if it is evenly spaced
+    # and increasing, so that indexing with it makes a view
+    if len(idx) == 1:
+        return slice(int(idx[0]), int(idx[0]) + 1)
+    step = int(idx[1] - idx[0])
+    if step > 0 and np.all(np.diff(idx) == step):
+        return slice(int(idx[0]), int(idx[-1]) + 1, step)
+    return idx
+
+
+def _group_by_chunk(idx, size):
+    # split index array `idx` into runs that fall in the same chunk of
+    # `size`, yielding the chunk number, the positions of the run in
+    # `idx` (as a slice) and the indexes of the run within the chunk
+    if len(idx) == 0:
+        return
+    cnum = idx // size
+    edges = np.flatnonzero(np.diff(cnum)) + 1
+    starts = np.concatenate(([0], edges))
+    stops = np.concatenate((edges, [len(idx)]))
+    for a, b in zip(starts, stops):
+        j = int(cnum[a])
+        yield j, slice(int(a), int(b)), _as_slice(idx[a:b] - j * size)
+
+
+class _LeadingIndex:
+    # a sliceable view of `arr` with the leading axes fixed at `idx`
+
+    def __init__(self, arr, idx):
+        self.arr = arr
+        self.idx = tuple(idx)
+        self.shape = tuple(arr.shape[len(self.idx):])
+        self.dtype = arr.dtype
+
+    def __getitem__(self, view):
+        if not isinstance(view, tuple):
+            view = (view,)
+        return self.arr[self.idx + view]
+
+
+class MappedArray(LazyArray):
+    """Wrap a (memory mapped) array of raw values, e.g. the data of an
+    uncompressed FITS image, which may be in non-native byte order and
+    need scaling by BSCALE/BZERO.
+
+    Nothing is read when the array is created: only the values selected
+    by an index are read (paged in from the file, for a memory mapped
+    array), byte swapped and scaled, so the memory used depends on the
+    size of the cutouts rather than of the array.
+
+    Parameters
+    ----------
+    arr : numpy ndarray
+        The raw values, usually a `numpy.memmap`.
+
+    bscale, bzero : float (optional)
+        Values are returned as ``raw * bscale + bzero``.  Integer data
+        with ``bscale == 1`` and a `bzero` that shifts it to the unsigned
+        (or signed) type of the same size is returned as that type;
+        otherwise scaled data is returned as floating point.
+
+    blank : int or `None` (optional)
+        Raw value of undefined pixels in scaled integer data, which are
+        returned as NaN.
+
+    """
+
+    def __init__(self, arr, bscale=1.0, bzero=0.0, blank=None):
+        self.arr = arr
+        self.bscale = bscale
+        self.bzero = bzero
+        self.blank = blank
+
+        raw_dtype = arr.dtype.newbyteorder('=')
+        self._flip = None
+        if bscale == 1 and bzero == 0:
+            dtype = raw_dtype
+        elif (raw_dtype.kind in 'iu' and bscale == 1 and
+              bzero == self._get_shift(raw_dtype)):
+            # the FITS convention for unsigned (or signed bytes) data;
+            # adding `bzero` just flips the sign bit
+            dtype = np.dtype('%s%d' % ('u' if raw_dtype.kind == 'i' else 'i',
+                                       raw_dtype.itemsize))
+            self._flip = np.array(1 << (8 * raw_dtype.itemsize - 1)).astype(
+                np.dtype('u%d' % raw_dtype.itemsize))
+        elif raw_dtype.kind == 'f':
+            dtype = raw_dtype
+        elif raw_dtype.itemsize <= 2:
+            dtype = np.dtype(np.float32)
+        else:
+            dtype = np.dtype(np.float64)
+        self._raw_dtype = raw_dtype
+
+        super().__init__(arr.shape, dtype)
+
+    def _get_shift(self, raw_dtype):
+        bits = 8 * raw_dtype.itemsize - 1
+        return (1 << bits) if raw_dtype.kind == 'i' else -(1 << bits)
+
+    def _convert(self, raw):
+        """Convert raw values read from the array into our dtype."""
+        # NOTE: astype() makes a copy in native order, which also reads
+        # the values from a memory mapped array
+        data = raw.astype(self._raw_dtype)
+        if self._flip is not None:
+            data = (data.view(self._flip.dtype) ^ self._flip).view(self.dtype)
+        elif self.dtype != self._raw_dtype or self.bscale != 1 or \
+                self.bzero != 0:
+            res = data.astype(self.dtype)
+            if self.bscale != 1:
+                res *= self.dtype.type(self.bscale)
+            if self.bzero != 0:
+                res += self.dtype.type(self.bzero)
+            if self.blank is not None and self._raw_dtype.kind in 'iu':
+                res[data == self.blank] = np.nan
+            data = res
+        return data
+
+    def _get_block(self, sel):
+        # slice a view of the raw values, then gather the indexed rows
+        # (and columns) from it, so only the selected values are read
+        # and converted
+        raw = self.arr[tuple(s if isinstance(s, slice) else slice(None)
+                             for s in sel)]
+        for k, s in enumerate(sel):
+            if not isinstance(s, slice):
+                raw = np.take(raw, s, axis=k)
+        return self._convert(raw)
+
+    def get_slice(self, idx):
+        # a view of the memory map, without reading it
+        return MappedArray(self.arr[tuple(idx)], bscale=self.bscale,
+                           bzero=self.bzero, blank=self.blank)
+
+    def get_sample(self, num_points):
+        """Return about `num_points` values from a grid of rows and columns
+        spread over the array.  Only the sampled values are read.
+        """
+        ht, wd = self.shape[:2]
+        num_points = max(1, int(num_points))
+        skip = int(max(1, math.sqrt(ht * wd / num_points)))
+        sample = self[::skip, ::skip]
+        return sample.reshape((-1,) + sample.shape[2:])
+
+# END
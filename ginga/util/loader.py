@@ -40,14 +40,63 @@ def load_data(filespec, idx=None, logger=None, **kwargs):
     data_obj : a data object for a ginga viewer
 
     """
-    global loader_registry
+    info = iohelper.get_fileinfo(filespec)
+    filepath = info.filepath
+
+    if idx is None:
+        idx = info.numhdu
+
+    opener = _get_opener(filepath, logger)
+    with opener.open_file(filepath) as opn_f:
+        data_obj = opener.load_idx(idx, **kwargs)
+
+    return data_obj
+
 
+# For consistency with specific format loader modules (io_fits, etc).
+load_file = load_data
+
+
+def load_header(filespec, idx=None, logger=None, **kwargs):
+    """Load the header of a data item from a file.
+
+    Like load_data(), but only the header (metadata) of the data item
+    is read, not the data.  This is much cheaper when only a few
+    keywords are needed, e.g. to list a large number of files.
+
+    Parameters
+    ----------
+    filespec : str
+        The path of the file (can be a URL).
+
+    idx : int or string (optional)
+        The index or name of the data unit in the file (e.g. an HDU name)
+
+    logger : python logger (optional)
+        A logger to record progress opening the item
+
+    All other keyword parameters are passed to the opener chosen for
+    the file type.
+
+    Returns
+    -------
+    header : a `~ginga.BaseImage.Header` (or subclass)
+
+    """
     info = iohelper.get_fileinfo(filespec)
     filepath = info.filepath
 
     if idx is None:
         idx = info.numhdu
 
+    opener = _get_opener(filepath, logger)
+    with opener.open_file(filepath) as opn_f:
+        header = opener.load_idx_header(idx, **kwargs)
+
+    return header
+
+
+def _get_opener(filepath, logger):
     # Assume type to be a FITS image unless the MIME association says
     # it is something different.
     try:
@@ -69,15 +118,7 @@ def load_data(filespec, idx=None, logger=None, **kwargs):
             logger.warning(msg)
         raise ValueError(msg)
 
-    opener = openers[0].opener(logger)
-    with opener.open_file(filepath) as opn_f:
-        data_obj = opener.load_idx(idx, **kwargs)
-
-    return data_obj
-
-
-# For consistency with specific format loader modules (io_fits, etc).
-load_file = load_data
+    return openers[0].opener(logger)
 
 
 def add_opener(opener, mimetypes, priority=0, note=''):
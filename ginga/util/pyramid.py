@@ -0,0 +1,141 @@
+#
+# pyramid.py -- multi-resolution, tiled decimation of large images
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+An image pyramid holds successively decimated versions of an image.
+Level 0 is the image data itself, and level N is the data decimated by
+a factor of 2**N in each dimension.  Levels are never built as a whole:
+they are split into square tiles that are only built when they are
+needed to render a view, and the tiles are held in a LRU cache with a
+byte budget.
+
+When an image is zoomed far out, rendering from the appropriate level
+of the pyramid makes the cost of a redraw depend on the size of the
+window rather than on the size of the image.
+"""
+import math
+
+import numpy as np
+
+from ginga import trcalc
+from ginga.misc.LRUCache import LRUCache
+
+__all__ = ['ImagePyramid']
+
+
+class ImagePyramid:
+    """Tiled multi-resolution pyramid over a data array.
+
+    Decimation is by nearest-neighbor (i.e. pixel (i, j) of level N is
+    pixel (i * 2**N, j * 2**N) of the source), which matches the 'basic'
+    interpolation used by the renderer.
+
+    Parameters
+    ----------
+    data : array-like
+        2D (or 3D, with the color planes last) numpy, dask or zarr array.
+
+    tile_size : int (optional, default 256)
+        Width and height of a tile, in pixels of the tile's level.
+
+    max_bytes : int (optional, default 128 MB)
+        Budget for the cache of built tiles.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    """
+
+    def __init__(self, data, tile_size=256, max_bytes=128 * 1024**2,
+                 logger=None):
+        self.data = data
+        self.tile_size = int(tile_size)
+        self.logger = logger
+
+        ht, wd = data.shape[:2]
+        # number of levels, such that the coarsest level fits in a tile
+        length = max(wd, ht, 1)
+        self.num_levels = max(1, int(math.ceil(math.log2(
+            max(1.0, length / self.tile_size)))) + 1)
+
+        self.cache = LRUCache(maxbytes=max_bytes)
+
+    def get_num_levels(self):
+        return self.num_levels
+
+    def get_level_for_scale(self, scale):
+        """Return the coarsest level that can still be scaled to `scale`
+        without losing resolution.
+        """
+        if scale <= 0.0 or scale >= 0.5:
+            return 0
+        level = int(math.floor(math.log2(1.0 / scale)))
+        return min(level, self.num_levels - 1)
+
+    def get_level_shape(self, level):
+        """Return the (height, width) of the array at `level`."""
+        ht, wd = self.data.shape[:2]
+        f = 2 ** level
+        return ((ht + f - 1) // f, (wd + f - 1) // f)
+
+    def _build_tile(self, level, tx, ty):
+        f = 2 ** level
+        ts = self.tile_size
+        ht, wd = self.get_level_shape(level)
+        x1, y1 = tx * ts, ty * ts
+        x2, y2 = min(x1 + ts, wd), min(y1 + ts, ht)
+        view = np.s_[y1 * f:y2 * f:f, x1 * f:x2 * f:f]
+        tile = np.array(trcalc.fancy_index(self.data, view))
+        if self.logger is not None:
+            self.logger.debug("built pyramid tile L%d (%d, %d) %s" % (
+                level, tx, ty, str(tile.shape)))
+        return tile
+
+    def get_tile(self, level, tx, ty):
+        """Return tile (tx, ty) of `level`, building it if necessary."""
+        key = (level, tx, ty)
+        tile = self.cache.get(key)
+        if tile is None:
+            tile = self._build_tile(level, tx, ty)
+            self.cache.put(key, tile)
+        return tile
+
+    def get_cutout(self, level, x1, y1, x2, y2):
+        """Return the region bounded by the (inclusive) corners
+        (x1, y1) and (x2, y2), in the pixel coordinates of `level`.
+        """
+        if level == 0:
+            return np.asarray(trcalc.fancy_index(
+                self.data, np.s_[y1:y2 + 1, x1:x2 + 1]))
+
+        ht, wd = self.get_level_shape(level)
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(wd - 1, int(x2)), min(ht - 1, int(y2))
+        ts = self.tile_size
+
+        shape = (y2 - y1 + 1, x2 - x1 + 1) + self.data.shape[2:]
+        res = np.empty(shape, dtype=self.data.dtype)
+
+        for ty in range(y1 // ts, y2 // ts + 1):
+            for tx in range(x1 // ts, x2 // ts + 1):
+                tile = self.get_tile(level, tx, ty)
+                # intersection of tile and requested region
+                ox, oy = tx * ts, ty * ts
+                a1, b1 = max(x1, ox), max(y1, oy)
+                a2, b2 = min(x2, ox + ts - 1), min(y2, oy + ts - 1)
+                res[b1 - y1:b2 - y1 + 1, a1 - x1:a2 - x1 + 1] = \
+                    tile[b1 - oy:b2 - oy + 1, a1 - ox:a2 - ox + 1]
+        return res
+
+    def get_nbytes(self):
+        """Return the number of bytes held by built tiles."""
+        return self.cache.get_nbytes()
+
+    def invalidate(self):
+        """Discard all built tiles."""
+        self.cache.clear()
+
+# END
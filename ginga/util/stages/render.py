@@ -8,16 +8,60 @@ the default renderer for standard widget backends.
 [createbg] => [overlays] => [iccprof] => [flipswap] => [rotate] => [output]
 
 """
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
-from ginga import trcalc, RGBImage
+from ginga import trcalc, RGBImage, AutoCuts, ColorDist
+from ginga.util.bgjob import BackgroundJob
 
 from .base import Stage, StageError
 
+# minimum number of rows in a band when the image processing stages
+# are split across threads
+min_band_height = 64
+
+_band_pools = {}
+_band_lock = threading.Lock()
+
+
+def _get_band_pool(num_workers):
+    with _band_lock:
+        pool = _band_pools.get(num_workers, None)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=num_workers,
+                                      thread_name_prefix='ginga-render')
+            _band_pools[num_workers] = pool
+        return pool
+
+
+def run_bands(viewer, ht, fn):
+    """Call ``fn(y1, y2)`` for horizontal bands covering `ht` rows.
+
+    If the viewer setting 'render_num_workers' is greater than 1, the
+    rows are split into up to that many bands, which are processed in
+    parallel on a thread pool; otherwise ``fn(0, ht)`` is called directly.
+    Returns a list of the results of the calls, in row order.
+    """
+    num_workers = viewer.get_settings().get('render_num_workers', 1)
+    num_bands = min(num_workers, ht // min_band_height)
+    if num_bands <= 1:
+        return [fn(0, ht)]
+
+    edges = np.linspace(0, ht, num_bands + 1).astype(int)
+    pool = _get_band_pool(num_workers)
+    futures = [pool.submit(fn, y1, y2)
+               for y1, y2 in zip(edges[:-1], edges[1:])]
+    return [future.result() for future in futures]
+
 
 class CreateBg(Stage):
     """Create the background RGB image, sized to fit the area that needs to
     be painted in the viewer, and big enough so there is room to rotate it.
+    If the viewer is not rotated, the image is only slightly larger than
+    the window.
     """
 
     _stagename = 'viewer-createbg'
@@ -27,6 +71,7 @@ class CreateBg(Stage):
 
         self.viewer = viewer
         self.dtype = np.uint8
+        self._buf = None
 
     def run(self, prev_stage):
         if prev_stage is not None:
@@ -37,15 +82,7 @@ class CreateBg(Stage):
             return
 
         state = self.pipeline.get('state')
-        win_wd, win_ht = state.win_dim
-
-        # calc minimum size of pixel image we will generate
-        # necessary to fit the window in the desired size
-
-        # Make a square from the scaled cutout, with room to rotate
-        slop = 20
-        side = int(np.sqrt(win_wd**2 + win_ht**2) + slop)
-        wd = ht = side
+        wd, ht = self.get_bg_dims()
 
         # Find center of new array
         ncx, ncy = wd // 2, ht // 2
@@ -53,12 +90,46 @@ class CreateBg(Stage):
 
         # make backing image with the background color
         r, g, b = self.viewer.get_bg()
-        res_np = trcalc.make_filled_array((ht, wd, depth), self.dtype,
-                                          state.order, r, g, b, 1.0)
+        pool = self.pipeline.get('bufpool', None)
+        if pool is None:
+            res_np = trcalc.make_filled_array((ht, wd, depth), self.dtype,
+                                              state.order, r, g, b, 1.0)
+        else:
+            # reuse the array from the last run if it is the right size
+            pool.release(self._buf, order=state.order)
+            res_np = pool.acquire((ht, wd, depth), self.dtype,
+                                  order=state.order)
+            trcalc.fill_array(res_np, state.order, r, g, b, 1.0)
+            self._buf = res_np
 
         self.pipeline.set(org_dim=(wd, ht), org_off=(ncx, ncy))
         self.pipeline.send(res_np=res_np)
 
+    def get_bg_dims(self):
+        """Return the (width, height) of the background image needed for
+        the current window size, rotation and swapping of axes.
+        """
+        state = self.pipeline.get('state')
+        win_wd, win_ht = state.win_dim
+
+        # calc minimum size of pixel image we will generate
+        # necessary to fit the window in the desired size
+
+        if np.isclose(self.viewer.get_rotation(), 0.0):
+            # no rotation--just pad the window slightly
+            slop = 2
+            wd, ht = win_wd + slop, win_ht + slop
+            flip_x, flip_y, swap_xy = self.viewer.get_transforms()
+            if swap_xy:
+                # axes will be swapped in the FlipSwap stage
+                wd, ht = ht, wd
+            return (wd, ht)
+
+        # Make a square from the scaled cutout, with room to rotate
+        slop = 20
+        side = int(np.sqrt(win_wd**2 + win_ht**2) + slop)
+        return (side, side)
+
 
 class ICCProf(Stage):
     """Convert the given RGB data from the input ICC profile to the
@@ -159,6 +230,7 @@ class Rotate(Stage):
         super().__init__()
 
         self.viewer = viewer
+        self._buf = None
 
     def run(self, prev_stage):
         data = self.pipeline.get_data(prev_stage)
@@ -168,7 +240,14 @@ class Rotate(Stage):
             rot_deg = self.viewer.get_rotation()
 
             if not np.isclose(rot_deg, 0.0):
-                data = np.copy(data)
+                pool = self.pipeline.get('bufpool', None)
+                if pool is None:
+                    data = np.copy(data)
+                else:
+                    pool.release(self._buf)
+                    self._buf = pool.acquire(data.shape, data.dtype)
+                    np.copyto(self._buf, data)
+                    data = self._buf
                 #data = np.ascontiguousarray(data)
                 data = trcalc.rotate_clip(data, -rot_deg, out=data,
                                           logger=self.logger)
@@ -208,6 +287,8 @@ class Output(Stage):
         super().__init__()
 
         self.viewer = viewer
+        # output arrays handed out on the last runs (see NOTE below)
+        self._bufs = []
 
     def run(self, prev_stage):
         data = self.pipeline.get_data(prev_stage)
@@ -238,8 +319,22 @@ class Output(Stage):
 
             # reorder image for renderer's desired format
             dst_order = self.viewer.renderer.get_rgb_order()
-            data = trcalc.reorder_image(dst_order, data, state.order)
-            data = np.ascontiguousarray(data)
+            pool = self.pipeline.get('bufpool', None)
+            if pool is None:
+                data = trcalc.reorder_image(dst_order, data, state.order)
+                data = np.ascontiguousarray(data)
+            else:
+                # NOTE: the output is double buffered, because a backend
+                # may still be using the previous output while this one
+                # is being made
+                if len(self._bufs) >= 2:
+                    pool.release(self._bufs.pop(0), order=dst_order)
+                outarr = pool.acquire(data.shape[:2] + (len(dst_order),),
+                                      data.dtype, order=dst_order)
+                for i, ch in enumerate(dst_order):
+                    outarr[..., i] = data[..., state.order.index(ch)]
+                self._bufs.append(outarr)
+                data = outarr
             out_order = dst_order
 
         self.pipeline.set(out_order=out_order)
@@ -267,6 +362,7 @@ class Overlays(Stage):
         super(Overlays, self).__init__()
 
         self.viewer = viewer
+        self._buf = None
 
     def run(self, prev_stage):
         whence = self.pipeline.get('whence')
@@ -281,7 +377,15 @@ class Overlays(Stage):
         bgarr = self.pipeline.get_data(prev_stage)
         self.verify_2d(bgarr)
 
-        dstarr = np.copy(bgarr)
+        pool = self.pipeline.get('bufpool', None)
+        if pool is None:
+            dstarr = np.copy(bgarr)
+        else:
+            state = self.pipeline.get('state')
+            pool.release(self._buf, order=state.order)
+            dstarr = pool.acquire(bgarr.shape, bgarr.dtype, order=state.order)
+            np.copyto(dstarr, bgarr)
+            self._buf = dstarr
         self.pipeline.set(dstarr=dstarr)
 
         p_canvas = self.viewer.get_private_canvas()
@@ -431,17 +535,36 @@ class Scale(Stage):
         _scale_x, _scale_y = (scale_x * img.scale_x,
                               scale_y * img.scale_y)
 
+        t_ = self.viewer.get_settings()
         interp = img.interpolation
         if interp is None:
-            t_ = self.viewer.get_settings()
             interp = t_.get('interpolation', 'basic')
         if interp not in trcalc.interpolation_methods:
             interp = 'basic'
 
+        level = 0
+        if interp == 'basic' and t_.get('image_pyramid', False):
+            # zoomed out: take the cutout from a decimated level of the
+            # image pyramid instead of from the full resolution data
+            pyramid = image.get_pyramid()
+            level = pyramid.get_level_for_scale(max(_scale_x, _scale_y))
+
+        if level > 0:
+            f = 2 ** level
+            la1, lb1, la2, lb2 = a1 // f, b1 // f, a2 // f, b2 // f
+            data_np = pyramid.get_cutout(level, la1, lb1, la2, lb2)
+            # adjust destination for the start of the decimated cutout
+            dst_x -= a1 - la1 * f
+            dst_y -= b1 - lb1 * f
+            ht, wd = data_np.shape[:2]
+            a1, b1, a2, b2 = 0, 0, wd - 1, ht - 1
+            _scale_x, _scale_y = _scale_x * f, _scale_y * f
+
         data, scales = trcalc.get_scaled_cutout_basic(data_np, a1, b1, a2, b2,
                                                       _scale_x, _scale_y,
                                                       interpolation=interp,
-                                                      logger=self.logger)
+                                                      logger=self.logger,
+                                                      copy=False)
 
         if img.flipy:
             data = np.flipud(data)
@@ -546,7 +669,6 @@ class Merge(Stage):
         ht, wd, dp = dstarr.shape
         cvs_x = int(np.round(wd * 0.5 + off_x))
         cvs_y = int(np.round(ht * 0.5 + off_y))
-        cvs_pos = (cvs_x, cvs_y)
 
         dst_order = state.order
         image_order = state.order
@@ -569,12 +691,15 @@ class Merge(Stage):
 
         # composite the image into the destination array at the
         # calculated position
-        trcalc.overlay_image(dstarr, cvs_pos, rgbarr,
-                             dst_order=dst_order, src_order=image_order,
-                             # NOTE: these actually not used because rgbarr
-                             # contains an alpha channel
-                             alpha=cvs_img.alpha, fill=True,
-                             flipy=False)   # cvs_img.flipy
+        def _merge(y1, y2):
+            trcalc.overlay_image(dstarr, (cvs_x, cvs_y + y1), rgbarr[y1:y2],
+                                 dst_order=dst_order, src_order=image_order,
+                                 # NOTE: these actually not used because
+                                 # rgbarr contains an alpha channel
+                                 alpha=cvs_img.alpha, fill=True,
+                                 flipy=False)   # cvs_img.flipy
+
+        run_bands(self.viewer, rgbarr.shape[0], _merge)
 
         cache = cvs_img.get_cache(self.viewer)
         cache.drawn = True
@@ -592,10 +717,21 @@ class Cuts(Stage):
 
     _stagename = 'viewer-cut-levels'
 
+    # number of points sampled for the CDF of histogram equalization
+    histeq_num_points = 250000
+    # number of points per block of rows when the CDF is calculated from
+    # all of the data
+    histeq_block_points = 1024 * 1024
+    # delay (sec) before the calculation of a full CDF is started, so
+    # that it is not started for every change while the cut levels are
+    # being adjusted
+    cdf_settle_interval = 0.25
+
     def __init__(self, viewer):
         super().__init__()
 
         self.viewer = viewer
+        self.cdf_bgjob = None
 
     def run(self, prev_stage):
         data = self.pipeline.get_data(prev_stage)
@@ -604,6 +740,25 @@ class Cuts(Stage):
             return
         self.verify_2d(data)
 
+        rgbmap, autocuts, (loval, hival) = self.get_cut_params()
+
+        if (self.viewer.get_settings().get('render_fused_rgbmap', False) and
+                data.ndim == 2 and rgbmap.can_map_data() and
+                type(autocuts).cut_levels is AutoCuts.AutoCutsBase.cut_levels):
+            # cut levels will be applied together with the color mapping
+            # in the RGBMap stage
+            self.pipeline.set(fused_cuts=(loval, hival))
+            self.pipeline.send(res_np=data)
+            return
+        self.pipeline.set(fused_cuts=None)
+
+        res_np = self.apply_cuts(data)
+        self.pipeline.send(res_np=res_np)
+
+    def get_cut_params(self):
+        """Return the RGB mapper, autocuts object and cut levels that are
+        in effect for the image being rendered.
+        """
         cvs_img = self.pipeline.get('cvs_img')
 
         if cvs_img.rgbmap is not None:
@@ -611,29 +766,122 @@ class Cuts(Stage):
         else:
             rgbmap = self.viewer.get_rgbmap()
 
-        vmin = 0
-        vmax = rgbmap.get_hash_size() - 1
-
         if cvs_img.autocuts is not None:
             autocuts = cvs_img.autocuts
         else:
             autocuts = self.viewer.autocuts
 
-        # Apply cut levels
         if cvs_img.cuts is not None:
-            loval, hival = cvs_img.cuts
+            cuts = cvs_img.cuts
         else:
-            loval, hival = self.viewer.t_['cuts']
+            cuts = self.viewer.t_['cuts']
+
+        return rgbmap, autocuts, cuts
+
+    def update_histeq_cdf(self):
+        """If the color distribution is histogram equalization, give it a
+        CDF computed from a sample of the whole image (and, if the
+        'histeq_cdf' setting is 'full', later from all of the data), unless
+        it already has one for this image data and these cut levels.
+        """
+        mode = self.viewer.get_settings().get('histeq_cdf', 'sample')
+        rgbmap, autocuts, (loval, hival) = self.get_cut_params()
+        dist = rgbmap.get_dist()
+        if not isinstance(dist, ColorDist.HistogramEqualizationDist):
+            return
+        if mode == 'view':
+            if dist.has_cdf():
+                dist.clear_cdf()
+            return
 
-        res_np = autocuts.cut_levels(data, loval, hival,
-                                     vmin=vmin, vmax=vmax)
+        image = self.pipeline.get('cvs_img').get_image()
+        key = (weakref.ref(image), image.get_data_version(), loval, hival,
+               mode)
+        if dist.cdf_key == key:
+            return
+        vmax = rgbmap.get_hash_size() - 1
 
-        # NOTE: optimization to prevent multiple coercions in
-        # RGBMap
-        if not np.issubdtype(res_np.dtype, np.uint):
-            res_np = res_np.astype(np.uint)
+        def _calc_cdf(data):
+            data = data[np.isfinite(data)]
+            idx = autocuts.cut_levels(data, loval, hival, vmin=0, vmax=vmax)
+            return dist.calc_cdf(idx.astype(np.uint, copy=False))
+
+        if mode == 'full':
+            if self.cdf_bgjob is None:
+                self.cdf_bgjob = BackgroundJob(
+                    self.viewer, settle_interval=self.cdf_settle_interval)
+            if not self.cdf_bgjob.is_available():
+                # no timer to hand a result back with, so calculate it
+                # here
+                counts = self._calc_cdf_counts(image, autocuts, loval,
+                                               hival, vmax)
+                dist.set_cdf(dist.calc_cdf_counts(counts), key)
+                return
+
+        data = autocuts.get_sample(image, num_points=self.histeq_num_points)
+        dist.set_cdf(_calc_cdf(data), key)
+
+        if mode == 'full':
+            # calculate the CDF of all of the data in the background;
+            # the result is installed in the GUI thread
+            self.cdf_bgjob.start(self._calc_full_cdf, self._cdf_done,
+                                 image=image, autocuts=autocuts,
+                                 loval=loval, hival=hival, vmax=vmax,
+                                 dist=dist, key=key)
+
+    def _calc_cdf_counts(self, image, autocuts, loval, hival, vmax,
+                         job=None):
+        # count the color distribution indexes of all of the data, a
+        # block of rows at a time; returns None if `job` is superseded
+        data = image.get_data()
+        counts = np.zeros(vmax + 1, dtype=np.int64)
+        ht, wd = data.shape[:2]
+        n = max(1, self.histeq_block_points // max(1, wd))
+        for y in range(0, ht, n):
+            if job is not None and not self.cdf_bgjob.is_current(job):
+                return None
+            block = np.asarray(data[y:y + n])
+            block = block[np.isfinite(block)]
+            idx = autocuts.cut_levels(block, loval, hival,
+                                      vmin=0, vmax=vmax)
+            idx = np.clip(idx, 0, vmax).astype(np.intp, copy=False)
+            counts += np.bincount(idx, minlength=vmax + 1)
+        return counts
+
+    def _calc_full_cdf(self, job):
+        counts = self._calc_cdf_counts(job.image, job.autocuts, job.loval,
+                                       job.hival, job.vmax, job=job)
+        if counts is None:
+            return None
+        return job.dist.calc_cdf_counts(counts)
+
+    def _cdf_done(self, job):
+        # install it unless the data or cut levels changed since
+        if job.dist.cdf_key == job.key:
+            job.dist.set_cdf(job.result, job.key)
+            self.viewer.redraw(whence=2)
+
+    def apply_cuts(self, data):
+        """Apply the cut levels to `data`, returning an array of indexes
+        into the color distribution.
+        """
+        rgbmap, autocuts, (loval, hival) = self.get_cut_params()
 
-        self.pipeline.send(res_np=res_np)
+        vmin = 0
+        vmax = rgbmap.get_hash_size() - 1
+
+        def _cut(y1, y2):
+            res_np = autocuts.cut_levels(data[y1:y2], loval, hival,
+                                         vmin=vmin, vmax=vmax)
+
+            # NOTE: optimization to prevent multiple coercions in
+            # RGBMap
+            if not np.issubdtype(res_np.dtype, np.uint):
+                res_np = res_np.astype(np.uint)
+            return res_np
+
+        res = run_bands(self.viewer, data.shape[0], _cut)
+        return res[0] if len(res) == 1 else np.concatenate(res, axis=0)
 
 
 class RGBMap(Stage):
@@ -665,11 +913,46 @@ class RGBMap(Stage):
         else:
             rgbmap = self.viewer.get_rgbmap()
 
+        # NOTE: done here, because changing the color distribution only
+        # reruns the pipeline from this stage
+        prev_stage.update_histeq_cdf()
+
+        fused_cuts = self.pipeline.get('fused_cuts', None)
+        if fused_cuts is not None and not rgbmap.can_map_data():
+            # mapper changed since the Cuts stage passed the data
+            # through--apply the cut levels now
+            arr_in = prev_stage.apply_cuts(arr_in)
+
+        elif fused_cuts is not None:
+            # Cuts stage passed the data through: apply cut levels and
+            # color map in one step, writing into a single output array
+            loval, hival = fused_cuts
+            lut = rgbmap.get_composite_lut(state.order)
+            arr_out = np.empty(arr_in.shape + lut.shape[1:], dtype=lut.dtype)
+
+            def _map_cuts(y1, y2):
+                rgbmap.get_rgb_array_cuts(arr_in[y1:y2], loval, hival,
+                                          order=state.order,
+                                          out=arr_out[y1:y2])
+
+            run_bands(self.viewer, arr_in.shape[0], _map_cuts)
+            self.pipeline.send(res_np=arr_out)
+            return
+
         # See NOTE in Cuts
         if not np.issubdtype(arr_in.dtype, np.dtype(np.uint)):
             arr_in = arr_in.astype(np.uint)
 
         # get RGB mapped array
-        arr_out = rgbmap.get_rgb_array(arr_in, order=state.order)
+        def _map(y1, y2):
+            return rgbmap.get_rgb_array(arr_in[y1:y2], order=state.order)
+
+        if not rgbmap.can_map_data():
+            # can't be split: mapping runs through the RGBMap pipeline,
+            # or depends on the distribution of values in the whole array
+            arr_out = _map(0, arr_in.shape[0])
+        else:
+            res = run_bands(self.viewer, arr_in.shape[0], _map)
+            arr_out = res[0] if len(res) == 1 else np.concatenate(res, axis=0)
 
         self.pipeline.send(res_np=arr_out)
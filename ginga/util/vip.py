@@ -182,6 +182,36 @@ class ViewerImageProxy:
                 self.get_images(res, obj)
         return res
 
+    def get_single_image(self):
+        """Return the image whose data is the data of this proxy.
+
+        That is the case when the viewer's canvas holds exactly one data
+        image, plotted at the origin and spanning the viewer's limits.
+
+        Returns
+        -------
+        image : `~ginga.BaseImage.BaseImage` subclass or `None`
+            The image, or `None` if the proxy data is not simply that
+            of a single image
+
+        """
+        canvas = self.viewer.get_canvas()
+        images = self.get_images([], canvas)
+        if len(images) != 1:
+            return None
+        cv_img = images[0]
+        image = cv_img.get_image()
+        if image is None:
+            return None
+        xpos, ypos = cv_img.crdmap.to_data((cv_img.x, cv_img.y))
+        if (int(xpos), int(ypos)) != (0, 0):
+            return None
+        if cv_img.scale_x != 1.0 or cv_img.scale_y != 1.0:
+            return None
+        if tuple(self.get_size()) != tuple(image.get_size()):
+            return None
+        return image
+
     # ----- for compatibility with BaseImage objects -----
 
     def cutout_data(self, x1, y1, x2, y2, xstep=1, ystep=1, z=0,
@@ -277,11 +307,11 @@ class ViewerImageProxy:
             # you get it or you don't; but it may be possible to do some
             # kind of blending in the future
             if len(src_data.shape) > 2:
-                img_data = src_data[..., z][yi, xi]
+                img_data = src_data[yi, xi, z]
                 order = image.get_order()
                 if 'A' in order:
                     ai = order.index('A')
-                    a_arr = src_data[..., ai][yi, xi]
+                    a_arr = src_data[yi, xi, ai]
                     amask = np.logical_not(np.isclose(a_arr, 0))
                     mask[np.nonzero(mask)] = amask
                     data_np[mask] = img_data[amask]
@@ -51,10 +51,10 @@ _ImageDraw = namedtuple('_ImageDraw',
                          'interp'])
 
 # map Ginga interpolation names to the in-shader kernel code (image2.frag):
-# 0 nearest, 1 bilinear, 2 bicubic, 3 lanczos.  'area' (a downsampling average)
-# has no in-shader kernel, so it falls back to bilinear.
+# 0 nearest, 1 bilinear, 2 bicubic, 3 lanczos.  'area' and 'mean' (downsampling
+# averages) have no in-shader kernel, so they fall back to bilinear.
 _INTERP_CODE = {'nearest': 0, 'basic': 0, 'linear': 1, 'bilinear': 1,
-                'area': 1, 'bicubic': 2, 'cubic': 2, 'lanczos': 3}
+                'area': 1, 'mean': 1, 'bicubic': 2, 'cubic': 2, 'lanczos': 3}
 
 
 def ortho_2d_push(width, height):